@@ -0,0 +1,178 @@
+import base64
+import json
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core.models import Credential, Job, JobStatusChoices, Schedule
+from apps.core.tests.helpers import add_default_data
+from apps.node.models import Node
+
+User = get_user_model()
+
+
+class TestResourceViews(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        add_default_data()
+        cls.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        cls.other = Schedule.objects.create(name="other", cron_rule="* * * * *", image="test", active=False)
+        now = timezone.now()
+        cls.jobs = [
+            Job.objects.create(
+                schedule=cls.schedule,
+                created_at=now - timedelta(minutes=index),
+                status=JobStatusChoices.EXITED,
+                status_code=index % 2,
+                log="output",
+                state={"ExitCode": index % 2},
+            )
+            for index in range(5)
+        ]
+
+    def setUp(self):
+        self.client.force_login(User.objects.get(username="testuser"))
+
+    def test_authentication_required(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("api-schedule-list")).status_code, 401)
+
+    def test_cursor_pagination(self):
+        response = self.client.get(reverse("api-job-list"), data={"limit": 2})
+        data = response.json()
+        self.assertEqual([job["id"] for job in data["results"]], [str(job.id) for job in self.jobs[:2]])
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            data = self.client.get(reverse("api-job-list"), data=params).json()
+            seen += [job["id"] for job in data["results"]]
+            cursor = data["next"]
+            if not cursor:
+                break
+        self.assertEqual(seen, [str(job.id) for job in self.jobs])
+
+        response = self.client.get(reverse("api-job-list"), data={"cursor": "invalid"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_heavy_fields_only_on_request(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(reverse("api-job-list")).json()
+        self.assertNotIn("log", data["results"][0])
+        self.assertNotIn('"core_job"."state"', queries[-1]["sql"])
+
+        data = self.client.get(reverse("api-job-list"), data={"fields": "id,status_code,state"}).json()
+        self.assertEqual(data["results"][0], {"id": str(self.jobs[0].id), "status_code": 0, "state": {"ExitCode": 0}})
+
+        response = self.client.get(reverse("api-job-list"), data={"fields": "id,unknown"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters(self):
+        data = self.client.get(reverse("api-schedule-list"), data={"active": "false"}).json()
+        self.assertEqual([schedule["id"] for schedule in data["results"]], [str(self.other.id)])
+
+        data = self.client.get(reverse("api-job-list"), data={"schedule": self.other.id}).json()
+        self.assertEqual(data["results"], [])
+
+        response = self.client.get(reverse("api-job-list"), data={"status": "unknown"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail(self):
+        response = self.client.get(reverse("api-schedule-detail", args=[self.schedule.id]), data={"fields": "name"})
+        self.assertEqual(response.json(), {"name": "test"})
+
+        self.other.upstream.add(self.schedule)
+        response = self.client.get(reverse("api-schedule-detail", args=[self.other.id]), data={"fields": "id,upstream"})
+        self.assertEqual(response.json(), {"id": str(self.other.id), "upstream": [str(self.schedule.id)]})
+
+        response = self.client.get(reverse("api-job-detail", args=[self.schedule.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_secrets_redacted(self):
+        Credential.objects.create(name="registry", username="user", password="secret")
+        Node.objects.create(name="node", host="node", secret="secret")
+
+        credential = self.client.get(reverse("api-credential-list")).json()["results"][0]
+        self.assertEqual((credential["username"], credential["password"]), ("user", "********"))
+        node = self.client.get(reverse("api-node-list")).json()["results"][0]
+        self.assertEqual(node["secret"], "********")
+
+    def test_conditional_get(self):
+        response = self.client.get(reverse("api-schedule-list"))
+        etag = response["ETag"]
+
+        response = self.client.get(reverse("api-schedule-list"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        Schedule.objects.filter(pk=self.schedule.pk).update(name="renamed")
+        response = self.client.get(reverse("api-schedule-list"), headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+
+
+@mock.patch("apps.core.triggers.executor")
+class TestTriggerView(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = add_default_data()
+        cls.schedule = Schedule.objects.create(name="test", cron_rule="0 0 * * *", image="test", singleton=True)
+
+    def setUp(self):
+        self.url = reverse("api-schedule-trigger", args=[self.schedule.id])
+        self.auth = "Basic " + base64.b64encode(b"testuser:testpassword").decode()
+
+    def post(self, data=None, **headers):
+        return self.client.post(
+            self.url,
+            data=json.dumps(data or {}),
+            content_type="application/json",
+            headers={"Authorization": self.auth, **headers},
+        )
+
+    def test_trigger(self, executor):
+        response = self.post({"env": {"KEY": "override"}})
+        self.assertEqual(response.status_code, 202)
+
+        job = Job.objects.get(pk=response.json()["job"])
+        self.assertEqual((job.status, job.env_overrides), (JobStatusChoices.QUEUED, {"KEY": "override"}))
+        # Provisioned by the in-process pool
+        command = executor.submit.call_args.args[1]
+        self.assertEqual(command.job, job)
+
+    def test_idempotency_key(self, executor):
+        first = self.post(**{"Idempotency-Key": "delivery-1"})
+        second = self.post(**{"Idempotency-Key": "delivery-1"})
+
+        self.assertEqual((first.status_code, second.status_code), (202, 200))
+        self.assertEqual(first.json()["job"], second.json()["job"])
+        self.assertFalse(second.json()["created"])
+        self.assertEqual(executor.submit.call_count, 1)
+
+    def test_singleton_already_running(self, executor):
+        self.assertEqual(self.post().status_code, 202)
+        self.assertEqual(self.post().status_code, 409)
+        self.assertEqual(executor.submit.call_count, 1)
+
+    def test_authentication(self, executor):
+        self.auth = "Basic " + base64.b64encode(b"testuser:wrong").decode()
+        self.assertEqual(self.post().status_code, 401)
+
+        self.client.force_login(self.user)
+        csrf_client = Client(enforce_csrf_checks=True)
+        csrf_client.force_login(self.user)
+        response = csrf_client.post(self.url, data="{}", content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+        executor.submit.assert_not_called()
+
+    def test_invalid_requests(self, executor):
+        self.assertEqual(self.post({"env": {"KEY": 1}}).status_code, 400)
+        self.url = reverse("api-schedule-trigger", args=[uuid.uuid4()])
+        self.assertEqual(self.post().status_code, 404)
+        executor.submit.assert_not_called()
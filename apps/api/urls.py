@@ -0,0 +1,21 @@
+from django.urls import path
+
+from apps.api.views import (
+    CredentialResourceView,
+    JobResourceView,
+    NodeResourceView,
+    ScheduleResourceView,
+    TriggerView,
+)
+
+urlpatterns = [
+    path("schedules/", ScheduleResourceView.as_view(), name="api-schedule-list"),
+    path("schedules/<uuid:pk>/", ScheduleResourceView.as_view(), name="api-schedule-detail"),
+    path("schedules/<uuid:pk>/trigger/", TriggerView.as_view(), name="api-schedule-trigger"),
+    path("jobs/", JobResourceView.as_view(), name="api-job-list"),
+    path("jobs/<uuid:pk>/", JobResourceView.as_view(), name="api-job-detail"),
+    path("credentials/", CredentialResourceView.as_view(), name="api-credential-list"),
+    path("credentials/<uuid:pk>/", CredentialResourceView.as_view(), name="api-credential-detail"),
+    path("nodes/", NodeResourceView.as_view(), name="api-node-list"),
+    path("nodes/<uuid:pk>/", NodeResourceView.as_view(), name="api-node-detail"),
+]
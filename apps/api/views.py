@@ -0,0 +1,293 @@
+import base64
+import json
+
+from django.contrib.auth import authenticate
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
+from django.views.generic import View
+
+from apps.core import transfer, triggers
+from apps.core.forms import JobFilterForm
+from apps.core.management.commands.run_schedule import JobAborted
+from apps.core.models import Credential, Job, Schedule
+from apps.core.pagination import KeysetPaginator
+from apps.node.models import Node
+
+REDACTED = "********"
+# Query parameters that aren't filters
+RESERVED_PARAMS = {"fields", "cursor", "limit"}
+IDEMPOTENCY_KEY_MAX_LENGTH = 100
+
+
+class BadRequest(Exception):
+    pass
+
+
+def basic_auth_user(request):
+    """User of the HTTP Basic credentials of the request, for clients without a session."""
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "basic":
+        return None
+    try:
+        username, _, password = base64.b64decode(credentials).decode().partition(":")
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return authenticate(request, username=username, password=password)
+
+
+class ResourceView(View):
+    """
+    Read-only JSON endpoint over a model, authenticated by the session of the web UI or HTTP
+    Basic credentials.
+
+    Listings are keyset paginated (`cursor`, `limit`) and filtered on the `filters` fields
+    (`?active=true`). `fields` selects the fields returned, the only ones loaded from the
+    database. Responses carry an ETag and answer If-None-Match with 304 Not Modified.
+    """
+
+    model = None
+    fields: tuple[str, ...] = ()
+    # Fields returned when `fields` isn't given, all of them by default
+    default_fields: tuple[str, ...] | None = None
+    redacted: tuple[str, ...] = ()
+    filters: tuple[str, ...] = ()
+    ordering: tuple[str, ...] = ("-created_at", "-id")
+    page_size = 50
+    max_page_size = 500
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            request.user = basic_auth_user(request) or request.user
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except BadRequest as err:
+            return JsonResponse({"error": str(err)}, status=400)
+
+    def get_field(self, name: str):
+        return self.model._meta.get_field(name)  # pylint: disable=protected-access
+
+    def get_fields(self) -> list[str]:
+        requested = self.request.GET.get("fields")
+        if not requested:
+            return list(self.default_fields or self.fields)
+        fields = [name.strip() for name in requested.split(",") if name.strip()]
+        unknown = sorted(set(fields) - set(self.fields))
+        if unknown:
+            raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+
+    def get_ordering(self) -> tuple[str, ...]:
+        return self.ordering
+
+    def get_queryset(self, fields: list[str]):
+        loaded = {*fields, *(name.lstrip("-") for name in self.get_ordering())}
+        many = [name for name in loaded if self.get_field(name).many_to_many]
+        queryset = self.model.objects.only(*loaded.difference(many))
+        # One more query per page for each relation, only the ids are loaded
+        for name in many:
+            related = self.get_field(name).related_model.objects.only("pk")
+            queryset = queryset.prefetch_related(models.Prefetch(name, queryset=related))
+        return queryset
+
+    def filter_queryset(self, queryset):
+        for name, value in self.request.GET.items():
+            if name in RESERVED_PARAMS or name not in self.filters:
+                continue
+            try:
+                field = self.get_field(name)
+                if isinstance(field, models.BooleanField):
+                    # Accepts true/false as well as the True/False/1/0 of the field
+                    value = value.capitalize()
+                queryset = queryset.filter(**{name: field.to_python(value)})
+            except (FieldDoesNotExist, ValidationError) as err:
+                raise BadRequest(f"Invalid value for {name}: {value!r}") from err
+        return queryset
+
+    def get_page_size(self) -> int:
+        try:
+            limit = int(self.request.GET.get("limit", self.page_size))
+        except ValueError as err:
+            raise BadRequest("limit must be an integer") from err
+        return min(max(limit, 1), self.max_page_size)
+
+    def serialize(self, obj, fields: list[str]) -> dict:
+        record = {}
+        for name in fields:
+            # Foreign keys are returned as the id of the related object, many-to-many as a list of ids
+            field = self.get_field(name)
+            if field.many_to_many:
+                value = [related.pk for related in getattr(obj, name).all()]
+            else:
+                value = field.value_from_object(obj)
+            record[name] = REDACTED if name in self.redacted and value else value
+        return record
+
+    def get(self, request, pk=None):
+        fields = self.get_fields()
+        queryset = self.get_queryset(fields)
+        if pk is not None:
+            obj = queryset.filter(pk=pk).first()
+            if obj is None:
+                return JsonResponse({"error": "Not found"}, status=404)
+            return self.render(self.serialize(obj, fields))
+
+        paginator = KeysetPaginator(self.filter_queryset(queryset), self.get_ordering(), self.get_page_size())
+        try:
+            objects, next_cursor = paginator.page(request.GET.get("cursor"))
+        except ValueError as err:
+            raise BadRequest(str(err)) from err
+        return self.render({"results": [self.serialize(obj, fields) for obj in objects], "next": next_cursor})
+
+    def render(self, data: dict):
+        response = JsonResponse(data, encoder=DjangoJSONEncoder)
+        set_response_etag(response)
+        return get_conditional_response(self.request, etag=response["ETag"], response=response)
+
+
+class ScheduleResourceView(ResourceView):
+    model = Schedule
+    fields = (*transfer.FIELDS, "created_by", "created_at", "sequential_failures")
+    filters = ("active", "singleton", "credential", "created_by", "pull_policy")
+
+
+class JobResourceView(ResourceView):
+    """Jobs, filtered and ordered like the job list (`status`, `schedule`, `since`, `until`, `order`)."""
+
+    model = Job
+    fields = (
+        "id",
+        "schedule",
+        "node",
+        "status",
+        "status_code",
+        "created_at",
+        "started_at",
+        "finished_at",
+        "duration_ms",
+        "provisioning",
+        "pull_policy",
+        "image_cache_hit",
+        "log_path",
+        "log_size",
+        "log_truncated",
+        "exception_on_build",
+        "exception_on_pull",
+        "exception_on_run",
+        "state",
+        "log",
+    )
+    # The container state and the legacy log column are heavy, only loaded on request
+    default_fields = fields[:-2]
+    filters = ("node",)
+
+    def get_filter_form(self) -> JobFilterForm:
+        form = JobFilterForm(self.request.GET)
+        if not form.is_valid():
+            errors = "; ".join(f"{name}: {' '.join(messages)}" for name, messages in form.errors.items())
+            raise BadRequest(errors)
+        return form
+
+    def get_ordering(self) -> tuple[str, ...]:
+        return self.get_filter_form().ordering()
+
+    def filter_queryset(self, queryset):
+        return self.get_filter_form().filter(super().filter_queryset(queryset))
+
+
+class CredentialResourceView(ResourceView):
+    model = Credential
+    fields = ("id", "name", "username", "password", "category")
+    redacted = ("password",)
+    filters = ("category",)
+    ordering = ("name", "id")
+
+
+class NodeResourceView(ResourceView):
+    model = Node
+    fields = (
+        "id",
+        "name",
+        "host",
+        "port",
+        "use_ssh",
+        "use_tls",
+        "active",
+        "secret",
+        "healthy",
+        "probed_at",
+        "probe_error",
+        "latency_ms",
+        "running_containers",
+        "cpu_capacity",
+        "memory_capacity",
+    )
+    redacted = ("secret",)
+    filters = ("active", "healthy")
+    ordering = ("name", "id")
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class TriggerView(View):
+    """
+    Runs a schedule now: `POST {"env": {...}}` queues a job with the environment variables
+    overriding those of the schedule and starts it in-process. Requests repeating the
+    `Idempotency-Key` header of a previous trigger of the schedule return its job instead.
+
+    Webhooks authenticate with HTTP Basic credentials, sessions of the web UI need the CSRF token.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        rejected = self.authenticate(request)
+        if rejected:
+            return rejected
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except BadRequest as err:
+            return JsonResponse({"error": str(err)}, status=400)
+
+    @staticmethod
+    def authenticate(request):
+        """Returns the error response of unauthenticated requests."""
+        if basic_auth_user(request):
+            return None
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required"}, status=401)
+        if CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {}):
+            return JsonResponse({"error": "CSRF verification failed"}, status=403)
+        return None
+
+    @staticmethod
+    def parse(request) -> tuple[str | None, dict | None]:
+        idempotency_key = request.headers.get("Idempotency-Key") or None
+        if idempotency_key and len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise BadRequest("Idempotency-Key is too long")
+        try:
+            payload = json.loads(request.body or b"{}")
+        except ValueError as err:
+            raise BadRequest("Invalid JSON") from err
+        env = payload.get("env") if isinstance(payload, dict) else None
+        if env is not None and not (isinstance(env, dict) and all(isinstance(value, str) for value in env.values())):
+            raise BadRequest("env must map names to string values")
+        return idempotency_key, env
+
+    def post(self, request, pk):
+        idempotency_key, env = self.parse(request)
+        if not Schedule.objects.filter(pk=pk).exists():
+            return JsonResponse({"error": "Not found"}, status=404)
+        try:
+            job, created = triggers.trigger(pk, env_overrides=env, idempotency_key=idempotency_key)
+        except JobAborted as err:
+            return JsonResponse({"error": str(err)}, status=409)
+        return JsonResponse(
+            {"job": job.id, "status": job.status, "created": created},
+            encoder=DjangoJSONEncoder,
+            status=202 if created else 200,
+        )
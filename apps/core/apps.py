@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.core"
+
+    def ready(self):
+        # Connects the receivers keeping the sidebar counters up to date
+        import apps.core.signals  # pylint: disable=import-outside-toplevel,unused-import
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.core.models import Credential, Job, Schedule
+from apps.node.models import Node
+
+COUNTED_MODELS = {
+    "schedule": Schedule,
+    "job": Job,
+    "credential": Credential,
+    "node": Node,
+}
+
+
+def cache_key(resource: str) -> str:
+    return f"resource_count:{resource}"
+
+
+def get_count(resource: str) -> int:
+    """
+    Number of objects of a resource, counted once per RESOURCE_COUNT_TTL seconds and kept up to
+    date in between by the signals of `apps.core.signals`.
+    """
+    model = COUNTED_MODELS.get(resource)
+    if model is None:
+        return 0
+    return cache.get_or_set(cache_key(resource), model.objects.count, settings.RESOURCE_COUNT_TTL)
+
+
+def adjust(resource: str, delta: int) -> None:
+    """Increments a cached count in place, a count that isn't cached is left to the next COUNT."""
+    try:
+        cache.incr(cache_key(resource), delta)
+    except ValueError:
+        pass
+
+
+def invalidate(resource: str) -> None:
+    cache.delete(cache_key(resource))
@@ -0,0 +1,184 @@
+import calendar
+import functools
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from cron_descriptor import (
+    ExpressionDescriptor,
+    FormatException,
+    MissingFieldException,
+    Options,
+)
+
+MONTH_NAMES = {name.lower(): index for index, name in enumerate(calendar.month_abbr) if name}
+DAY_NAMES = {name.lower(): (index + 1) % 7 for index, name in enumerate(calendar.day_abbr)}
+
+ALIASES = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+# A rule that can't match (e.g. "0 0 30 2 *") must not loop forever.
+MAX_SEARCH = timedelta(days=366 * 5)
+
+# Distinct cron rules kept parsed, listings and the scheduler mostly share a handful of them
+PARSE_CACHE_SIZE = 1024
+
+DESCRIPTION_OPTIONS = Options()
+DESCRIPTION_OPTIONS.verbose = True
+DESCRIPTION_OPTIONS.use_24hour_time_format = True
+
+
+class CronParseError(ValueError):
+    pass
+
+
+def _parse_value(value: str, names: dict[str, int]) -> int:
+    value = value.lower()
+    if value in names:
+        return names[value]
+    if not value.isdigit():
+        raise CronParseError(f"Invalid value {value!r}")
+    return int(value)
+
+
+def _parse_field(field: str, low: int, high: int, names: dict[str, int] | None = None) -> frozenset[int]:
+    names = names or {}
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, raw_step = part.split("/", 1)
+            if not raw_step.isdigit() or int(raw_step) == 0:
+                raise CronParseError(f"Invalid step {raw_step!r}")
+            step = int(raw_step)
+
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            raw_start, raw_end = part.split("-", 1)
+            start, end = _parse_value(raw_start, names), _parse_value(raw_end, names)
+        else:
+            start = _parse_value(part, names)
+            # "5/15" means "from 5 to the end of the range, every 15"
+            end = high if step > 1 else start
+
+        if start < low or end > high or start > end:
+            raise CronParseError(f"Value {part!r} out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronRule:  # pylint: disable=too-many-instance-attributes
+    """
+    Parsed five-field cron expression (minute, hour, day of month, month, day of week).
+
+    Follows the semantics of the cron daemon: when both day of month and day of week
+    are restricted, a day matches if either of them matches.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise CronParseError("Cronjob expression is composed of 5 elements")
+
+        minute, hour, day, month, weekday = fields
+        self.minutes = _parse_field(minute, 0, 59)
+        self.hours = _parse_field(hour, 0, 23)
+        self.days = _parse_field(day, 1, 31)
+        self.months = _parse_field(month, 1, 12, MONTH_NAMES)
+        # Both 0 and 7 are Sunday
+        self.weekdays = frozenset(value % 7 for value in _parse_field(weekday, 0, 7, DAY_NAMES))
+        self.any_day = day.startswith("*")
+        self.any_weekday = weekday.startswith("*")
+
+    def __repr__(self):
+        return f"CronRule({self.expression!r})"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_match = moment.day in self.days
+        # Python's weekday() starts at Monday=0, cron at Sunday=0
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+    def matches(self, moment: datetime) -> bool:
+        return (
+            moment.minute in self.minutes
+            and moment.hour in self.hours
+            and moment.month in self.months
+            and self._day_matches(moment)
+        )
+
+    def next_fire(self, after: datetime) -> datetime | None:
+        """
+        Returns the first instant strictly after `after` matched by this rule, keeping the
+        timezone of `after`. Returns None if the rule can never match (e.g. February 30th).
+        """
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + MAX_SEARCH
+
+        while moment < limit:
+            if moment.month not in self.months:
+                year, month = (moment.year + 1, 1) if moment.month == 12 else (moment.year, moment.month + 1)
+                moment = moment.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+                continue
+            if moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+                continue
+            return moment
+        return None
+
+
+@dataclass(frozen=True)
+class ParsedRule:
+    """
+    A cron expression parsed once for all its uses. `rule` is None if the scheduler can't run
+    it, `description` is None if it can't be described.
+    """
+
+    expression: str
+    rule: CronRule | None
+    description: str | None
+    error: str | None = None
+
+    @property
+    def valid(self) -> bool:
+        return self.rule is not None and self.description is not None
+
+    def next_fires(self, after: datetime) -> Iterator[datetime]:
+        """Yields the instants matched by the rule after `after`, in order."""
+        if self.rule is None:
+            return
+        moment = self.rule.next_fire(after)
+        while moment is not None:
+            yield moment
+            moment = self.rule.next_fire(moment)
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse(expression: str) -> ParsedRule:
+    """Parses and describes a cron expression, memoized per expression string."""
+    try:
+        description = ExpressionDescriptor(expression, DESCRIPTION_OPTIONS).get_description()
+    except (FormatException, MissingFieldException):
+        description = None
+    try:
+        rule, error = CronRule(expression), None
+    except CronParseError as err:
+        rule, error = None, str(err)
+    return ParsedRule(expression=expression, rule=rule, description=description, error=error)
@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from apps.core import cron
+from apps.core.models import CrontabVersion, Schedule
+
+logger = logging.getLogger(__name__)
+
+# Every file of CRONTAB_PATH starting with it belongs to crontainer, including the legacy
+# `ct_<schedule id>` files, and is removed when it's not part of the desired set
+FILE_PREFIX = "ct_"
+HEADER = "# Managed by crontainer, changes are overwritten\n"
+
+
+def shard_name(schedule_id, shards: int) -> str:
+    """Stable file of a schedule, `ct_<id>` when sharding is disabled."""
+    if shards <= 0:
+        return f"{FILE_PREFIX}{schedule_id}"
+    digest = hashlib.sha256(str(schedule_id).encode()).digest()
+    return f"{FILE_PREFIX}{int.from_bytes(digest[:8], 'big') % shards:02d}"
+
+
+def render(schedules, shards: int) -> dict[str, str]:
+    """Renders the crontab files of `schedules` by file name, invalid cron rules are left out."""
+    lines: dict[str, list[str]] = {}
+    for schedule in sorted(schedules, key=lambda schedule: str(schedule.id)):
+        if not cron.parse(schedule.cron_rule).valid:
+            logger.warning("[%s] invalid cron rule %r, not added to the crontab", schedule.id, schedule.cron_rule)
+            continue
+        line = settings.CRONJOB_CMD.format(schedule_id=schedule.id, cron_rule=schedule.cron_rule, delay=schedule.offset)
+        lines.setdefault(shard_name(schedule.id, shards), []).append(line)
+    return {name: HEADER + "".join(f"{line}\n" for line in entries) for name, entries in lines.items()}
+
+
+def desired() -> dict[str, str]:
+    """Crontab files of the active schedules, as they should be on disk."""
+    schedules = Schedule.objects.filter(active=True).only("id", "cron_rule", "spread_seconds")
+    return render(schedules, settings.CRONTAB_SHARDS)
+
+
+def current(path: Path) -> dict[str, str]:
+    if not path.is_dir():
+        return {}
+    return {entry.name: entry.read_text(encoding="utf-8") for entry in path.glob(f"{FILE_PREFIX}*") if entry.is_file()}
+
+
+def write_atomic(path: Path, content: str) -> None:
+    """Replaces `path` at once, cron never reads a partially written file."""
+    # cron ignores files with a dot in their name, the temporary file included
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(content)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@dataclass
+class SyncResult:
+    written: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.written or self.removed)
+
+
+def sync(path: Path | None = None, dry_run: bool = False, wanted: dict[str, str] | None = None) -> SyncResult:
+    """
+    Brings the crontab files of `path` (CRONTAB_PATH by default) in line with `wanted`, the
+    active schedules by default, only writing the files whose content differs and removing
+    stale ones.
+    """
+    path = Path(path or settings.CRONTAB_PATH)
+    wanted, existing = desired() if wanted is None else wanted, current(path)
+    result = SyncResult(
+        written=sorted(name for name, content in wanted.items() if existing.get(name) != content),
+        removed=sorted(name for name in existing if name not in wanted),
+    )
+    if dry_run:
+        return result
+
+    if result.written:
+        path.mkdir(parents=True, exist_ok=True)
+    for name in result.written:
+        write_atomic(path / name, wanted[name])
+    for name in result.removed:
+        (path / name).unlink(missing_ok=True)
+    return result
+
+
+def clear(path: Path | None = None) -> SyncResult:
+    """Removes the crontab files of crontainer, so cron doesn't fire schedules the daemon fires as well."""
+    return sync(path, wanted={})
+
+
+def mark_dirty() -> None:
+    """Asks the crontab syncer to run soon, called when schedules change in any process."""
+    CrontabVersion.bump()
+
+
+class CrontabSync:
+    """
+    Syncs the crontab files when schedules are marked dirty, checked every `interval` seconds
+    with one query on the CrontabVersion row, and at least every `resync` seconds.
+    """
+
+    def __init__(self, interval: int, resync: int):
+        self.interval = interval
+        self.resync = resync
+        self.version = None
+        self.stopped = threading.Event()
+
+    def dirty(self) -> bool:
+        return CrontabVersion.current() != self.version
+
+    def sync_once(self) -> SyncResult:
+        # Read first, schedules changed during the sync mark it dirty again
+        self.version = CrontabVersion.current()
+        result = sync()
+        if result.changed:
+            logger.info("Crontab synced, %s written, %s removed", len(result.written), len(result.removed))
+        return result
+
+    def run_forever(self) -> None:
+        last_sync = None
+        while not self.stopped.is_set():
+            if last_sync is None or self.dirty() or time.monotonic() - last_sync >= self.resync:
+                try:
+                    self.sync_once()
+                except Exception:
+                    logger.exception("Failed to sync the crontab")
+                last_sync = time.monotonic()
+                close_old_connections()
+            self.stopped.wait(self.interval)
+
+    def stop(self) -> None:
+        self.stopped.set()
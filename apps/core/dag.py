@@ -0,0 +1,112 @@
+import logging
+from collections import defaultdict
+
+from django.db.models import Max
+from django.db.models.functions import Coalesce
+
+from apps.core import triggers
+from apps.core.management.commands.run_schedule import JobAborted
+from apps.core.models import Job, Schedule
+
+logger = logging.getLogger(__name__)
+
+Edge = Schedule.upstream.through
+
+
+def creates_cycle(schedule_id, upstream_ids) -> bool:
+    """Tells whether making `upstream_ids` the upstream schedules of `schedule_id` would close a cycle."""
+    parents = defaultdict(set)
+    for from_id, to_id in Edge.objects.exclude(from_schedule_id=schedule_id).values_list(
+        "from_schedule_id", "to_schedule_id"
+    ):
+        parents[from_id].add(to_id)
+
+    # Walks up from the new upstream schedules, a cycle leads back to the schedule itself
+    pending, seen = list(upstream_ids), set()
+    while pending:
+        current = pending.pop()
+        if current == schedule_id:
+            return True
+        if current not in seen:
+            seen.add(current)
+            pending.extend(parents[current])
+    return False
+
+
+def has_cycle() -> bool:
+    """Tells whether the upstream links of all schedules contain a cycle, checked after bulk changes."""
+    children, upstream_count = defaultdict(list), defaultdict(int)
+    for from_id, to_id in Edge.objects.values_list("from_schedule_id", "to_schedule_id"):
+        children[to_id].append(from_id)
+        upstream_count[from_id] += 1
+        upstream_count.setdefault(to_id, 0)
+
+    # Removes schedules whose upstreams were all removed, what is left is in or behind a cycle
+    pending = [schedule_id for schedule_id, count in upstream_count.items() if count == 0]
+    removed = 0
+    while pending:
+        removed += 1
+        for child in children[pending.pop()]:
+            upstream_count[child] -= 1
+            if upstream_count[child] == 0:
+                pending.append(child)
+    return removed < len(upstream_count)
+
+
+def ready_downstream(schedule_id) -> list[Schedule]:
+    """
+    Active downstream schedules of `schedule_id` whose upstream schedules all succeeded since
+    their last run. A schedule with several upstreams (fan-in) waits for the last one.
+    """
+    downstream = list(Schedule.objects.filter(upstream=schedule_id, active=True).prefetch_related("upstream"))
+    if not downstream:
+        return []
+
+    upstream_ids = {upstream.id for schedule in downstream for upstream in schedule.upstream.all()}
+    last_success = dict(
+        Job.objects.filter(schedule_id__in=upstream_ids, status_code=0)
+        .values("schedule_id")
+        # Containers without a finish time in their state count as finished when created
+        .annotate(last_finished_at=Max(Coalesce("finished_at", "created_at")))
+        .values_list("schedule_id", "last_finished_at")
+    )
+    last_run = dict(
+        Job.objects.filter(schedule__in=downstream)
+        .values("schedule_id")
+        .annotate(last_created_at=Max("created_at"))
+        .values_list("schedule_id", "last_created_at")
+    )
+
+    ready = []
+    for schedule in downstream:
+        since = last_run.get(schedule.id)
+        if all(
+            last_success.get(upstream.id) and (since is None or last_success[upstream.id] > since)
+            for upstream in schedule.upstream.all()
+        ):
+            ready.append(schedule)
+    return ready
+
+
+def dispatch_downstream(job: Job) -> list[Job]:
+    """
+    Runs the downstream schedules of a successful job that are ready. Idempotent: the job id is
+    the idempotency key of the runs it triggers, the event watcher and the sweep may both call it.
+    """
+    if job.status_code != 0:
+        return []
+
+    jobs = []
+    for schedule in ready_downstream(job.schedule_id):
+        try:
+            downstream_job, created = triggers.trigger(schedule.id, idempotency_key=f"upstream:{job.id}")
+        except JobAborted as err:
+            logger.warning("[%s] downstream of job %s not started: %s", schedule.id, job.id, err)
+            continue
+        except Exception:
+            # Deleted meanwhile, or a database error, the other downstream schedules still start
+            logger.exception("[%s] failed to start downstream of job %s", schedule.id, job.id)
+            continue
+        if created:
+            jobs.append(downstream_job)
+    return jobs
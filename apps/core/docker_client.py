@@ -0,0 +1,16 @@
+import functools
+
+import docker
+
+# Labels set on every job container, used to find crontainer managed containers
+JOB_LABEL = "crontainer.job"
+SCHEDULE_LABEL = "crontainer.schedule"
+
+
+@functools.cache
+def get_client() -> docker.DockerClient:
+    """
+    Returns the process wide Docker client, created on first use so that importing a module
+    doesn't require a reachable Docker daemon. The client is thread safe and reused by every job.
+    """
+    return docker.from_env()
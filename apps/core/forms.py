@@ -1,10 +1,9 @@
-import cron_descriptor
-from cron_descriptor import get_description
 from django import forms
 from django.core.exceptions import ValidationError
 from django.urls import reverse_lazy
 
-from apps.core.models import Schedule
+from apps.core import cron, dag
+from apps.core.models import JobStatusChoices, Schedule
 
 
 class ScheduleCreateForm(forms.ModelForm):
@@ -19,8 +18,13 @@ class ScheduleCreateForm(forms.ModelForm):
             "env_vars",
             "image",
             "credential",
+            "upstream",
             "cpu",
             "memory",
+            "spread_seconds",
+            "pull_policy",
+            "pull_refresh_minutes",
+            "image_digest",
         ]
 
         widgets = {
@@ -37,10 +41,8 @@ class ScheduleCreateForm(forms.ModelForm):
         data = self.cleaned_data["cron_rule"]
         if len(data.split(" ")) != 5:
             raise ValidationError("Cronjob expression is composed of 5 elements")
-        try:
-            get_description(data)
-        except cron_descriptor.Exception.FormatException as err:
-            raise ValidationError("Not a valid cronjob expression") from err
+        if not cron.parse(data).valid:
+            raise ValidationError("Not a valid cronjob expression")
 
         return data
 
@@ -65,8 +67,13 @@ class ScheduleUpdateForm(forms.ModelForm):
             "singleton",
             "env_vars",
             "credential",
+            "upstream",
             "cpu",
             "memory",
+            "spread_seconds",
+            "pull_policy",
+            "pull_refresh_minutes",
+            "image_digest",
         ]
 
         widgets = {
@@ -79,14 +86,22 @@ class ScheduleUpdateForm(forms.ModelForm):
             ),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["upstream"].queryset = Schedule.objects.exclude(pk=self.instance.pk)
+
+    def clean_upstream(self):
+        upstream = self.cleaned_data["upstream"]
+        if dag.creates_cycle(self.instance.pk, [schedule.pk for schedule in upstream]):
+            raise ValidationError("These upstream schedules would make the schedule depend on itself")
+        return upstream
+
     def clean_cron_rule(self):
         data = self.cleaned_data["cron_rule"]
         if len(data.split(" ")) != 5:
             raise ValidationError("Cronjob expression is composed of 5 elements")
-        try:
-            get_description(data)
-        except cron_descriptor.Exception.FormatException as err:
-            raise ValidationError("Not a valid cronjob expression") from err
+        if not cron.parse(data).valid:
+            raise ValidationError("Not a valid cronjob expression")
 
         return data
 
@@ -98,3 +113,36 @@ class ScheduleUpdateForm(forms.ModelForm):
             raise ValidationError("Keys and values must have the same length")
 
         return dict(zip(keys, values))
+
+
+class JobFilterForm(forms.Form):
+    ORDERINGS = {
+        "newest": ("-created_at", "-id"),
+        "longest": ("-duration_ms", "-id"),
+    }
+
+    order = forms.ChoiceField(choices=[("newest", "Newest first"), ("longest", "Longest first")], required=False)
+    status = forms.ChoiceField(choices=[("", "Any status"), *JobStatusChoices.choices], required=False)
+    schedule = forms.UUIDField(required=False)
+    since = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    until = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+
+    def filter(self, queryset):
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data["status"]:
+            queryset = queryset.filter(status=data["status"])
+        if data["schedule"]:
+            queryset = queryset.filter(schedule_id=data["schedule"])
+        if data["since"]:
+            queryset = queryset.filter(created_at__date__gte=data["since"])
+        if data["until"]:
+            queryset = queryset.filter(created_at__date__lte=data["until"])
+        if data["order"] == "longest":
+            queryset = queryset.filter(duration_ms__isnull=False)
+        return queryset
+
+    def ordering(self) -> tuple[str, ...]:
+        order = self.cleaned_data.get("order") if self.is_valid() else None
+        return self.ORDERINGS[order or "newest"]
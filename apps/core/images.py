@@ -0,0 +1,162 @@
+import logging
+import re
+import subprocess
+from datetime import timedelta
+
+import docker
+from django.conf import settings
+from django.utils import timezone
+
+from apps.core.models import PulledImage, PullPolicyChoices, Schedule
+from apps.node.models import Node
+from apps.node.pool import LOCAL, node_key, pool
+
+logger = logging.getLogger(__name__)
+
+COMMIT_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+
+def digest_reference(image: str, digest: str) -> str:
+    """Replaces the tag or digest of an image reference: `ghcr.io/org/job:latest` -> `ghcr.io/org/job@sha256:...`"""
+    name = image.split("@", 1)[0]
+    registry, _, repository = name.rpartition("/")
+    repository = repository.split(":", 1)[0]
+    return f"{registry}/{repository}@{digest}" if registry else f"{repository}@{digest}"
+
+
+def image_present(client: docker.DockerClient, reference: str) -> bool:
+    try:
+        client.images.get(reference)
+    except docker.errors.ImageNotFound:
+        return False
+    return True
+
+
+def local_digest(client: docker.DockerClient, reference: str) -> str:
+    repo_digests = client.images.get(reference).attrs.get("RepoDigests") or []
+    return repo_digests[0].split("@", 1)[1] if repo_digests else ""
+
+
+def is_fresh(client: docker.DockerClient, schedule: Schedule, reference: str, host: str) -> bool:
+    """Tells whether the pull policy of the schedule allows running the local copy of the image."""
+    policy = schedule.pull_policy
+
+    if policy in (PullPolicyChoices.IF_NOT_PRESENT, PullPolicyChoices.PINNED_DIGEST):
+        return image_present(client, reference)
+
+    if policy == PullPolicyChoices.REFRESH:
+        fresh_since = timezone.now() - timedelta(minutes=schedule.pull_refresh_minutes or 0)
+        pulled = PulledImage.objects.filter(image=reference, host=host, pulled_at__gte=fresh_since).exists()
+        return pulled and image_present(client, reference)
+
+    return False
+
+
+def pull_image(client: docker.DockerClient, schedule: Schedule, host: str = LOCAL) -> tuple[str, bool]:
+    """
+    Makes the image of the schedule available locally according to its pull policy, returns the
+    reference to run and whether the registry pull was skipped.
+    """
+    reference = schedule.image
+    if schedule.pull_policy == PullPolicyChoices.PINNED_DIGEST:
+        reference = digest_reference(schedule.image, schedule.image_digest)
+
+    if is_fresh(client, schedule, reference, host):
+        return reference, True
+
+    credential = schedule.credential.json() if schedule.credential else None
+    response = client.api.pull(reference, auth_config=credential, stream=True, decode=True)
+    for step in response:
+        assert step
+
+    PulledImage.objects.update_or_create(
+        image=reference,
+        host=host,
+        defaults={"digest": local_digest(client, reference), "pulled_at": timezone.now()},
+    )
+    return reference, False
+
+
+def split_git_context(context: str) -> tuple[str, str, str]:
+    """Splits a Docker git build context `url#ref:subdir` into its parts, ref defaults to HEAD."""
+    url, _, fragment = context.partition("#")
+    ref, _, subdir = fragment.partition(":")
+    return url, ref or "HEAD", subdir
+
+
+def resolve_commit(url: str, ref: str) -> str | None:
+    """Resolves a remote ref to a commit with `git ls-remote`, without cloning. None if it can't."""
+    if COMMIT_PATTERN.match(ref):
+        return ref
+    # Never let a schedule's image pass options to git
+    if url.startswith("-") or ref.startswith("-"):
+        return None
+    try:
+        result = subprocess.run(
+            ["git", "ls-remote", "--", url, ref],
+            capture_output=True,
+            check=True,
+            text=True,
+            timeout=settings.GIT_LS_REMOTE_TIMEOUT,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    # Annotated tags also list the peeled commit as `refs/tags/<tag>^{}`, prefer it
+    lines = [line.split("\t") for line in result.stdout.splitlines() if "\t" in line]
+    peeled = [sha for sha, name in lines if name.endswith("^{}")]
+    commits = peeled or [sha for sha, _name in lines]
+    return commits[0] if commits else None
+
+
+def build_image(client: docker.DockerClient, schedule: Schedule) -> tuple[str, bool]:
+    """
+    Builds the git sourced image of the schedule once per commit. Returns the tag to run and
+    whether an image already built from the same commit was reused.
+    """
+    url, ref, subdir = split_git_context(schedule.image)
+    latest_tag = f"{schedule.id}:latest"
+    commit = resolve_commit(url, ref)
+
+    if commit is None:
+        # Unknown commit, nothing to reuse safely
+        _image, build_log = client.images.build(path=schedule.image, tag=latest_tag)
+        for step in build_log:
+            assert step
+        return latest_tag, False
+
+    commit_tag = f"{schedule.id}:{commit[:12]}"
+    if image_present(client, commit_tag):
+        return commit_tag, True
+
+    cache_from = [latest_tag] if settings.BUILD_CACHE_FROM and image_present(client, latest_tag) else None
+    path = f"{url}#{commit}:{subdir}" if subdir else f"{url}#{commit}"
+    image, build_log = client.images.build(path=path, tag=commit_tag, cache_from=cache_from)
+    for step in build_log:
+        assert step
+    image.tag(str(schedule.id), "latest")
+    return commit_tag, False
+
+
+def is_git_source(image: str) -> bool:
+    return image.lower().startswith(("http://", "https://", "git@"))
+
+
+def prewarm(schedule_id: str) -> None:
+    """
+    Pulls or builds the image of a schedule ahead of its next fire, following its pull policy,
+    on every node the job may be placed on. Unhealthy nodes are skipped, a failing node doesn't
+    keep the others from being prewarmed.
+    """
+    schedule = Schedule.objects.select_related("credential").filter(pk=schedule_id, active=True).first()
+    if schedule is None:
+        return
+    nodes = list(Node.objects.filter(active=True))
+    for node in [node for node in nodes if node.healthy] if nodes else [None]:
+        try:
+            client = pool.get(node)
+            if is_git_source(schedule.image):
+                build_image(client, schedule)
+            else:
+                pull_image(client, schedule, host=node_key(node))
+        except Exception:
+            logger.exception("[%s] failed to prewarm %s on node %s", schedule.id, schedule.image, node_key(node))
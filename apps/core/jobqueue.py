@@ -0,0 +1,81 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from uuid import UUID
+
+from django.db import close_old_connections
+
+from apps.core.management.commands.run_schedule import Command as RunScheduleCommand
+from apps.core.management.commands.run_schedule import JobAborted
+from apps.core.models import Job, JobStatusChoices
+from apps.node.placement import LimitReached
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Retries placing queued jobs every `interval` seconds and provisions the ones that found a
+    node on a bounded pool of worker threads.
+
+    Jobs are queued by `run_schedule` when no node has enough free CPU and memory for them, or
+    when a concurrency limit is reached. They are dispatched round-robin across schedules,
+    oldest first within a schedule, so a schedule with many queued fires can't starve others.
+    """
+
+    def __init__(self, workers: int, interval: int):
+        self.interval = interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="queue")
+        self.stopped = threading.Event()
+
+    def drain(self) -> None:
+        queues: dict[UUID, deque[Job]] = {}
+        for job in (
+            Job.objects.filter(status=JobStatusChoices.QUEUED).select_related("schedule").order_by("created_at", "id")
+        ):
+            queues.setdefault(job.schedule_id, deque()).append(job)
+
+        while queues:
+            for schedule_id in list(queues):
+                command = RunScheduleCommand()
+                try:
+                    placed = command.place_queued(queues[schedule_id].popleft())
+                except JobAborted:
+                    placed = False
+
+                if placed:
+                    self.executor.submit(self._provision, command)
+                    if not queues[schedule_id]:
+                        del queues[schedule_id]
+                    continue
+
+                reason = command.queued_reason
+                if isinstance(reason, LimitReached) and reason.scope == "global":
+                    return
+                if reason is not None:
+                    # The next jobs of the schedule need the same resources and limits
+                    del queues[schedule_id]
+                elif not queues[schedule_id]:
+                    del queues[schedule_id]
+
+    @staticmethod
+    def _provision(command: RunScheduleCommand) -> None:
+        try:
+            command.provision()
+        except JobAborted:
+            pass
+        except Exception:
+            logger.exception("[%s] failed to provision queued job", command.job.id)
+        finally:
+            close_old_connections()
+
+    def run_forever(self) -> None:
+        while not self.stopped.is_set():
+            self.drain()
+            close_old_connections()
+            self.stopped.wait(self.interval)
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,119 @@
+import gzip
+import os
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@dataclass
+class StoredLog:
+    pointer: str
+    size: int
+    truncated: bool
+
+
+class HeadTailBuffer:
+    """
+    Keeps the first `head` bytes and the last `tail` bytes of a byte stream. Head bytes are handed
+    to `write` as they arrive, tail bytes are held back in memory (at most `tail` + one chunk)
+    until `close`, so capturing a log of any size uses bounded memory.
+    """
+
+    def __init__(self, write, max_bytes: int):
+        self.write = write
+        self.head = max_bytes - max_bytes // 2
+        self.tail = max_bytes // 2
+        self.tail_chunks: deque[bytes] = deque()
+        self.tail_size = 0
+        self.size = 0
+
+    def feed(self, chunk: bytes) -> None:
+        head_room = self.head - self.size
+        self.size += len(chunk)
+        if head_room > 0:
+            self.write(chunk[:head_room])
+            chunk = chunk[head_room:]
+        if not chunk or not self.tail:
+            return
+
+        self.tail_chunks.append(chunk)
+        self.tail_size += len(chunk)
+        while self.tail_size - len(self.tail_chunks[0]) >= self.tail:
+            self.tail_size -= len(self.tail_chunks.popleft())
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > self.head + self.tail
+
+    def close(self) -> None:
+        tail = b"".join(self.tail_chunks)[-self.tail :] if self.tail else b""
+        if self.truncated:
+            skipped = self.size - self.head - len(tail)
+            self.write(f"\n\n[... {skipped} bytes truncated ...]\n\n".encode())
+        self.write(tail)
+
+
+class FileLogStore:
+    """Stores job logs as gzip files below `root`, the pointer is the path relative to it."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+
+    def save(self, name: str, chunks: Iterable[bytes]) -> StoredLog:
+        pointer = f"{name[:2]}/{name}.log.gz"
+        path = self.root / pointer
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wb") as fh:
+            buffer = HeadTailBuffer(fh.write, self.max_bytes)
+            for chunk in chunks:
+                buffer.feed(chunk)
+            buffer.close()
+        os.replace(tmp_path, path)
+
+        return StoredLog(pointer=pointer, size=buffer.size, truncated=buffer.truncated)
+
+    def open(self, pointer: str) -> BinaryIO:
+        return gzip.open(self.root / pointer, "rb")
+
+    def size(self, pointer: str) -> int:
+        # Uncompressed size from the gzip trailer (modulo 4GiB, well above any capped log)
+        with open(self.root / pointer, "rb") as fh:
+            fh.seek(-4, os.SEEK_END)
+            return int.from_bytes(fh.read(4), "little")
+
+    def delete(self, pointer: str) -> None:
+        (self.root / pointer).unlink(missing_ok=True)
+
+
+def read_tail(fh: BinaryIO, size: int, lines: int, window: int = 64 * 1024) -> tuple[int, bytes]:
+    """
+    Returns the offset and content of the last `lines` lines of a seekable log file. Reads a
+    growing window from the end instead of the whole file.
+    """
+    while True:
+        offset = max(size - window, 0)
+        fh.seek(offset)
+        data = fh.read(size - offset)
+        # A trailing newline doesn't start a new line
+        position = len(data) - 1 if data.endswith(b"\n") else len(data)
+        for _ in range(lines):
+            position = data.rfind(b"\n", 0, position)
+            if position == -1:
+                break
+        if position != -1:
+            return offset + position + 1, data[position + 1 :]
+        if offset == 0:
+            return 0, data
+        window *= 4
+
+
+def get_log_store():
+    store_class = import_string(settings.JOB_LOG_STORE)
+    return store_class(root=settings.JOB_LOG_ROOT, max_bytes=settings.JOB_LOG_MAX_BYTES)
@@ -0,0 +1,29 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from apps.core import transfer
+from apps.core.models import Schedule
+
+
+class Command(BaseCommand):
+    help = "Export the schedules to JSON, YAML or CSV, in the format read by import_schedules"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=list(transfer.FORMATS),
+            default="json",
+            help="Output format",
+        )
+        parser.add_argument("--output", default="-", help="File to write, the standard output by default")
+        parser.add_argument("--active", action="store_true", help="Only export the active schedules")
+
+    def handle(self, *args, **options):
+        queryset = Schedule.objects.filter(active=True) if options["active"] else Schedule.objects.all()
+        chunks = transfer.dump(queryset, options["format"])
+        if options["output"] == "-":
+            sys.stdout.writelines(chunks)
+            return
+        with open(options["output"], "w", encoding="utf-8", newline="") as fh:
+            fh.writelines(chunks)
@@ -0,0 +1,50 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core import crontab, transfer
+
+
+class Command(BaseCommand):
+    help = "Create or update schedules in bulk from a JSON, YAML or CSV file (or a schedule fixture)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, - reads the standard input")
+        parser.add_argument(
+            "--format",
+            choices=list(transfer.FORMATS),
+            default=None,
+            help="Format of the file, guessed from its extension by default",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of schedules inserted at a time",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or transfer.guess_format(options["path"])
+        if fmt not in transfer.FORMATS:
+            raise CommandError("Can't guess the format of the file, use --format")
+
+        try:
+            if options["path"] == "-":
+                result = transfer.import_schedules(transfer.load(sys.stdin, fmt), batch_size=options["batch_size"])
+            else:
+                with open(options["path"], encoding="utf-8") as fh:
+                    result = transfer.import_schedules(transfer.load(fh, fmt), batch_size=options["batch_size"])
+        except transfer.InvalidSchedules as err:
+            for error in err.errors:
+                self.stderr.write(self.style.ERROR(error))
+            raise CommandError(f"{err}, nothing was imported") from err
+        except (OSError, ValueError) as err:
+            raise CommandError(str(err)) from err
+
+        self.stdout.write(self.style.SUCCESS(f"{result.created} schedules created, {result.updated} updated"))
+        if settings.SCHEDULER_BACKEND == "cron":
+            sync = crontab.sync()
+            self.stdout.write(
+                self.style.SUCCESS(f"Crontab synced, {len(sync.written)} written, {len(sync.removed)} removed")
+            )
@@ -0,0 +1,61 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.core import retention
+from apps.core.models import Schedule
+
+
+class Command(BaseCommand):
+    help = "Roll up the job history by day, then archive and delete the jobs past their retention"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.JOB_PRUNE_BATCH_SIZE,
+            help="Number of jobs archived and deleted at a time",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=None,
+            help="Prune again every --interval seconds instead of exiting",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the jobs that would be pruned",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.prune(options["batch_size"], options["dry_run"])
+            if not options["interval"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
+
+    def prune(self, batch_size: int, dry_run: bool) -> None:
+        now = timezone.now()
+        until = timezone.localdate(now) - timedelta(days=1)
+        rollups = pruned = 0
+
+        with retention.JobArchive(settings.JOB_ARCHIVE_ROOT, now) as archive:
+            for schedule_id in Schedule.objects.values_list("id", flat=True):
+                if dry_run:
+                    pruned += retention.expired_jobs(schedule_id, now).count()
+                    continue
+                rollups += retention.rollup(schedule_id, until)
+                pruned += retention.prune(schedule_id, now, archive, batch_size)
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"{pruned} jobs would be pruned"))
+        elif pruned:
+            self.stdout.write(self.style.SUCCESS(f"{rollups} daily rollups, {pruned} jobs archived to {archive.path}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{rollups} daily rollups, no job to prune"))
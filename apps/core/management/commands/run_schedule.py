@@ -1,13 +1,34 @@
 import sys
 import time
+import uuid
 
 import docker
+import requests
 from django.core.exceptions import ValidationError
 from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
 
-from apps.core.models import Job, Schedule
+from apps.core import images
+from apps.core.docker_client import JOB_LABEL, SCHEDULE_LABEL
+from apps.core.models import Job, JobStatusChoices, Schedule, ScheduleLease
+from apps.node import placement, prober
+from apps.node.pool import node_key, pool, unreachable
 
-client = docker.from_env()
+
+class JobAborted(Exception):
+    """Raised when a schedule fire stops early. Failures are already recorded on the Job."""
+
+
+class DuplicateJob(JobAborted):
+    """Raised when a fire repeats an idempotency key, `job` is the job of the first one."""
+
+    def __init__(self, job: Job):
+        super().__init__(f"Job {job.id} already holds this idempotency key")
+        self.job = job
+
+
+class NodeUnreachable(Exception):
+    """Raised when the node of a job stops answering while it is provisioned, the job can be placed again."""
 
 
 class Command(BaseCommand):
@@ -18,13 +39,40 @@ class Command(BaseCommand):
         self.schedule = None
         self.job = None
         self.local_image = None
+        self.node = None
+        self.client = None
+        self.queued_reason = None
 
     def add_arguments(self, parser):
         parser.add_argument("schedule_id", type=str)
+        parser.add_argument(
+            "--delay",
+            type=int,
+            default=0,
+            help="Seconds to wait before starting, the offset of the schedule within its spread window",
+        )
 
     def handle(self, *args, **options):
-        schedule_id = options["schedule_id"]
+        # cron only fires on the minute
+        time.sleep(options["delay"])
+        try:
+            self.run(options["schedule_id"])
+        except JobAborted:
+            sys.exit(0)
+
+    def run(self, schedule_id: str) -> None:
+        """
+        Provisions and starts a Job for the given schedule. Used by `handle` for cron fires and
+        called directly by the resident scheduler, which avoids booting a process per fire.
+        """
+        self.enqueue(schedule_id)
+        self.dispatch()
 
+    def enqueue(self, schedule_id: str, env_overrides: dict | None = None, idempotency_key: str | None = None) -> Job:
+        """
+        Records a queued Job for the given schedule, `dispatch` then places and starts it. Raises
+        DuplicateJob when a job already holds `idempotency_key` for this schedule.
+        """
         # Check if schedule exists
         #
         try:
@@ -38,65 +86,153 @@ class Command(BaseCommand):
         #
         if not self.schedule.active:
             self.stdout.write(self.style.WARNING(f"Schedule {schedule_id} is not active, aborting..."))
-            sys.exit(0)
+            raise JobAborted(f"Schedule {schedule_id} is not active")
 
-        # Check if schedule is a singleton and no previous job is already running
+        # Check if schedule is a singleton and no previous job is still holding its lease
         #
-        if self.schedule.singleton:
-            if Job.objects.filter(schedule_id=schedule_id).exclude(status="exited").exists():
-                self.stdout.write(
-                    self.style.WARNING(
-                        f"Schedule {schedule_id} is a singleton and a Job is already running, aborting..."
-                    )
+        job_id = uuid.uuid4()
+        if self.schedule.singleton and not ScheduleLease.acquire(schedule_id, job_id):
+            self.stdout.write(
+                self.style.WARNING(f"Schedule {schedule_id} is a singleton and a Job is already running, aborting...")
+            )
+            raise JobAborted(f"Schedule {schedule_id} is a singleton and a Job is already running")
+
+        try:
+            with transaction.atomic():
+                self.job = Job.objects.create(
+                    id=job_id,
+                    schedule_id=schedule_id,
+                    status=JobStatusChoices.QUEUED,
+                    provisioning=True,
+                    env_overrides=env_overrides,
+                    idempotency_key=idempotency_key,
                 )
-                sys.exit(0)
+        except IntegrityError as exc:
+            ScheduleLease.release([job_id])
+            existing = Job.objects.get(schedule_id=schedule_id, idempotency_key=idempotency_key)
+            raise DuplicateJob(existing) from exc
+        return self.job
 
-        # Job Provisioning
-        #
-        self.job = Job.objects.create(schedule_id=schedule_id, provisioning=True)
+    def dispatch(self) -> None:
+        """
+        Places and starts the job recorded by `enqueue`, unless older jobs of the schedule are
+        still queued. Those need the same resources and limits, the queue starts them in order.
+        Queued jobs of other schedules don't hold it back: they may wait on their own limits or
+        on resources this job doesn't need, and the queue is fair among them.
+        """
+        if Job.objects.filter(
+            schedule_id=self.schedule.id, status=JobStatusChoices.QUEUED, created_at__lt=self.job.created_at
+        ).exists():
+            self.stdout.write(self.style.WARNING(f"[{self.schedule.id}] jobs are waiting, job {self.job.id} is queued"))
+            return
+        if self.place():
+            self.provision()
 
-        if self.schedule.image.lower().startswith(("http://", "https://", "git@")):
-            self.build_image()
-        else:
-            self.pull_image()
-        self.start_container()
+    def place_queued(self, job: Job) -> bool:
+        """Retries placing a queued job, `provision` then starts it if it was placed."""
+        self.job = job
+        self.schedule = job.schedule
+        return self.place()
 
-        self.stdout.write(self.style.SUCCESS(f"[{schedule_id}] successfully started job: {self.job.id}"))
+    def place(self) -> bool:
+        """
+        Reserves a node for the job, returns False if it stays queued until capacity frees up or
+        if another dispatcher placed it first.
+        """
+        try:
+            placement.assign(self.job)
+        except placement.AlreadyPlaced as e:
+            self.stdout.write(self.style.WARNING(f"[{self.schedule.id}] {e}, skipping"))
+            return False
+        except placement.NoCapacity as e:
+            self.queued_reason = e
+            self.stdout.write(self.style.WARNING(f"[{self.schedule.id}] {e}, job {self.job.id} is queued"))
+            return False
+        except placement.Unplaceable as e:
+            self.process_exception(e, "run")
+            self.stdout.write(self.style.ERROR(f"[{self.schedule.id}] {e}, aborting..."))
+            raise JobAborted() from e
+        self.node = self.job.node
+        return True
+
+    def provision(self) -> None:
+        try:
+            self.client = pool.get(self.node)
+        except Exception as e:
+            if self.node is not None:
+                self.fail_over(e)
+                return
+            self.process_exception(e, "run")
+            self.stdout.write(self.style.ERROR(f"[{self.schedule.id}] can't connect to the local Docker daemon"))
+            raise JobAborted() from e
+
+        try:
+            if images.is_git_source(self.schedule.image):
+                self.build_image()
+            else:
+                self.pull_image()
+            self.start_container()
+        except NodeUnreachable as e:
+            self.fail_over(e.__cause__)
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"[{self.schedule.id}] successfully started job: {self.job.id}"))
+
+    def fail_over(self, e: Exception) -> None:
+        """Drains the unreachable node of the job and queues it again, to be placed on another node."""
+        self.stdout.write(self.style.ERROR(f"[{self.schedule.id}] can't connect to node {self.node}, requeueing job"))
+        prober.mark_unhealthy(self.node, e)
+        pool.discard(self.node)
+        self.job.node = None
+        self.job.status = JobStatusChoices.QUEUED
+        self.job.save(update_fields=["node", "status"])
+
+    def check_node(self, e: Exception) -> None:
+        """Raises NodeUnreachable if a step failed because the node of the job went away."""
+        if self.node is not None and unreachable(e):
+            raise NodeUnreachable(str(e)) from e
 
     def build_image(self):
         start_time = time.time()
         self.stdout.write(self.style.WARNING(f"[{self.schedule.id}] building image {self.schedule.image}"))
         try:
-            _image, build_log = client.images.build(
-                path=self.schedule.image, tag=f"{self.schedule.id}:latest"
-            )
-            for step in build_log:
-                assert step
-            self.local_image = f"{self.schedule.id}:latest"
-
+            self.local_image, cache_hit = images.build_image(self.client, self.schedule)
         except Exception as e:
+            self.check_node(e)
             self.process_exception(e, "build")
             self.stdout.write(self.style.ERROR(f"[{self.schedule.id}] failed to build image"))
-            sys.exit(0)
+            raise JobAborted() from e
+
+        self.job.image_cache_hit = cache_hit
+        self.job.save(update_fields=["image_cache_hit"])
 
         elapsed_time = time.time() - start_time
+        if cache_hit:
+            self.stdout.write(self.style.WARNING(f"[{self.schedule.id}] reusing {self.local_image}, build skipped"))
         self.stdout.write(self.style.WARNING(f"[{self.schedule.id}] build image time: {elapsed_time:.2f}s"))
 
     def pull_image(self):
         start_time = time.time()
-        self.stdout.write(self.style.WARNING(f"[{self.schedule.id}] pulling image {self.schedule.image}"))
-        credential = self.schedule.credential
-        credential = credential.json() if credential else None
+        self.stdout.write(
+            self.style.WARNING(
+                f"[{self.schedule.id}] pulling image {self.schedule.image} (policy: {self.schedule.pull_policy})"
+            )
+        )
         try:
-            response = client.api.pull(self.schedule.image, auth_config=credential, stream=True, decode=True)
-            for step in response:
-                assert step
+            self.local_image, cache_hit = images.pull_image(self.client, self.schedule, host=node_key(self.node))
         except Exception as e:
+            self.check_node(e)
             self.process_exception(e, "pull")
             self.stdout.write(self.style.ERROR(f"[{self.schedule.id}] failed to pull image"))
-            sys.exit(0)
+            raise JobAborted() from e
+
+        self.job.pull_policy = self.schedule.pull_policy
+        self.job.image_cache_hit = cache_hit
+        self.job.save(update_fields=["pull_policy", "image_cache_hit"])
 
         elapsed_time = time.time() - start_time
+        if cache_hit:
+            self.stdout.write(self.style.WARNING(f"[{self.schedule.id}] image is fresh, pull skipped"))
         self.stdout.write(self.style.WARNING(f"[{self.schedule.id}] pull image time: {elapsed_time:.2f}s"))
 
     def start_container(self):
@@ -108,21 +244,24 @@ class Command(BaseCommand):
         cpu_limit = self.schedule.cpu * int(1e9) if self.schedule.cpu else None
 
         try:
-            client.containers.run(
+            self.client.containers.run(
                 image,
                 cmd,
                 detach=True,
                 name=self.job.id,
-                environment=self.schedule.env_vars,
+                environment={**(self.schedule.env_vars or {}), **(self.job.env_overrides or {})} or None,
                 mem_limit=memory_limit,
                 nano_cpus=cpu_limit,
+                labels={JOB_LABEL: str(self.job.id), SCHEDULE_LABEL: str(self.schedule.id)},
             )
             self.job.provisioning = False
-            self.job.save()
-        except docker.errors.APIError as e:
+            # Only this field: update_history may already be tracking the container
+            self.job.save(update_fields=["provisioning"])
+        except (docker.errors.APIError, requests.exceptions.ConnectionError) as e:
+            self.check_node(e)
             self.process_exception(e, "run")
             self.stdout.write(self.style.ERROR(f"Failed to [run container] for Schedule job {self.schedule.id}"))
-            sys.exit(0)
+            raise JobAborted() from e
 
     def process_exception(self, e: Exception, step: str) -> None:
         """
@@ -146,5 +285,6 @@ class Command(BaseCommand):
             self.job.status_code = -200
 
         self.job.log = e
-        self.job.status = "failure"
+        self.job.status = JobStatusChoices.FAILURE
         self.job.save()
+        ScheduleLease.release([self.job.id])
@@ -0,0 +1,115 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core import crontab, images
+from apps.core.jobqueue import JobQueue
+from apps.core.management.commands.run_schedule import Command as RunScheduleCommand
+from apps.core.management.commands.run_schedule import JobAborted
+from apps.core.scheduler import Scheduler
+from apps.node.prober import NodeProber
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the resident scheduler, firing every active schedule in-process (or syncing the crontab), "
+        "prewarming their images, probing the nodes and starting queued jobs as capacity frees up"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.SCHEDULER_WORKERS,
+            help="Maximum number of jobs provisioned at the same time",
+        )
+        parser.add_argument(
+            "--refresh",
+            type=int,
+            default=settings.SCHEDULER_REFRESH,
+            help="Seconds between reloads of the active schedules",
+        )
+        parser.add_argument(
+            "--prewarm-lead",
+            type=int,
+            default=settings.PREWARM_LEAD,
+            help="Seconds before a fire to pull or build its image, 0 disables prewarming",
+        )
+        parser.add_argument(
+            "--prewarm-concurrency",
+            type=int,
+            default=settings.PREWARM_CONCURRENCY,
+            help="Maximum number of images prewarmed at the same time",
+        )
+        parser.add_argument(
+            "--queue-interval",
+            type=int,
+            default=settings.QUEUE_INTERVAL,
+            help="Seconds between attempts to place queued jobs",
+        )
+        parser.add_argument(
+            "--probe-interval",
+            type=int,
+            default=settings.NODE_PROBE_INTERVAL,
+            help="Seconds between health probes of the nodes",
+        )
+
+    @staticmethod
+    def dispatch(schedule_id: str) -> None:
+        try:
+            RunScheduleCommand().run(schedule_id)
+        except JobAborted:
+            pass
+
+    def clear_crontab(self) -> None:
+        """Removes the crontab files left by the cron backend, their schedules would fire twice."""
+        try:
+            result = crontab.clear()
+        except OSError as err:
+            self.stdout.write(self.style.ERROR(f"Can't clear the crontab files of {settings.CRONTAB_PATH}: {err}"))
+            return
+        if result.removed:
+            self.stdout.write(
+                self.style.WARNING(f"Removed {len(result.removed)} crontab files from {settings.CRONTAB_PATH}")
+            )
+
+    def handle(self, *args, **options):
+        # Jobs are queued whatever the backend, cron fires included
+        schedulers = [
+            NodeProber(interval=options["probe_interval"], workers=settings.NODE_PROBE_WORKERS),
+            JobQueue(workers=options["workers"], interval=options["queue_interval"]),
+        ]
+        if options["prewarm_lead"] > 0:
+            self.stdout.write(self.style.SUCCESS(f"Prewarming images {options['prewarm_lead']}s ahead of fires..."))
+            schedulers.append(
+                Scheduler(
+                    images.prewarm,
+                    workers=options["prewarm_concurrency"],
+                    refresh=options["refresh"],
+                    lead=options["prewarm_lead"],
+                )
+            )
+
+        if settings.SCHEDULER_BACKEND == "daemon":
+            self.clear_crontab()
+            self.stdout.write(self.style.SUCCESS(f"Starting scheduler with {options['workers']} workers..."))
+            schedulers.append(Scheduler(self.dispatch, workers=options["workers"], refresh=options["refresh"]))
+        else:
+            self.stdout.write(
+                self.style.WARNING(f"SCHEDULER_BACKEND is {settings.SCHEDULER_BACKEND!r}, schedules are fired by cron")
+            )
+            self.stdout.write(self.style.SUCCESS(f"Syncing the crontab files to {settings.CRONTAB_PATH}..."))
+            schedulers.append(
+                crontab.CrontabSync(interval=settings.CRONTAB_SYNC_INTERVAL, resync=settings.CRONTAB_RESYNC_INTERVAL)
+            )
+
+        for scheduler in schedulers[:-1]:
+            threading.Thread(target=scheduler.run_forever, daemon=True).start()
+        try:
+            schedulers[-1].run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Stopping scheduler, waiting for running dispatches..."))
+        finally:
+            for scheduler in schedulers:
+                scheduler.stop()
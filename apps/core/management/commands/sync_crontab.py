@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.core import crontab
+
+
+class Command(BaseCommand):
+    help = "Render the crontab files of the active schedules to CRONTAB_PATH, only rewriting the changed files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the files that would be written or removed",
+        )
+
+    def handle(self, *args, **options):
+        result = crontab.sync(dry_run=options["dry_run"])
+        prefix = "Would write" if options["dry_run"] else "Wrote"
+        for name in result.written:
+            self.stdout.write(self.style.SUCCESS(f"{prefix} {settings.CRONTAB_PATH / name}"))
+        prefix = "Would remove" if options["dry_run"] else "Removed"
+        for name in result.removed:
+            self.stdout.write(self.style.WARNING(f"{prefix} {settings.CRONTAB_PATH / name}"))
+        if not result.changed:
+            self.stdout.write(self.style.SUCCESS("Crontab is up to date"))
@@ -1,18 +1,67 @@
+import threading
 import time
+from collections import defaultdict
+from datetime import timedelta
+from uuid import UUID
 
 import docker
+import requests
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
 
-from apps.core.models import Job
+from apps.core import dag
+from apps.core.docker_client import JOB_LABEL
+from apps.core.logstore import get_log_store
+from apps.core.models import Job, JobStatusChoices, ScheduleLease
+from apps.node.models import Node
+from apps.node.pool import node_key, pool
+
+WATCHED_EVENTS = ["start", "die", "oom"]
+UPDATE_FIELDS = [
+    "state",
+    "status",
+    "started_at",
+    "finished_at",
+    "duration_ms",
+    "log_path",
+    "log_size",
+    "log_truncated",
+    "status_code",
+]
 
 
 class Command(BaseCommand):
     help = "Update job status"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The event watchers and the reconciliation sweep may pick up the same job
+        self.lock = threading.Lock()
+        self.watched_nodes: set[str] = set()
+        # Sweeps in a row each unfinished job's container was missing from
+        self.missed_sweeps: dict[UUID, int] = {}
+        # Since when each node with unfinished jobs failed to list its containers
+        self.unreachable_since: dict[str, float] = {}
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="Follow the Docker events stream, only sweeping all jobs every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=None,
+            help="Seconds between reconciliation sweeps (default: 60, or HISTORY_RECONCILE_INTERVAL with --watch)",
+        )
+
     @staticmethod
-    def _check_container(job: Job):
+    def _check_container(client: docker.DockerClient, job: Job):
         container_name = str(job.id)
-        client = docker.from_env()
         try:
             container = client.containers.get(container_name)
         except docker.errors.NotFound:
@@ -20,26 +69,202 @@ class Command(BaseCommand):
         return container
 
     def handle(self, *args, **options):
+        if options["watch"]:
+            self.reconcile_forever(options["interval"] or settings.HISTORY_RECONCILE_INTERVAL, watch=True)
+        else:
+            self.reconcile_forever(options["interval"] or 60)
+
+    def reconcile_forever(self, interval: int, watch: bool = False) -> None:
         while True:
-            self.stdout.write(self.style.SUCCESS("Checking for jobs to update..."))
-            for job in Job.objects.filter(status_code__isnull=True, provisioning=False):
-                self.stdout.write(self.style.WARNING(f"{job.schedule.id} - {job.id} - processing job"))
-                container = self._check_container(job)
-                if container:
-                    job.state = container.attrs["State"]
-                    job.status = container.status
-                    job.save()
-
-                    if container.status == "exited":
-                        self.stdout.write(
-                            self.style.SUCCESS(f"{job.schedule.id} - {job.id} - finished job, removing container...")
-                        )
-                        job.log = container.logs().decode("utf-8")
-                        job.status_code = container.wait()["StatusCode"]
-                        job.save()
-                        container.remove()
-                    else:
-                        self.stdout.write(self.style.WARNING(f"{job.schedule.id} - {job.id} - still running..."))
-                else:
+            if watch:
+                self.start_watchers()
+            self.reconcile()
+            close_old_connections()
+            time.sleep(interval)
+
+    def start_watchers(self) -> None:
+        """Follows the events of the local daemon and of every active node, including new ones."""
+        for node in [None, *Node.objects.filter(active=True)]:
+            if node_key(node) not in self.watched_nodes:
+                self.watched_nodes.add(node_key(node))
+                threading.Thread(target=self.watch_events, args=(node,), daemon=True).start()
+
+    def reconcile(self) -> None:
+        """
+        Updates every unfinished job with one container listing per node and one bulk update,
+        whatever the number of jobs in flight. Containers are only inspected when their status changed.
+        """
+        self.stdout.write(self.style.SUCCESS("Checking for jobs to update..."))
+        with self.lock:
+            jobs_by_node = defaultdict(list)
+            # No ordering, so the partial index of unfinished jobs is enough
+            for job in self.unfinished_jobs().select_related("schedule", "node").order_by():
+                jobs_by_node[job.node_id].append(job)
+
+            containers, stranded_jobs = self.list_containers(jobs_by_node)
+            changed_jobs, finished_jobs, finished_containers, lost_jobs = [], [], [], []
+            missed_sweeps = {}
+            # Singleton leases are renewed for jobs that are alive, missing ones let theirs expire.
+            # Queued and provisioning jobs have no container yet, a long pull or build included
+            waiting = Q(status=JobStatusChoices.QUEUED) | (Q(provisioning=True) & ~self.stalled())
+            alive_jobs = list(Job.objects.filter(waiting, status_code__isnull=True).values_list("id", flat=True))
+            for job in (job for jobs in jobs_by_node.values() for job in jobs):
+                container = containers.get(str(job.id))
+                if container is None:
                     self.stdout.write(self.style.ERROR(f"{job.schedule.id} - {job.id} - can't find container"))
-            time.sleep(60)
+                    missed_sweeps[job.id] = self.missed_sweeps.get(job.id, 0) + 1
+                    if missed_sweeps[job.id] >= settings.JOB_LOST_SWEEPS:
+                        lost_jobs.append(job.id)
+                    continue
+                if container.status == job.status:
+                    alive_jobs.append(job.id)
+                    continue
+
+                self.stdout.write(self.style.WARNING(f"{job.schedule.id} - {job.id} - {container.status}"))
+                container.reload()
+                changed_jobs.append(job)
+                if self._apply_container(job, container):
+                    finished_jobs.append(job)
+                    finished_containers.append(container)
+                else:
+                    alive_jobs.append(job.id)
+
+            with transaction.atomic():
+                Job.objects.bulk_update(changed_jobs, UPDATE_FIELDS, batch_size=500)
+                if lost_jobs:
+                    self.fail_lost(lost_jobs, f"Container not found in {settings.JOB_LOST_SWEEPS} sweeps in a row")
+                if stranded_jobs:
+                    self.fail_lost(stranded_jobs, f"Node unreachable for over {settings.SINGLETON_LEASE_TTL}s")
+                ScheduleLease.release([job.id for job in finished_jobs] + lost_jobs + stranded_jobs)
+                ScheduleLease.renew(alive_jobs)
+            self.missed_sweeps = {job_id: count for job_id, count in missed_sweeps.items() if job_id not in lost_jobs}
+            for job in finished_jobs:
+                self.dispatch_downstream(job)
+
+        for container in finished_containers:
+            container.remove()
+
+    @staticmethod
+    def stalled() -> Q:
+        """Jobs provisioning for so long that their dispatcher may have crashed."""
+        deadline = timezone.now() - timedelta(seconds=settings.JOB_PROVISIONING_TIMEOUT)
+        return Q(provisioning=True, created_at__lt=deadline) & ~Q(status=JobStatusChoices.QUEUED)
+
+    def unfinished_jobs(self):
+        """Started jobs, and stalled ones, whose containers are looked for."""
+        return Job.objects.filter(Q(provisioning=False) | self.stalled(), status_code__isnull=True)
+
+    def list_containers(self, jobs_by_node: dict) -> tuple[dict, list[UUID]]:
+        """
+        Lists the job containers of every node with unfinished jobs. The jobs of unreachable nodes
+        are left out and retried on the next sweep, until the node has been unreachable for
+        SINGLETON_LEASE_TTL seconds: they are returned as lost then, their leases expired.
+        """
+        containers, stranded_jobs, unreachable_since = {}, [], {}
+        for jobs in jobs_by_node.values():
+            node = jobs[0].node
+            try:
+                containers.update(self._list_containers(pool.get(node)))
+            except (docker.errors.DockerException, requests.exceptions.RequestException) as err:
+                self.stdout.write(self.style.ERROR(f"Can't list containers on node {node or 'local'}: {err}"))
+                since = self.unreachable_since.get(node_key(node), time.monotonic())
+                unreachable_since[node_key(node)] = since
+                if time.monotonic() - since >= settings.SINGLETON_LEASE_TTL:
+                    stranded_jobs.extend(job.id for job in jobs)
+                jobs.clear()
+        self.unreachable_since = unreachable_since
+        return containers, stranded_jobs
+
+    def fail_lost(self, job_ids: list[UUID], reason: str) -> None:
+        """Fails jobs whose container is gone, which releases the resources they reserved."""
+        self.stdout.write(self.style.ERROR(f"Failing {len(job_ids)} lost jobs: {reason}"))
+        Job.objects.filter(pk__in=job_ids, status_code__isnull=True).update(
+            status=JobStatusChoices.FAILURE,
+            status_code=-300,
+            exception_on_run=True,
+            log=f"{reason}, the job was lost",
+        )
+
+    @staticmethod
+    def _list_containers(client: docker.DockerClient) -> dict:
+        return {
+            container.attrs["Labels"][JOB_LABEL]: container
+            for container in client.containers.list(all=True, sparse=True, filters={"label": JOB_LABEL})
+        }
+
+    def watch_events(self, node: Node | None) -> None:
+        filters = {"type": "container", "event": WATCHED_EVENTS, "label": JOB_LABEL}
+        while True:
+            self.stdout.write(self.style.SUCCESS(f"Watching Docker events on node {node or 'local'}..."))
+            try:
+                client = pool.get(node)
+                for event in client.events(decode=True, filters=filters):
+                    self.handle_event(client, event)
+                    close_old_connections()
+            except (docker.errors.DockerException, requests.exceptions.RequestException) as err:
+                self.stdout.write(self.style.ERROR(f"Lost Docker events stream ({err}), reconnecting..."))
+                time.sleep(5)
+
+    def handle_event(self, client: docker.DockerClient, event: dict) -> None:
+        job_id = event.get("Actor", {}).get("Attributes", {}).get(JOB_LABEL)
+        # Jobs still flagged as provisioning are included, short-lived containers may exit
+        # before run_schedule stored the flag
+        job = Job.objects.filter(pk=job_id, status_code__isnull=True).select_related("schedule").first()
+        if job is None:
+            return
+
+        self.stdout.write(self.style.WARNING(f"{job.schedule.id} - {job.id} - received {event.get('Action')} event"))
+        container = self._check_container(client, job)
+        if container:
+            self.update_job(job, container)
+
+    def update_job(self, job: Job, container) -> None:
+        with self.lock:
+            # The other thread may have finished this job in the meantime
+            job.refresh_from_db(fields=["status_code"])
+            if job.status_code is not None:
+                return
+
+            finished = self._apply_container(job, container)
+            with transaction.atomic():
+                job.save(update_fields=UPDATE_FIELDS)
+                if finished:
+                    ScheduleLease.release([job.id])
+            if finished:
+                self.dispatch_downstream(job)
+
+        if finished:
+            container.remove()
+
+    def dispatch_downstream(self, job: Job) -> None:
+        """
+        Starts the schedules waiting on a successful job, under the lock so fan-ins start once.
+        Errors are only reported, they must not stop the event watcher nor the sweep.
+        """
+        try:
+            downstream_jobs = dag.dispatch_downstream(job)
+        except Exception as err:
+            self.stdout.write(self.style.ERROR(f"{job.schedule.id} - {job.id} - can't start downstream jobs: {err}"))
+            return
+        for downstream_job in downstream_jobs:
+            self.stdout.write(
+                self.style.SUCCESS(f"{job.schedule.id} - {job.id} - started downstream job {downstream_job.id}")
+            )
+
+    def _apply_container(self, job: Job, container) -> bool:
+        """Copies the state of an inspected container onto the job, returns True if it finished."""
+        job.state = container.attrs["State"]
+        job.status = container.status
+        job.update_timings()
+
+        if container.status != JobStatusChoices.EXITED:
+            self.stdout.write(self.style.WARNING(f"{job.schedule.id} - {job.id} - still running..."))
+            return False
+
+        self.stdout.write(self.style.SUCCESS(f"{job.schedule.id} - {job.id} - finished job, removing container..."))
+        stored_log = get_log_store().save(str(job.id), container.logs(stream=True, follow=False))
+        job.log_path = stored_log.pointer
+        job.log_size = stored_log.size
+        job.log_truncated = stored_log.truncated
+        job.status_code = job.state["ExitCode"]
+        return True
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0021_alter_schedule_created_by"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="log_path",
+            field=models.CharField(blank=True, help_text="Pointer to the output in the log store", max_length=500),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="log_size",
+            field=models.BigIntegerField(default=0, help_text="Size of the container output in bytes"),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="log_truncated",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0022_job_log_store"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="finished_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="started_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
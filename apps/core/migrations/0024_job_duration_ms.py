@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:10
+
+import dateutil.parser
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def parse_docker_time(value):
+    if not value:
+        return None
+    moment = dateutil.parser.isoparse(value)
+    return None if moment.year == 1 else moment
+
+
+def backfill_timings(apps, schema_editor):
+    Job = apps.get_model("core", "Job")
+    batch = []
+    for job in Job.objects.filter(state__isnull=False).only("id", "state").iterator(chunk_size=BATCH_SIZE):
+        job.started_at = parse_docker_time(job.state.get("StartedAt"))
+        job.finished_at = parse_docker_time(job.state.get("FinishedAt"))
+        if job.started_at and job.finished_at:
+            job.duration_ms = int((job.finished_at - job.started_at).total_seconds() * 1000)
+        batch.append(job)
+        if len(batch) >= BATCH_SIZE:
+            Job.objects.bulk_update(batch, ["started_at", "finished_at", "duration_ms"])
+            batch = []
+    Job.objects.bulk_update(batch, ["started_at", "finished_at", "duration_ms"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0023_job_started_at_finished_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="duration_ms",
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="job",
+            name="finished_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="job",
+            name="started_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_timings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0024_job_duration_ms"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PulledImage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("image", models.CharField(max_length=500, unique=True)),
+                ("digest", models.CharField(blank=True, max_length=100)),
+                ("pulled_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="image_cache_hit",
+            field=models.BooleanField(default=False, help_text="The image pull or build was skipped"),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="pull_policy",
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name="schedule",
+            name="image_digest",
+            field=models.CharField(
+                blank=True, help_text="Digest to run with the pinned digest policy (sha256:...)", max_length=100
+            ),
+        ),
+        migrations.AddField(
+            model_name="schedule",
+            name="pull_policy",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("always", "Always pull"),
+                    ("if-not-present", "Pull if not present"),
+                    ("refresh", "Pull if older than the refresh interval"),
+                    ("pinned-digest", "Pinned digest"),
+                ],
+                default="always",
+                help_text="When to pull the image from its registry before a run",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="schedule",
+            name="pull_refresh_minutes",
+            field=models.IntegerField(
+                blank=True, help_text="Minutes a pulled image stays fresh with the refresh policy", null=True
+            ),
+        ),
+    ]
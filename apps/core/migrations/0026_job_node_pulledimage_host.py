@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0025_pull_policy"),
+        ("node", "0002_node_active_use_tls"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="node",
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to="node.node"
+            ),
+        ),
+        migrations.AddField(
+            model_name="pulledimage",
+            name="host",
+            field=models.CharField(default="local", help_text="Node id, or local", max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="pulledimage",
+            name="image",
+            field=models.CharField(max_length=500),
+        ),
+        migrations.AddConstraint(
+            model_name="pulledimage",
+            constraint=models.UniqueConstraint(fields=("image", "host"), name="unique_pulled_image_per_host"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0026_job_node_pulledimage_host"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="schedule",
+            name="spread_seconds",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Delay fires by a fixed offset within this many seconds, leave blank for the default window",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0027_schedule_spread_seconds"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduleLease",
+            fields=[
+                (
+                    "schedule",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="core.schedule",
+                    ),
+                ),
+                ("holder", models.UUIDField(blank=True, help_text="Id of the job holding the lease", null=True)),
+                ("expires_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
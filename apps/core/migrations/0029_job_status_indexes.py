@@ -0,0 +1,93 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:28
+
+from django.db import migrations, models
+
+STATUSES = ["queued", "waiting", "failure", "created", "running", "restarting", "paused", "removing", "exited", "dead"]
+
+
+def normalize_statuses(apps, schema_editor):
+    # Anything else can't come from Docker nor crontainer, keep the rows valid for the constraint
+    Job = apps.get_model("core", "Job")
+    Job.objects.exclude(status__in=STATUSES).update(status="dead")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0028_schedulelease"),
+        ("node", "0003_node_health"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_statuses, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="job",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "Queued"),
+                    ("waiting", "Waiting"),
+                    ("failure", "Failure"),
+                    ("created", "Created"),
+                    ("running", "Running"),
+                    ("restarting", "Restarting"),
+                    ("paused", "Paused"),
+                    ("removing", "Removing"),
+                    ("exited", "Exited"),
+                    ("dead", "Dead"),
+                ],
+                default="waiting",
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="schedulelease",
+            name="holder",
+            field=models.UUIDField(blank=True, db_index=True, help_text="Id of the job holding the lease", null=True),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(fields=["-created_at", "-id"], name="job_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(fields=["schedule", "-created_at", "-id"], name="job_schedule_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                condition=models.Q(("status_code__isnull", True)),
+                fields=["node", "provisioning"],
+                name="job_unfinished_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                condition=models.Q(("status", "queued")), fields=["created_at", "id"], name="job_queued_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="job",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    (
+                        "status__in",
+                        [
+                            "queued",
+                            "waiting",
+                            "failure",
+                            "created",
+                            "running",
+                            "restarting",
+                            "paused",
+                            "removing",
+                            "exited",
+                            "dead",
+                        ],
+                    )
+                ),
+                name="job_status_valid",
+            ),
+        ),
+    ]
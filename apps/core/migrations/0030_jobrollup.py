@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0029_job_status_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                ("runs", models.IntegerField(default=0)),
+                ("failures", models.IntegerField(default=0)),
+                ("p50_duration_ms", models.BigIntegerField(blank=True, null=True)),
+                ("p95_duration_ms", models.BigIntegerField(blank=True, null=True)),
+                ("schedule", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="core.schedule")),
+            ],
+            options={
+                "ordering": ["-day"],
+                "constraints": [
+                    models.UniqueConstraint(fields=("schedule", "day"), name="unique_rollup_per_schedule_day")
+                ],
+            },
+        ),
+    ]
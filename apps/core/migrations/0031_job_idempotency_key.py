@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0030_jobrollup"),
+        ("node", "0003_node_health"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="env_overrides",
+            field=models.JSONField(blank=True, help_text="Environment variables replacing the schedule's", null=True),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="idempotency_key",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="job",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("idempotency_key__isnull", False)),
+                fields=("schedule", "idempotency_key"),
+                name="job_idempotency_key_unique",
+            ),
+        ),
+    ]
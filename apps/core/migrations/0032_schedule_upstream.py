@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0031_job_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="schedule",
+            name="upstream",
+            field=models.ManyToManyField(
+                blank=True,
+                help_text="Also run this schedule as soon as all these schedules succeeded since its last run",
+                related_name="downstream",
+                to="core.schedule",
+            ),
+        ),
+    ]
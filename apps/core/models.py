@@ -1,18 +1,21 @@
+import hashlib
+import io
 import uuid
+from datetime import timedelta
+from typing import BinaryIO, Iterable
 
-import dateutil
-from cron_descriptor import ExpressionDescriptor, FormatException, MissingFieldException
-from cron_descriptor import Options as CronOptions
+import dateutil.parser
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import PROTECT
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import PROTECT, F, Q
 from django.utils import timezone
 
-User = get_user_model()
-cron_options = CronOptions()
+from apps.core import cron
+from apps.core.logstore import get_log_store
 
-cron_options.verbose = True
-cron_options.use_24hour_time_format = True
+User = get_user_model()
 
 
 class CategoryChoices(models.IntegerChoices):
@@ -25,6 +28,28 @@ class CategoryChoices(models.IntegerChoices):
     GENERIC_HTTP_AUTH = 99
 
 
+class JobStatusChoices(models.TextChoices):
+    # Set by crontainer
+    QUEUED = "queued", "Queued"
+    WAITING = "waiting", "Waiting"
+    FAILURE = "failure", "Failure"
+    # Container statuses reported by Docker
+    CREATED = "created", "Created"
+    RUNNING = "running", "Running"
+    RESTARTING = "restarting", "Restarting"
+    PAUSED = "paused", "Paused"
+    REMOVING = "removing", "Removing"
+    EXITED = "exited", "Exited"
+    DEAD = "dead", "Dead"
+
+
+class PullPolicyChoices(models.TextChoices):
+    ALWAYS = "always", "Always pull"
+    IF_NOT_PRESENT = "if-not-present", "Pull if not present"
+    REFRESH = "refresh", "Pull if older than the refresh interval"
+    PINNED_DIGEST = "pinned-digest", "Pinned digest"
+
+
 class Credential(models.Model):
     id = models.UUIDField(default=uuid.uuid4, primary_key=True, unique=True)
     name = models.SlugField(
@@ -66,6 +91,18 @@ class Schedule(models.Model):
         help_text="Selecting this option will make this schedule a singleton: only one instance will be allowed to run at any given time.",
     )
     sequential_failures = models.IntegerField(default=0)
+    upstream = models.ManyToManyField(
+        "self",
+        symmetrical=False,
+        blank=True,
+        related_name="downstream",
+        help_text="Also run this schedule as soon as all these schedules succeeded since its last run",
+    )
+    spread_seconds = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Delay fires by a fixed offset within this many seconds, leave blank for the default window",
+    )
 
     env_vars = models.JSONField(null=True, blank=True)
     image = models.CharField(max_length=500, blank=False, verbose_name="Image")
@@ -81,6 +118,44 @@ class Schedule(models.Model):
     cpu = models.IntegerField(null=True, blank=True, help_text="Number of CPUs")
     memory = models.IntegerField(null=True, blank=True, help_text="Memory in MB")
 
+    pull_policy = models.CharField(
+        max_length=20,
+        choices=PullPolicyChoices.choices,
+        default=PullPolicyChoices.ALWAYS,
+        blank=True,
+        help_text="When to pull the image from its registry before a run",
+    )
+    pull_refresh_minutes = models.IntegerField(
+        null=True, blank=True, help_text="Minutes a pulled image stays fresh with the refresh policy"
+    )
+    image_digest = models.CharField(
+        max_length=100, blank=True, help_text="Digest to run with the pinned digest policy (sha256:...)"
+    )
+
+    def clean(self):
+        if not self.pull_policy:
+            self.pull_policy = PullPolicyChoices.ALWAYS
+        if self.pull_policy == PullPolicyChoices.REFRESH and not self.pull_refresh_minutes:
+            raise ValidationError({"pull_refresh_minutes": "Required with the refresh pull policy"})
+        if self.pull_policy == PullPolicyChoices.PINNED_DIGEST and not self.image_digest.startswith("sha256:"):
+            raise ValidationError({"image_digest": "Required with the pinned digest policy, e.g. sha256:..."})
+
+    @staticmethod
+    def fire_offset(schedule_id, spread_seconds: int | None) -> int:
+        """
+        Seconds each fire of a schedule is delayed by, within its spread window. Derived from a
+        hash of the id, so schedules sharing a cron rule start apart but always at the same time.
+        """
+        spread = settings.SCHEDULE_SPREAD_SECONDS if spread_seconds is None else spread_seconds
+        if spread <= 0:
+            return 0
+        digest = hashlib.sha256(str(schedule_id).encode()).digest()
+        return int.from_bytes(digest[:8], "big") % spread
+
+    @property
+    def offset(self) -> int:
+        return self.fire_offset(self.id, self.spread_seconds)
+
     def get_source_icon(self):
         return f"mdi mdi-{self.source_name.lower()}"
 
@@ -94,38 +169,205 @@ class Schedule(models.Model):
 
     @property
     def cron_description(self):
+        return cron.parse(self.cron_rule).description or "Invalid cron rule"
+
+    @property
+    def next_run(self):
+        """Next time the schedule fires, spread offset included, None if it never will."""
+        if not self.active:
+            return None
+        fire_at = next(cron.parse(self.cron_rule).next_fires(timezone.now()), None)
+        return fire_at + timedelta(seconds=self.offset) if fire_at else None
+
+
+class ScheduleLease(models.Model):
+    """
+    Lock of a singleton schedule, held by its running job until the job finishes. Leases are
+    renewed by `update_history` while the job is alive and expire after SINGLETON_LEASE_TTL
+    seconds otherwise, so a crashed dispatcher or a lost container can't block the schedule.
+    """
+
+    schedule = models.OneToOneField(Schedule, on_delete=models.CASCADE, primary_key=True)
+    holder = models.UUIDField(null=True, blank=True, db_index=True, help_text="Id of the job holding the lease")
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    @classmethod
+    def acquire(cls, schedule_id, holder) -> bool:
+        """Takes the lease of a schedule for `holder` if it is free or expired, in one conditional UPDATE."""
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=settings.SINGLETON_LEASE_TTL)
+        free = Q(holder__isnull=True) | Q(expires_at__lt=now)
+        if cls.objects.filter(free, schedule_id=schedule_id).update(holder=holder, expires_at=expires_at):
+            return True
         try:
-            return ExpressionDescriptor(self.cron_rule, options=cron_options).get_description()
-        except (MissingFieldException, FormatException):
-            return "Invalid cron rule"
+            # First fire of the schedule, concurrent dispatchers race on the primary key
+            with transaction.atomic():
+                cls.objects.create(schedule_id=schedule_id, holder=holder, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        return True
+
+    @classmethod
+    def renew(cls, holders: Iterable) -> None:
+        cls.objects.filter(holder__in=list(holders)).update(
+            expires_at=timezone.now() + timedelta(seconds=settings.SINGLETON_LEASE_TTL)
+        )
+
+    @classmethod
+    def release(cls, holders: Iterable) -> None:
+        cls.objects.filter(holder__in=list(holders)).update(holder=None, expires_at=None)
+
+
+class CrontabVersion(models.Model):
+    """
+    Single row counting schedule changes. Bumped by whichever process changes schedules and
+    polled by the crontab syncer of `run_scheduler`, which syncs the files when it moved.
+    """
+
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def bump(cls) -> None:
+        if not cls.objects.filter(pk=1).update(version=F("version") + 1):
+            # First change, concurrent ones race on the primary key
+            cls.objects.bulk_create([cls(pk=1)], ignore_conflicts=True)
+            cls.objects.filter(pk=1).update(version=F("version") + 1)
+
+    @classmethod
+    def current(cls) -> int:
+        return cls.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+
+class PulledImage(models.Model):
+    """Last pull of an image reference on a Docker host, used to skip pulls that are still fresh."""
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["image", "host"], name="unique_pulled_image_per_host")]
+
+    image = models.CharField(max_length=500)
+    host = models.CharField(max_length=100, default="local", help_text="Node id, or local")
+    digest = models.CharField(max_length=100, blank=True)
+    pulled_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.image}@{self.digest}"
 
 
 class Job(models.Model):
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Job list, per schedule or not, in keyset pagination order
+            models.Index(fields=["-created_at", "-id"], name="job_created_idx"),
+            models.Index(fields=["schedule", "-created_at", "-id"], name="job_schedule_created_idx"),
+            # Unfinished jobs: status tracking, reservations and concurrency limits. Partial, so
+            # it only holds the jobs in flight however long the history gets
+            models.Index(
+                fields=["node", "provisioning"],
+                condition=models.Q(status_code__isnull=True),
+                name="job_unfinished_idx",
+            ),
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(status=JobStatusChoices.QUEUED),
+                name="job_queued_idx",
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(status__in=JobStatusChoices.values),
+                name="job_status_valid",
+            ),
+            # Duplicate deliveries of a trigger collapse into the job of the first one
+            models.UniqueConstraint(
+                fields=["schedule", "idempotency_key"],
+                condition=models.Q(idempotency_key__isnull=False),
+                name="job_idempotency_key_unique",
+            ),
+        ]
 
     id = models.UUIDField(default=uuid.uuid4, primary_key=True, unique=True)
     schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE)
+    node = models.ForeignKey("node.Node", null=True, blank=True, on_delete=models.SET_NULL)
     state = models.JSONField(null=True)
-    status = models.CharField(max_length=20, default="waiting")
+    status = models.CharField(max_length=20, choices=JobStatusChoices.choices, default=JobStatusChoices.WAITING)
     created_at = models.DateTimeField(default=timezone.now)
+    # Error messages and logs of jobs finished before the log store existed
     log = models.TextField(blank=True)
+    log_path = models.CharField(max_length=500, blank=True, help_text="Pointer to the output in the log store")
+    log_size = models.BigIntegerField(default=0, help_text="Size of the container output in bytes")
+    log_truncated = models.BooleanField(default=False)
     status_code = models.IntegerField(null=True)
+    started_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    duration_ms = models.BigIntegerField(null=True, blank=True, db_index=True)
     provisioning = models.BooleanField(default=True)
 
+    pull_policy = models.CharField(max_length=20, blank=True)
+    image_cache_hit = models.BooleanField(default=False, help_text="The image pull or build was skipped")
+
     exception_on_build = models.BooleanField(default=False)
     exception_on_pull = models.BooleanField(default=False)
     exception_on_run = models.BooleanField(default=False)
 
+    # Set on jobs triggered through the API
+    idempotency_key = models.CharField(max_length=100, null=True, blank=True)
+    env_overrides = models.JSONField(null=True, blank=True, help_text="Environment variables replacing the schedule's")
+
+    @staticmethod
+    def parse_docker_time(value: str | None):
+        """Parses a timestamp from a container state, Docker reports unset ones as year 1."""
+        if not value:
+            return None
+        moment = dateutil.parser.isoparse(value)
+        return None if moment.year == 1 else moment
+
+    def update_timings(self) -> None:
+        """Fills the timing columns from the container state, so they can be sorted and aggregated in SQL."""
+        state = self.state or {}
+        self.started_at = self.parse_docker_time(state.get("StartedAt"))
+        self.finished_at = self.parse_docker_time(state.get("FinishedAt"))
+        if self.started_at and self.finished_at:
+            self.duration_ms = int((self.finished_at - self.started_at).total_seconds() * 1000)
+        else:
+            self.duration_ms = None
+
+    @property
+    def has_log(self) -> bool:
+        # Finished jobs have stored output or an error message, checking `log` itself would
+        # load the deferred column
+        return self.status_code is not None
+
+    def open_log(self) -> tuple[BinaryIO, int]:
+        """Returns a seekable binary file over the job output and its size in bytes."""
+        if not self.log_path:
+            data = self.log.encode("utf-8")
+            return io.BytesIO(data), len(data)
+        store = get_log_store()
+        return store.open(self.log_path), store.size(self.log_path)
+
+    def read_log(self) -> str:
+        fh, _size = self.open_log()
+        with fh:
+            return fh.read().decode("utf-8", errors="replace")
+
     def duration(self):
-        # pylint: disable=unsubscriptable-object
-        if self.status != "exited":
-            return "n/a"
-        try:
-            start = dateutil.parser.parse(self.state["StartedAt"])
-            end = dateutil.parser.parse(self.state["FinishedAt"])
-            if end.year == 1:
-                end = timezone.now()
-            return (end - start).seconds
-        except TypeError:
+        if self.status != JobStatusChoices.EXITED or self.duration_ms is None:
             return "n/a"
+        return self.duration_ms // 1000
+
+
+class JobRollup(models.Model):
+    """Daily aggregates of the jobs of a schedule, kept after `prune_jobs` removed the jobs themselves."""
+
+    class Meta:
+        ordering = ["-day"]
+        constraints = [models.UniqueConstraint(fields=["schedule", "day"], name="unique_rollup_per_schedule_day")]
+
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE)
+    day = models.DateField()
+    runs = models.IntegerField(default=0)
+    failures = models.IntegerField(default=0)
+    p50_duration_ms = models.BigIntegerField(null=True, blank=True)
+    p95_duration_ms = models.BigIntegerField(null=True, blank=True)
@@ -0,0 +1,60 @@
+import base64
+import json
+
+from django.db.models import Q, QuerySet
+
+
+class KeysetPaginator:
+    """
+    Cursor (keyset) pagination over a queryset ordered by `ordering`, which must end with a
+    unique field. Each page is a single indexed range query, however deep the page is, and
+    stays stable while new rows are inserted.
+
+    The cursor is an opaque, URL safe encoding of the ordering values of the last row served.
+    """
+
+    def __init__(self, queryset: QuerySet, ordering: tuple[str, ...], page_size: int):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.page_size = page_size
+        self.fields = [queryset.model._meta.get_field(name.lstrip("-")) for name in ordering]
+
+    def encode_cursor(self, obj) -> str:
+        values = [field.value_to_string(obj) for field in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor: str) -> list:
+        """Raises ValueError for cursors that weren't produced by `encode_cursor`."""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError, UnicodeDecodeError) as err:
+            raise ValueError("Invalid cursor") from err
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise ValueError("Invalid cursor")
+        try:
+            return [field.to_python(value) for field, value in zip(self.fields, values)]
+        except Exception as err:
+            raise ValueError("Invalid cursor") from err
+
+    def _after(self, values: list) -> Q:
+        # (a, b) after (x, y) <=> a > x OR (a = x AND b > y), with > flipped for descending fields
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            lookup = "lt" if name.startswith("-") else "gt"
+            term = Q(**{f"{name.lstrip('-')}__{lookup}": values[index]})
+            for previous in range(index):
+                term &= Q(**{self.ordering[previous].lstrip("-"): values[previous]})
+            condition |= term
+        return condition
+
+    def page(self, cursor: str | None = None) -> tuple[list, str | None]:
+        """Returns the objects following `cursor` and the cursor of the next page, if any."""
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+
+        objects = list(queryset[: self.page_size + 1])
+        if len(objects) <= self.page_size:
+            return objects, None
+        objects = objects[: self.page_size]
+        return objects, self.encode_cursor(objects[-1])
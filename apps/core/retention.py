@@ -0,0 +1,162 @@
+import gzip
+import json
+import math
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max, Min, Q, QuerySet
+from django.utils import timezone
+
+from apps.core import counters
+from apps.core.logstore import get_log_store
+from apps.core.models import Job, JobRollup
+
+
+def start_of_day(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def percentile(values: list[int], fraction: float) -> int | None:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def make_rollup(schedule_id, day: date, runs: list[tuple[int | None, int | None]]) -> JobRollup:
+    durations = sorted(duration_ms for _status_code, duration_ms in runs if duration_ms is not None)
+    return JobRollup(
+        schedule_id=schedule_id,
+        day=day,
+        runs=len(runs),
+        failures=sum(1 for status_code, _duration_ms in runs if status_code not in (None, 0)),
+        p50_duration_ms=percentile(durations, 0.5),
+        p95_duration_ms=percentile(durations, 0.95),
+    )
+
+
+def rollup(schedule_id, until: date) -> int:
+    """
+    Aggregates the jobs of a schedule into daily rollups, for the days after its last rollup
+    and before `until`. Jobs are read in date order, one day in memory at a time. Returns the
+    number of rollups created.
+
+    Rollups are never recomputed, so they stop before the first day with an unfinished job:
+    that day and the following ones are rolled up once its jobs finished.
+    """
+    last_day = JobRollup.objects.filter(schedule_id=schedule_id).aggregate(Max("day"))["day__max"]
+    oldest_unfinished = Job.objects.filter(schedule_id=schedule_id, status_code__isnull=True).aggregate(
+        Min("created_at")
+    )["created_at__min"]
+    if oldest_unfinished is not None:
+        until = min(until, timezone.localdate(oldest_unfinished))
+    jobs = Job.objects.filter(schedule_id=schedule_id, created_at__lt=start_of_day(until))
+    if last_day:
+        jobs = jobs.filter(created_at__gte=start_of_day(last_day + timedelta(days=1)))
+
+    rollups, day, runs = [], None, []
+    for created_at, status_code, duration_ms in (
+        jobs.order_by("created_at", "id").values_list("created_at", "status_code", "duration_ms").iterator()
+    ):
+        created_on = timezone.localdate(created_at)
+        if created_on != day and runs:
+            rollups.append(make_rollup(schedule_id, day, runs))
+            runs = []
+        day = created_on
+        runs.append((status_code, duration_ms))
+    if runs:
+        rollups.append(make_rollup(schedule_id, day, runs))
+
+    JobRollup.objects.bulk_create(rollups, ignore_conflicts=True)
+    return len(rollups)
+
+
+def expired_jobs(schedule_id, now: datetime) -> QuerySet:
+    """
+    Finished jobs of a schedule past every retention policy: older than JOB_RETENTION_DAYS
+    (JOB_RETENTION_FAILURE_DAYS for failures) and not among its last JOB_RETENTION_KEEP_LAST
+    jobs. Jobs are only expired once their day is rolled up: before yesterday, and before the
+    first day `rollup` didn't reach, held back by an unfinished job.
+    """
+    if not settings.JOB_RETENTION_DAYS:
+        return Job.objects.none()
+
+    last_day = JobRollup.objects.filter(schedule_id=schedule_id).aggregate(Max("day"))["day__max"]
+    if last_day is None:
+        return Job.objects.none()
+    rolled_up = start_of_day(min(timezone.localdate(now) - timedelta(days=1), last_day + timedelta(days=1)))
+    success_cutoff = min(now - timedelta(days=settings.JOB_RETENTION_DAYS), rolled_up)
+    failure_days = max(settings.JOB_RETENTION_FAILURE_DAYS, settings.JOB_RETENTION_DAYS)
+    failure_cutoff = min(now - timedelta(days=failure_days), rolled_up)
+
+    condition = Q(schedule_id=schedule_id, status_code__isnull=False) & (
+        Q(status_code=0, created_at__lt=success_cutoff) | (~Q(status_code=0) & Q(created_at__lt=failure_cutoff))
+    )
+    if settings.JOB_RETENTION_KEEP_LAST:
+        kept = (
+            Job.objects.filter(schedule_id=schedule_id)
+            .order_by("-created_at", "-id")
+            .values_list("created_at", flat=True)[settings.JOB_RETENTION_KEEP_LAST - 1 :][:1]
+        )
+        oldest_kept = kept.first()
+        if oldest_kept is None:
+            return Job.objects.none()
+        condition &= Q(created_at__lt=oldest_kept)
+    return Job.objects.filter(condition)
+
+
+class JobArchive:
+    """
+    Writes pruned jobs to `root`, one JSON object per line in a gzip file per prune run. Each
+    record holds the serialized row and the job output from the log store.
+    """
+
+    def __init__(self, root: Path, now: datetime):
+        self.path = Path(root) / f"jobs-{now:%Y%m%d-%H%M%S}.jsonl.gz"
+        self.fh = None
+        self.store = get_log_store()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.fh:
+            self.fh.close()
+
+    def output(self, job: Job) -> str | None:
+        if not job.log_path:
+            return None
+        try:
+            with self.store.open(job.log_path) as fh:
+                return fh.read().decode("utf-8", errors="replace")
+        except FileNotFoundError:
+            return None
+
+    def write(self, jobs: list[Job]) -> None:
+        if self.fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.fh = gzip.open(self.path, "at", encoding="utf-8")
+        for job, record in zip(jobs, serializers.serialize("python", jobs)):
+            record["output"] = self.output(job)
+            self.fh.write(json.dumps(record, cls=DjangoJSONEncoder) + "\n")
+        # Rows are deleted right after, the archive must be on disk first
+        self.fh.flush()
+
+
+def prune(schedule_id, now: datetime, archive: JobArchive, batch_size: int) -> int:
+    """Archives and deletes the expired jobs of a schedule in batches, returns how many were pruned."""
+    queryset = expired_jobs(schedule_id, now).order_by("created_at", "id")
+    store = get_log_store()
+    pruned = 0
+    while batch := list(queryset[:batch_size]):
+        archive.write(batch)
+        Job.objects.filter(pk__in=[job.pk for job in batch]).delete()
+        counters.adjust("job", -len(batch))
+        for job in batch:
+            if job.log_path:
+                store.delete(job.log_path)
+        pruned += len(batch)
+    return pruned
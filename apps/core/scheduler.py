@@ -0,0 +1,112 @@
+import heapq
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.core import cron
+from apps.core.models import Schedule
+
+logger = logging.getLogger(__name__)
+
+# Shared by the schedulers of the process, a generation is never reused
+GENERATIONS = itertools.count()
+
+
+class Scheduler:
+    """
+    Keeps the next fire time of every active schedule in a heap and hands due schedules to a
+    bounded pool of worker threads.
+
+    Schedules are re-read every `refresh` seconds with a single query. Every schedule has one
+    pending heap entry, tagged with a generation: a schedule that is changed or reactivated gets a
+    new one. Entries of older generations and of removed schedules are dropped when they reach
+    the top instead of being searched for.
+
+    With a `lead`, schedules are dispatched that many seconds ahead of their fire time, which is
+    how images are prewarmed.
+    """
+
+    def __init__(self, dispatch: Callable[[str], None], workers: int, refresh: int, lead: int = 0):
+        self.dispatch = dispatch
+        self.refresh = refresh
+        self.lead = timedelta(seconds=lead)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scheduler")
+        self.heap: list[tuple[datetime, str, int, tuple[str, int]]] = []
+        # Cron rule and spread offset of every active schedule, with the generation of its entry
+        self.rules: dict[str, tuple[tuple[str, int], int]] = {}
+        self.stopped = threading.Event()
+
+    def load(self, now: datetime) -> None:
+        rules = {}
+        for schedule_id, cron_rule, spread_seconds in Schedule.objects.filter(active=True).values_list(
+            "id", "cron_rule", "spread_seconds"
+        ):
+            schedule_id = str(schedule_id)
+            rule = (cron_rule, Schedule.fire_offset(schedule_id, spread_seconds))
+            if schedule_id in self.rules and self.rules[schedule_id][0] == rule:
+                rules[schedule_id] = self.rules[schedule_id]
+            else:
+                rules[schedule_id] = (rule, next(GENERATIONS))
+                self._push(schedule_id, rules[schedule_id][1], rule, now)
+        self.rules = rules
+
+    def _push(self, schedule_id: str, generation: int, rule: tuple[str, int], after: datetime) -> None:
+        cron_rule, offset = rule
+        parsed = cron.parse(cron_rule)
+        if parsed.rule is None:
+            logger.warning("[%s] invalid cron rule %r: %s", schedule_id, cron_rule, parsed.error)
+            return
+        # The offset delays fires, the cron instant they belong to is before `after`
+        fire_at = parsed.rule.next_fire(after - timedelta(seconds=offset))
+        if fire_at is not None:
+            heapq.heappush(self.heap, (fire_at + timedelta(seconds=offset) - self.lead, schedule_id, generation, rule))
+
+    def pop_due(self, now: datetime) -> list[str]:
+        """Removes and returns the schedules due at `now`, queueing their following fire."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            dispatch_at, schedule_id, generation, rule = heapq.heappop(self.heap)
+            if schedule_id not in self.rules or self.rules[schedule_id][1] != generation:
+                continue
+            due.append(schedule_id)
+            # Fires missed while the scheduler was busy are not replayed
+            self._push(schedule_id, generation, rule, max(dispatch_at, now) + self.lead)
+        return due
+
+    def next_wakeup(self, now: datetime) -> float:
+        """Seconds until the next due fire, capped by the refresh interval."""
+        if not self.heap:
+            return self.refresh
+        return min(max((self.heap[0][0] - now).total_seconds(), 0), self.refresh)
+
+    def _run_job(self, schedule_id: str) -> None:
+        try:
+            self.dispatch(schedule_id)
+        except Exception:
+            logger.exception("[%s] failed to dispatch job", schedule_id)
+        finally:
+            close_old_connections()
+
+    def run_forever(self) -> None:
+        next_refresh = timezone.now()
+        while not self.stopped.is_set():
+            now = timezone.now()
+            if now >= next_refresh:
+                self.load(now)
+                close_old_connections()
+                next_refresh = now + timedelta(seconds=self.refresh)
+
+            for schedule_id in self.pop_due(now):
+                self.executor.submit(self._run_job, schedule_id)
+
+            self.stopped.wait(min(self.next_wakeup(now), (next_refresh - now).total_seconds()))
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.executor.shutdown(wait=True)
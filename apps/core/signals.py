@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core import counters, crontab
+from apps.core.models import Credential, Job, Schedule
+from apps.node.models import Node
+
+# Job deletions are accounted for by `prune_jobs` itself: a post_delete receiver on Job would
+# make Django load every deleted row to send the signal, instead of one DELETE per batch.
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_save, sender=Job)
+@receiver(post_save, sender=Credential)
+@receiver(post_save, sender=Node)
+def count_created(sender, created, **kwargs):  # pylint: disable=unused-argument
+    if created:
+        counters.adjust(sender.__name__.lower(), 1)
+
+
+@receiver(post_delete, sender=Schedule)
+@receiver(post_delete, sender=Credential)
+@receiver(post_delete, sender=Node)
+def count_deleted(sender, **kwargs):  # pylint: disable=unused-argument
+    counters.adjust(sender.__name__.lower(), -1)
+    if sender is Schedule:
+        # Its jobs are deleted in cascade
+        counters.invalidate("job")
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def schedule_changed(sender, **kwargs):  # pylint: disable=unused-argument
+    if settings.SCHEDULER_BACKEND == "cron":
+        crontab.mark_dirty()
@@ -1,14 +1,29 @@
+from .counters import TestResourceCounters
 from .credential import (
     TestCredentialCreateView,
     TestCredentialDeleteView,
     TestCredentialListView,
 )
+from .cron import TestCronRule, TestParse
+from .crontab import TestCrontabSync
+from .dag import TestDag
 from .describe_cron import TestDescribeCronView
+from .images import TestBuildImage, TestPullImage
+from .job import TestJobListView, TestJobTimings, TestKeysetPaginator
+from .job_log import TestJobLogViews
+from .job_queries import TestJobQueryPlans
+from .jobqueue import TestConcurrencyLimits, TestJobQueue
+from .lease import TestScheduleLease
+from .logstore import TestFileLogStore, TestHeadTailBuffer
+from .retention import TestPrune, TestRollup
 from .schedule import (
     TestScheduleCreateView,
     TestScheduleDeleteView,
     TestScheduleListView,
 )
+from .scheduler import TestScheduler
+from .transfer import TestScheduleTransfer
+from .update_history import TestUpdateHistoryEvents, TestUpdateHistoryReconcile
 
 __all__ = [
     # Credential
@@ -19,6 +34,32 @@ __all__ = [
     "TestScheduleCreateView",
     "TestScheduleDeleteView",
     "TestScheduleListView",
+    "TestScheduleTransfer",
+    # Scheduler
+    "TestCronRule",
+    "TestParse",
+    "TestScheduler",
+    "TestCrontabSync",
+    "TestJobQueue",
+    "TestConcurrencyLimits",
+    "TestDag",
+    "TestScheduleLease",
+    "TestPullImage",
+    "TestBuildImage",
+    # Job history
+    "TestUpdateHistoryEvents",
+    "TestUpdateHistoryReconcile",
+    "TestHeadTailBuffer",
+    "TestFileLogStore",
+    "TestJobLogViews",
+    # Job
+    "TestJobListView",
+    "TestJobTimings",
+    "TestKeysetPaginator",
+    "TestJobQueryPlans",
+    "TestRollup",
+    "TestPrune",
     # Miscellaneous,
     "TestDescribeCronView",
+    "TestResourceCounters",
 ]
@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase
+
+from apps.core import counters
+from apps.core.models import Job, Schedule
+
+
+class TestResourceCounters(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        Job.objects.create(schedule=self.schedule)
+
+    def test_cached(self):
+        self.assertEqual(counters.get_count("job"), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.get_count("job"), 1)
+            self.assertEqual(counters.get_count("unknown"), 0)
+
+    def test_signals(self):
+        counters.get_count("schedule")
+        counters.get_count("job")
+
+        other = Schedule.objects.create(name="other", cron_rule="* * * * *", image="test")
+        Job.objects.create(schedule=other)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.get_count("schedule"), 2)
+            self.assertEqual(counters.get_count("job"), 2)
+
+        # Jobs are deleted in cascade with their schedule
+        other.delete()
+        self.assertEqual(counters.get_count("schedule"), 1)
+        self.assertEqual(counters.get_count("job"), 1)
+
+    def test_template_tag(self):
+        template = Template('{% load describe_cron %}{% resource_count "schedule" %}')
+        self.assertEqual(template.render(Context()), "1")
+        with self.assertNumQueries(0):
+            template.render(Context())
@@ -0,0 +1,78 @@
+from datetime import datetime, timezone
+from itertools import islice
+
+from django.test import SimpleTestCase
+
+from apps.core.cron import CronParseError, CronRule, parse
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestCronRule(SimpleTestCase):
+    def test_every_minute(self):
+        rule = CronRule("* * * * *")
+        self.assertEqual(rule.next_fire(utc(2024, 7, 20, 15, 53, 12)), utc(2024, 7, 20, 15, 54))
+
+    def test_next_fire_is_strictly_after(self):
+        rule = CronRule("0 * * * *")
+        self.assertEqual(rule.next_fire(utc(2024, 7, 20, 15, 0)), utc(2024, 7, 20, 16, 0))
+
+    def test_steps_ranges_and_lists(self):
+        rule = CronRule("*/15 9-17 * * 1-5")
+        # Saturday evening, next fire is Monday morning
+        self.assertEqual(rule.next_fire(utc(2024, 7, 20, 18, 0)), utc(2024, 7, 22, 9, 0))
+        self.assertEqual(rule.next_fire(utc(2024, 7, 22, 9, 0)), utc(2024, 7, 22, 9, 15))
+        self.assertEqual(CronRule("5,35 * * * *").minutes, {5, 35})
+
+    def test_names_and_sunday_aliases(self):
+        self.assertEqual(CronRule("0 0 * jan,dec sun").months, {1, 12})
+        self.assertEqual(CronRule("0 0 * * 7").weekdays, {0})
+        self.assertEqual(CronRule("@hourly").minutes, {0})
+
+    def test_day_of_month_or_day_of_week(self):
+        rule = CronRule("0 0 13 * 5")
+        # 2024-07-19 is a Friday, 2024-08-13 a Tuesday
+        self.assertEqual(rule.next_fire(utc(2024, 7, 14)), utc(2024, 7, 19))
+        self.assertTrue(rule.matches(utc(2024, 8, 13)))
+
+    def test_month_rollover(self):
+        rule = CronRule("30 2 1 * *")
+        self.assertEqual(rule.next_fire(utc(2024, 12, 15)), utc(2025, 1, 1, 2, 30))
+
+    def test_impossible_rule(self):
+        self.assertIsNone(CronRule("0 0 30 2 *").next_fire(utc(2024, 1, 1)))
+
+    def test_invalid_rules(self):
+        for expression in ("* * * *", "60 * * * *", "* * * * mon-", "*/0 * * * *", "some expression"):
+            with self.subTest(expression=expression), self.assertRaises(CronParseError):
+                CronRule(expression)
+
+
+class TestParse(SimpleTestCase):
+    def test_memoized(self):
+        parse.cache_clear()
+        self.assertIs(parse("*/5 * * * *"), parse("*/5 * * * *"))
+        self.assertEqual(parse.cache_info().hits, 1)
+
+    def test_description_and_next_fires(self):
+        parsed = parse("0 9 * * 1")
+        self.assertTrue(parsed.valid)
+        self.assertEqual(parsed.description, "At 09:00, every day, only on Monday")
+        # 2024-07-20 is a Saturday
+        self.assertEqual(
+            list(islice(parsed.next_fires(utc(2024, 7, 20)), 2)),
+            [utc(2024, 7, 22, 9, 0), utc(2024, 7, 29, 9, 0)],
+        )
+
+    def test_impossible_rule_has_no_fires(self):
+        self.assertEqual(list(parse("0 0 30 2 *").next_fires(utc(2024, 1, 1))), [])
+
+    def test_invalid_rules(self):
+        for expression in ("", "some expression", "60 * * * *"):
+            with self.subTest(expression=expression):
+                parsed = parse(expression)
+                self.assertFalse(parsed.valid)
+                self.assertIsNone(parsed.rule)
+                self.assertEqual(list(parsed.next_fires(utc(2024, 1, 1))), [])
@@ -0,0 +1,88 @@
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+
+from apps.core import crontab
+from apps.core.models import Schedule
+
+
+@override_settings(CRONJOB_CMD="{cron_rule}\troot\trun {schedule_id} {delay}", CRONTAB_SHARDS=4)
+class TestCrontabSync(TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = Path(tmp_dir.name)
+        self.schedules = [
+            Schedule.objects.create(name=f"schedule {index}", cron_rule="*/5 * * * *", image="test")
+            for index in range(10)
+        ]
+
+    def lines(self) -> set[str]:
+        return {
+            line
+            for entry in self.path.glob("ct_*")
+            for line in entry.read_text(encoding="utf-8").splitlines()
+            if not line.startswith("#")
+        }
+
+    def test_consolidates_active_schedules_in_shards(self):
+        Schedule.objects.filter(pk=self.schedules[0].pk).update(active=False)
+        result = crontab.sync(self.path)
+
+        self.assertLessEqual(len(result.written), 4)
+        self.assertEqual({entry.name for entry in self.path.iterdir()}, set(result.written))
+        self.assertEqual(self.lines(), {f"*/5 * * * *\troot\trun {schedule.id} 0" for schedule in self.schedules[1:]})
+
+    def test_only_changed_shards_are_rewritten(self):
+        crontab.sync(self.path)
+        self.assertFalse(crontab.sync(self.path).changed)
+
+        schedule = self.schedules[3]
+        schedule.cron_rule = "0 * * * *"
+        schedule.save()
+        result = crontab.sync(self.path)
+        self.assertEqual(result.written, [crontab.shard_name(schedule.id, 4)])
+        self.assertIn(f"0 * * * *\troot\trun {schedule.id} 0", self.lines())
+
+    def test_stale_files_are_removed(self):
+        legacy = self.path / f"ct_{self.schedules[0].id}"
+        legacy.write_text("* * * * *\troot\told\n", encoding="utf-8")
+        (self.path / "other").write_text("* * * * *\troot\tkept\n", encoding="utf-8")
+
+        Schedule.objects.all().delete()
+        result = crontab.sync(self.path)
+        self.assertEqual(result.removed, [legacy.name])
+        self.assertEqual([entry.name for entry in self.path.iterdir()], ["other"])
+
+    def test_clear(self):
+        crontab.sync(self.path)
+        (self.path / "other").write_text("* * * * *\troot\tkept\n", encoding="utf-8")
+
+        self.assertTrue(crontab.clear(self.path).removed)
+        self.assertEqual([entry.name for entry in self.path.iterdir()], ["other"])
+
+    def test_dry_run(self):
+        result = crontab.sync(self.path, dry_run=True)
+        self.assertTrue(result.written)
+        self.assertEqual(list(self.path.iterdir()), [])
+
+    def test_invalid_rules_are_left_out(self):
+        Schedule.objects.filter(pk=self.schedules[0].pk).update(cron_rule="60 * * * *")
+        crontab.sync(self.path)
+        self.assertEqual(len(self.lines()), 9)
+
+    @override_settings(SCHEDULER_BACKEND="cron")
+    def test_schedule_changes_mark_dirty(self):
+        syncer = crontab.CrontabSync(interval=5, resync=300)
+        with override_settings(CRONTAB_PATH=self.path):
+            syncer.sync_once()
+            self.assertFalse(syncer.dirty())
+
+            # Seen by the syncer whichever process changed the schedule
+            self.schedules[0].delete()
+            self.assertTrue(syncer.dirty())
+
+            syncer.sync_once()
+        self.assertFalse(syncer.dirty())
+        self.assertEqual(len(self.lines()), 9)
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.core.management.base import CommandError
+from django.http import QueryDict
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.core import dag
+from apps.core.forms import ScheduleUpdateForm
+from apps.core.models import Job, JobStatusChoices, Schedule
+
+
+@mock.patch("apps.core.triggers.executor")
+class TestDag(TestCase):
+    def setUp(self):
+        self.extract = Schedule.objects.create(name="extract", cron_rule="0 * * * *", image="test")
+        self.transform = Schedule.objects.create(name="transform", cron_rule="0 0 1 1 *", image="test")
+        self.enrich = Schedule.objects.create(name="enrich", cron_rule="0 0 1 1 *", image="test")
+        self.load = Schedule.objects.create(name="load", cron_rule="0 0 1 1 *", image="test")
+        # extract fans out to transform and enrich, load fans in
+        self.transform.upstream.add(self.extract)
+        self.enrich.upstream.add(self.extract)
+        self.load.upstream.add(self.transform, self.enrich)
+
+    @staticmethod
+    def finish(schedule: Schedule, status_code: int = 0) -> Job:
+        return Job.objects.create(
+            schedule=schedule,
+            status=JobStatusChoices.EXITED,
+            status_code=status_code,
+            finished_at=timezone.now(),
+        )
+
+    def test_fan_out(self, executor):
+        jobs = dag.dispatch_downstream(self.finish(self.extract))
+        self.assertEqual({job.schedule for job in jobs}, {self.transform, self.enrich})
+        self.assertEqual(executor.submit.call_count, 2)
+
+    def test_failure_stops_the_pipeline(self, executor):
+        self.assertEqual(dag.dispatch_downstream(self.finish(self.extract, status_code=1)), [])
+        executor.submit.assert_not_called()
+
+    def test_fan_in_waits_for_every_upstream(self, executor):
+        dag.dispatch_downstream(self.finish(self.extract))
+        self.assertEqual(dag.dispatch_downstream(self.finish(self.transform)), [])
+
+        jobs = dag.dispatch_downstream(self.finish(self.enrich))
+        self.assertEqual([job.schedule for job in jobs], [self.load])
+        # load only runs again once both upstreams succeeded again
+        self.assertEqual(dag.dispatch_downstream(self.finish(self.enrich)), [])
+        self.assertEqual(executor.submit.call_count, 3)
+
+    def test_downstream_errors_are_isolated(self, executor):
+        trigger = dag.triggers.trigger
+
+        def deleted_transform(schedule_id, **kwargs):
+            if schedule_id == self.transform.id:
+                raise CommandError(f"Schedule {schedule_id} does not exist")
+            return trigger(schedule_id, **kwargs)
+
+        with mock.patch("apps.core.dag.triggers.trigger", side_effect=deleted_transform):
+            jobs = dag.dispatch_downstream(self.finish(self.extract))
+        self.assertEqual([job.schedule for job in jobs], [self.enrich])
+        executor.submit.assert_called_once()
+
+    def test_repeated_dispatch(self, executor):
+        job = self.finish(self.extract)
+        dag.dispatch_downstream(job)
+        self.assertEqual(dag.dispatch_downstream(job), [])
+        self.assertEqual(Job.objects.filter(schedule=self.transform).count(), 1)
+        self.assertEqual(executor.submit.call_count, 2)
+
+    def test_cycle_detection(self, executor):  # pylint: disable=unused-argument
+        self.assertTrue(dag.creates_cycle(self.extract.id, [self.load.id]))
+        self.assertTrue(dag.creates_cycle(self.extract.id, [self.extract.id]))
+        self.assertFalse(dag.creates_cycle(self.load.id, [self.extract.id]))
+
+        data = QueryDict(mutable=True)
+        data.update({"name": "extract", "cron_rule": "0 * * * *", "pull_policy": "always"})
+        data.setlist("upstream", [self.load.id])
+        form = ScheduleUpdateForm(instance=self.extract, data=data)
+        self.assertFalse(form.is_valid())
+        self.assertIn("upstream", form.errors)
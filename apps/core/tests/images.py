@@ -0,0 +1,141 @@
+import subprocess
+from datetime import timedelta
+from unittest import mock
+
+import docker
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.core import images
+from apps.core.models import PulledImage, PullPolicyChoices, Schedule
+from apps.node.models import Node
+
+
+def fake_client(present: bool):
+    client = mock.Mock()
+    client.api.pull.return_value = iter([{"status": "Pulling"}])
+    image = mock.Mock(attrs={"RepoDigests": ["ghcr.io/org/job@sha256:abc"]})
+    if present:
+        client.images.get.return_value = image
+    else:
+        client.images.get.side_effect = [docker.errors.ImageNotFound("missing"), image]
+    return client
+
+
+class TestPullImage(TestCase):
+    def schedule(self, **kwargs):
+        return Schedule.objects.create(name="test", cron_rule="* * * * *", image="ghcr.io/org/job:latest", **kwargs)
+
+    def test_always(self):
+        client = fake_client(present=True)
+        self.assertEqual(images.pull_image(client, self.schedule()), ("ghcr.io/org/job:latest", False))
+        client.api.pull.assert_called_once()
+        self.assertEqual(PulledImage.objects.get(image="ghcr.io/org/job:latest").digest, "sha256:abc")
+
+    def test_if_not_present(self):
+        schedule = self.schedule(pull_policy=PullPolicyChoices.IF_NOT_PRESENT)
+
+        client = fake_client(present=True)
+        self.assertEqual(images.pull_image(client, schedule), ("ghcr.io/org/job:latest", True))
+        client.api.pull.assert_not_called()
+
+        client = fake_client(present=False)
+        self.assertEqual(images.pull_image(client, schedule), ("ghcr.io/org/job:latest", False))
+        client.api.pull.assert_called_once()
+
+    def test_refresh(self):
+        schedule = self.schedule(pull_policy=PullPolicyChoices.REFRESH, pull_refresh_minutes=10)
+        client = fake_client(present=True)
+
+        self.assertFalse(images.pull_image(client, schedule)[1])
+        self.assertTrue(images.pull_image(client, schedule)[1])
+
+        PulledImage.objects.update(pulled_at=timezone.now() - timedelta(minutes=11))
+        self.assertFalse(images.pull_image(client, schedule)[1])
+        self.assertEqual(client.api.pull.call_count, 2)
+
+    def test_pinned_digest(self):
+        schedule = self.schedule(pull_policy=PullPolicyChoices.PINNED_DIGEST, image_digest="sha256:abc")
+        client = fake_client(present=False)
+
+        self.assertEqual(images.pull_image(client, schedule), ("ghcr.io/org/job@sha256:abc", False))
+        client.api.pull.assert_called_once_with(
+            "ghcr.io/org/job@sha256:abc", auth_config=None, stream=True, decode=True
+        )
+
+    def test_digest_reference(self):
+        self.assertEqual(images.digest_reference("ubuntu:24.04", "sha256:abc"), "ubuntu@sha256:abc")
+        self.assertEqual(
+            images.digest_reference("localhost:5000/org/job:1.0", "sha256:abc"), "localhost:5000/org/job@sha256:abc"
+        )
+        self.assertEqual(images.digest_reference("org/job@sha256:old", "sha256:abc"), "org/job@sha256:abc")
+
+
+COMMIT = "0123456789abcdef0123456789abcdef01234567"
+
+
+class TestBuildImage(TestCase):
+    def setUp(self):
+        self.schedule = Schedule.objects.create(
+            name="test", cron_rule="* * * * *", image="https://github.com/org/jobs.git#main:docker"
+        )
+        self.client = mock.Mock()
+        self.client.images.build.return_value = (mock.Mock(), iter([{"stream": "Step 1/1"}]))
+        ls_remote = subprocess.CompletedProcess([], 0, stdout=f"{COMMIT}\trefs/heads/main\n")
+        self.enterContext(mock.patch("apps.core.images.subprocess.run", return_value=ls_remote))
+
+    def test_build_new_commit(self):
+        self.client.images.get.side_effect = docker.errors.ImageNotFound("missing")
+
+        self.assertEqual(images.build_image(self.client, self.schedule), (f"{self.schedule.id}:0123456789ab", False))
+        self.client.images.build.assert_called_once_with(
+            path=f"https://github.com/org/jobs.git#{COMMIT}:docker",
+            tag=f"{self.schedule.id}:0123456789ab",
+            cache_from=None,
+        )
+
+    def test_reuse_built_commit(self):
+        self.assertEqual(images.build_image(self.client, self.schedule), (f"{self.schedule.id}:0123456789ab", True))
+        self.client.images.build.assert_not_called()
+
+    def test_unresolved_ref(self):
+        with mock.patch("apps.core.images.subprocess.run", side_effect=subprocess.CalledProcessError(128, "git")):
+            self.assertEqual(images.build_image(self.client, self.schedule), (f"{self.schedule.id}:latest", False))
+        self.client.images.build.assert_called_once_with(path=self.schedule.image, tag=f"{self.schedule.id}:latest")
+
+    def test_resolve_annotated_tag(self):
+        ls_remote = subprocess.CompletedProcess(
+            [], 0, stdout=f"{'f' * 40}\trefs/tags/v1\n{COMMIT}\trefs/tags/v1^{{}}\n"
+        )
+        with mock.patch("apps.core.images.subprocess.run", return_value=ls_remote) as run:
+            self.assertEqual(images.resolve_commit("https://github.com/org/jobs.git", "v1"), COMMIT)
+        self.assertEqual(run.call_args.args[0], ["git", "ls-remote", "--", "https://github.com/org/jobs.git", "v1"])
+
+    def test_resolve_rejects_options(self):
+        with mock.patch("apps.core.images.subprocess.run") as run:
+            self.assertIsNone(images.resolve_commit("https://github.com/org/jobs.git", "--upload-pack=touch /tmp/x"))
+            self.assertIsNone(images.resolve_commit("--upload-pack=touch /tmp/x", "HEAD"))
+        run.assert_not_called()
+
+
+class TestPrewarm(TestCase):
+    @mock.patch("apps.core.images.pull_image")
+    @mock.patch("apps.core.images.pool")
+    def test_prewarm_nodes(self, pool, pull_image):
+        schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="ghcr.io/org/job:latest")
+        down = Node.objects.create(name="down", host="down", healthy=True)
+        up = Node.objects.create(name="up", host="up", healthy=True)
+        Node.objects.create(name="drained", host="drained", healthy=False)
+
+        def connect(node):
+            if node == down:
+                raise ConnectionError("refused")
+            return node
+
+        pool.get.side_effect = connect
+
+        # A failing node is logged and skipped, unhealthy nodes aren't tried
+        with self.assertLogs("apps.core.images", "ERROR"):
+            images.prewarm(schedule.id)
+        self.assertCountEqual([call.args[0] for call in pool.get.call_args_list], [down, up])
+        pull_image.assert_called_once_with(up, schedule, host=str(up.id))
@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core.models import Job, Schedule
+from apps.core.pagination import KeysetPaginator
+from apps.core.tests.helpers import EasyResponse, add_default_data
+
+User = get_user_model()
+
+
+class TestJobListView(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        add_default_data()
+        cls.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        cls.other_schedule = Schedule.objects.create(name="other", cron_rule="* * * * *", image="test")
+        now = timezone.now()
+        # Jobs sharing a creation time must still be paginated without gaps or duplicates
+        for index in range(60):
+            Job.objects.create(
+                schedule=cls.schedule if index % 2 else cls.other_schedule,
+                created_at=now - timedelta(minutes=index // 3),
+                status="exited" if index % 2 else "failure",
+                log="x" * 1000,
+            )
+
+    def setUp(self):
+        self.user = User.objects.get(username="testuser")
+        self.client.force_login(self.user)
+
+    def test_pages(self):
+        seen = []
+        cursor = None
+        while True:
+            response = self.client.get(reverse("job-list"), {"cursor": cursor} if cursor else {})
+            self.assertEqual(response.status_code, 200)
+            seen += [job.id for job in EasyResponse(response).object_list]
+            cursor = response.context["next_cursor"]
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), 60)
+        self.assertEqual(seen, list(Job.objects.order_by("-created_at", "-id").values_list("id", flat=True)))
+
+    def test_heavy_columns_are_deferred(self):
+        response = self.client.get(reverse("job-list"))
+        job = EasyResponse(response).object_list[0]
+        self.assertEqual(job.get_deferred_fields(), {"log", "state"})
+
+    def test_filters(self):
+        response = self.client.get(reverse("job-list"), {"status": "failure", "schedule": self.other_schedule.id})
+        jobs = EasyResponse(response).object_list
+        self.assertEqual(len(jobs), 30)
+        self.assertTrue(all(job.schedule_id == self.other_schedule.id for job in jobs))
+
+    def test_order_by_duration(self):
+        for index, job in enumerate(Job.objects.filter(status="exited")[:3]):
+            job.duration_ms = (index + 1) * 1000
+            job.save()
+
+        response = self.client.get(reverse("job-list"), {"order": "longest"})
+        jobs = EasyResponse(response).object_list
+        self.assertEqual([job.duration_ms for job in jobs], [3000, 2000, 1000])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("job-list"), {"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
+
+class TestJobTimings(TestCase):
+    def test_update_timings(self):
+        schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        job = Job(
+            schedule=schedule,
+            status="exited",
+            state={"StartedAt": "2024-07-20T15:53:00.5Z", "FinishedAt": "2024-07-22T15:53:01.75Z"},
+        )
+        job.update_timings()
+        # Runs longer than a day keep their days
+        self.assertEqual(job.duration_ms, 2 * 86400 * 1000 + 1250)
+        self.assertEqual(job.duration(), 2 * 86400 + 1)
+
+        job.state = {"StartedAt": "2024-07-20T15:53:00Z", "FinishedAt": "0001-01-01T00:00:00Z"}
+        job.update_timings()
+        self.assertIsNone(job.finished_at)
+        self.assertEqual(job.duration(), "n/a")
+
+
+class TestKeysetPaginator(TestCase):
+    def test_cursor_round_trip(self):
+        schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        job = Job.objects.create(schedule=schedule)
+        paginator = KeysetPaginator(Job.objects.all(), ("-created_at", "-id"), page_size=1)
+        self.assertEqual(paginator.decode_cursor(paginator.encode_cursor(job)), [job.created_at, job.id])
+
+        for cursor in ("", "e30=", "WyJhIl0=", "WyJhIiwgImIiXQ=="):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                paginator.decode_cursor(cursor)
@@ -0,0 +1,159 @@
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.core.logstore import get_log_store
+from apps.core.models import Job, Schedule
+from apps.core.tests.helpers import add_default_data
+
+User = get_user_model()
+
+LOG = b"".join(f"line {index}\n".encode() for index in range(1000))
+
+
+def log_stream(chunks: list[bytes]) -> mock.MagicMock:
+    """A followed Docker log stream, which can be closed from another thread."""
+    stream = mock.MagicMock()
+    stream.__iter__.return_value = iter(chunks)
+    return stream
+
+
+class TestJobLogViews(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        add_default_data()
+
+    def setUp(self):
+        log_root = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(log_root.cleanup)
+        self.enterContext(override_settings(JOB_LOG_ROOT=log_root.name))
+
+        self.user = User.objects.get(username="testuser")
+        self.client.force_login(self.user)
+        schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        stored = get_log_store().save("job", iter([LOG]))
+        self.job = Job.objects.create(
+            schedule=schedule, status="exited", status_code=0, log_path=stored.pointer, log_size=stored.size
+        )
+
+    def test_detail_renders_tail(self):
+        response = self.client.get(reverse("job-log", kwargs={"pk": self.job.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["log_size"], len(LOG))
+        self.assertTrue(response.context["log_tail"].startswith("line 500\n"))
+        self.assertEqual(response.context["log_offset"], LOG.index(b"line 500\n"))
+        self.assertFalse(response.context["log_follow"])
+
+    def test_offset_and_limit(self):
+        response = self.client.get(reverse("job-log-range", kwargs={"pk": self.job.id}), {"offset": 7, "limit": 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"line 1\n")
+        self.assertEqual(response["X-Log-Size"], str(len(LOG)))
+
+    def test_tail(self):
+        response = self.client.get(reverse("job-log-range", kwargs={"pk": self.job.id}), {"tail": 2})
+        self.assertEqual(response.content, b"line 998\nline 999\n")
+
+    @mock.patch("apps.core.views.LOG_MAX_TAIL_LINES", 3)
+    def test_tail_is_capped(self):
+        url = reverse("job-log-range", kwargs={"pk": self.job.id})
+        self.assertEqual(self.client.get(url, {"tail": 10**9}).content, b"line 997\nline 998\nline 999\n")
+        self.assertEqual(self.client.get(url, {"tail": "all"}).status_code, 400)
+
+    def test_http_range(self):
+        url = reverse("job-log-range", kwargs={"pk": self.job.id})
+
+        response = self.client.get(url, headers={"Range": "bytes=0-6"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b"line 0\n")
+        self.assertEqual(response["Content-Range"], f"bytes 0-6/{len(LOG)}")
+
+        response = self.client.get(url, headers={"Range": "bytes=-9"})
+        self.assertEqual(response.content, b"line 999\n")
+
+        response = self.client.get(url, headers={"Range": f"bytes={len(LOG)}-"})
+        self.assertEqual(response.status_code, 416)
+
+    def test_invalid_range(self):
+        url = reverse("job-log-range", kwargs={"pk": self.job.id})
+        self.assertEqual(self.client.get(url, {"offset": "abc"}).status_code, 400)
+        self.assertEqual(self.client.get(url, headers={"Range": "lines=1-2"}).status_code, 400)
+
+    def test_follow_finished_job(self):
+        response = self.client.get(reverse("job-log-follow", kwargs={"pk": self.job.id}))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(b"".join(response.streaming_content), b"event: end\ndata: \n\n")
+
+    @mock.patch("apps.core.views.pool")
+    def test_follow_running_job(self, pool):
+        self.job.status_code = None
+        self.job.save()
+        logs = pool.get.return_value.containers.get.return_value.logs
+        # Lines and a multibyte character split across chunks
+        logs.return_value = log_stream(
+            [
+                b"2024-07-20T12:00:00.000000001Z first li",
+                b"ne\r\n2024-07-20T12:00:01.000000000Z second\n2024-07-20T12:00:02.000000000Z th\xc3",
+                b"\xa9",
+                b"ird",
+            ]
+        )
+
+        response = self.client.get(reverse("job-log-follow", kwargs={"pk": self.job.id}))
+        self.assertEqual(
+            b"".join(response.streaming_content).decode(),
+            "id: 2024-07-20T12:00:00.000000001Z\ndata: first line\n\n"
+            "id: 2024-07-20T12:00:01.000000000Z\ndata: second\n\n"
+            "id: 2024-07-20T12:00:02.000000000Z\ndata: th\u00e9ird\n\n"
+            "event: end\ndata: \n\n",
+        )
+        self.assertEqual(logs.call_args.kwargs["tail"], 500)
+
+    @mock.patch("apps.core.views.pool")
+    def test_follow_resumes_after_last_event(self, pool):
+        self.job.status_code = None
+        self.job.save()
+        logs = pool.get.return_value.containers.get.return_value.logs
+        logs.return_value = log_stream([b"2024-07-20T12:00:00.000000001Z sent\n2024-07-20T12:00:00.500000000Z new\n"])
+
+        response = self.client.get(
+            reverse("job-log-follow", kwargs={"pk": self.job.id}), HTTP_LAST_EVENT_ID="2024-07-20T12:00:00.000000001Z"
+        )
+        self.assertEqual(
+            b"".join(response.streaming_content).decode(),
+            "id: 2024-07-20T12:00:00.500000000Z\ndata: new\n\nevent: end\ndata: \n\n",
+        )
+        self.assertEqual(logs.call_args.kwargs["since"], 1721476800)
+
+    @mock.patch("apps.core.views.LOG_FOLLOW_SECONDS", 0)
+    @mock.patch("apps.core.views.pool")
+    def test_follow_times_out(self, pool):
+        self.job.status_code = None
+        self.job.save()
+        logs = log_stream([b"2024-07-20T12:00:00.000000001Z line\n"])
+        pool.get.return_value.containers.get.return_value.logs.return_value = logs
+
+        # Closed without the end event, the browser reconnects
+        response = self.client.get(reverse("job-log-follow", kwargs={"pk": self.job.id}))
+        self.assertEqual(
+            b"".join(response.streaming_content).decode(), "id: 2024-07-20T12:00:00.000000001Z\ndata: line\n\n"
+        )
+        logs.close.assert_called()
+
+    @mock.patch("apps.core.views.log_followers")
+    def test_follow_limit(self, log_followers):
+        self.job.status_code = None
+        self.job.save()
+        log_followers.acquire.return_value = False
+
+        response = self.client.get(reverse("job-log-follow", kwargs={"pk": self.job.id}))
+        self.assertEqual(b"".join(response.streaming_content), b"retry: 10000\n\n")
+        log_followers.release.assert_not_called()
+
+    def test_legacy_log(self):
+        job = Job.objects.create(schedule=self.job.schedule, status="failure", status_code=-200, log="pull failed")
+        response = self.client.get(reverse("job-log", kwargs={"pk": job.id}))
+        self.assertEqual(response.context["log_tail"], "pull failed")
@@ -0,0 +1,44 @@
+import unittest
+
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+
+from apps.core.models import Job, JobStatusChoices, Schedule
+from apps.node.placement import RESERVING
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "Query plans are checked on SQLite")
+class TestJobQueryPlans(TestCase):
+    """The hot queries on Job must use an index, a full scan grows with the whole history."""
+
+    def setUp(self):
+        self.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        Job.objects.bulk_create(
+            Job(schedule=self.schedule, status=JobStatusChoices.EXITED, status_code=0, provisioning=False)
+            for _ in range(50)
+        )
+
+    def assert_uses_index(self, queryset, index: str):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotRegex(plan, r"SCAN core_job(?! USING)")
+
+    def test_unfinished_jobs(self):
+        self.assert_uses_index(
+            Job.objects.filter(status_code__isnull=True, provisioning=False).order_by(), "job_unfinished_idx"
+        )
+        self.assert_uses_index(
+            Job.objects.filter(RESERVING).values("node_id").annotate(jobs=Count("id")), "job_unfinished_idx"
+        )
+
+    def test_queue(self):
+        self.assert_uses_index(
+            Job.objects.filter(status=JobStatusChoices.QUEUED).order_by("created_at", "id"), "job_queued_idx"
+        )
+
+    def test_job_list(self):
+        self.assert_uses_index(Job.objects.order_by("-created_at", "-id")[:51], "job_created_idx")
+        self.assert_uses_index(
+            Job.objects.filter(schedule=self.schedule).order_by("-created_at", "-id")[:51], "job_schedule_created_idx"
+        )
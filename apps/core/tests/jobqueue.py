@@ -0,0 +1,138 @@
+from unittest import mock
+
+import requests
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from apps.core.jobqueue import JobQueue
+from apps.core.management.commands.run_schedule import Command as RunScheduleCommand
+from apps.core.models import Job, JobStatusChoices, Schedule
+from apps.node.models import Node
+from apps.node.placement import LimitReached, NoCapacity, check_limits
+
+User = get_user_model()
+
+
+class TestJobQueue(TestCase):
+    def setUp(self):
+        self.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        self.job = Job.objects.create(schedule=self.schedule, status=JobStatusChoices.QUEUED)
+        self.queue = JobQueue(workers=1, interval=5)
+        self.queue.executor = mock.Mock()
+
+    @mock.patch("apps.node.placement.pick_node", return_value=None)
+    def test_drain(self, _pick_node):
+        self.queue.drain()
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, JobStatusChoices.WAITING)
+        self.queue.executor.submit.assert_called_once()
+
+        # Placed jobs leave the queue
+        self.queue.drain()
+        self.queue.executor.submit.assert_called_once()
+
+    @mock.patch("apps.node.placement.pick_node", return_value=None)
+    def test_placed_once(self, _pick_node):
+        # run_schedule still holds the job as queued while the queue places it
+        command = RunScheduleCommand()
+        command.job, command.schedule = Job.objects.get(pk=self.job.pk), self.schedule
+        self.queue.drain()
+
+        with mock.patch.object(command, "provision") as provision:
+            command.dispatch()
+        provision.assert_not_called()
+        self.queue.executor.submit.assert_called_once()
+
+        # And the other way around, the queue placing a job from its stale list
+        stale = Job.objects.create(schedule=self.schedule, status=JobStatusChoices.QUEUED)
+        self.assertTrue(RunScheduleCommand().place_queued(Job.objects.get(pk=stale.pk)))
+        self.assertFalse(RunScheduleCommand().place_queued(stale))
+
+    @mock.patch("apps.core.management.commands.run_schedule.pool")
+    @mock.patch("apps.core.images.pull_image", side_effect=requests.exceptions.ConnectionError("refused"))
+    def test_fail_over(self, _pull_image, pool):
+        # The cached client of a node that went away since it connected
+        node = Node.objects.create(name="test", host="test", healthy=True)
+        Job.objects.filter(pk=self.job.pk).update(node=node, status=JobStatusChoices.WAITING)
+        command = RunScheduleCommand()
+        command.job, command.schedule, command.node = Job.objects.get(pk=self.job.pk), self.schedule, node
+        command.provision()
+
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.node, self.job.status_code), (JobStatusChoices.QUEUED, None, None))
+        self.assertFalse(Node.objects.get(pk=node.pk).healthy)
+        pool.discard.assert_called_once_with(node)
+
+    def test_dispatch_behind_queued_jobs(self):
+        command = RunScheduleCommand()
+        with mock.patch.object(command, "place", return_value=True) as place, mock.patch.object(command, "provision"):
+            # Stuck jobs of other schedules don't hold fires back
+            other = Schedule.objects.create(name="other", cron_rule="* * * * *", image="test")
+            command.enqueue(other.id)
+            command.dispatch()
+            place.assert_called_once()
+
+            # Older jobs of the same schedule start first
+            place.reset_mock()
+            command.enqueue(self.schedule.id)
+            command.dispatch()
+            place.assert_not_called()
+
+    @mock.patch("apps.node.placement.pick_node", side_effect=NoCapacity)
+    def test_drain_no_capacity(self, _pick_node):
+        self.queue.drain()
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, JobStatusChoices.QUEUED)
+        self.queue.executor.submit.assert_not_called()
+
+    @override_settings(MAX_CONCURRENT_JOBS=3)
+    @mock.patch("apps.node.placement.pick_node", return_value=None)
+    def test_drain_round_robin(self, _pick_node):
+        busy = Schedule.objects.create(name="busy", cron_rule="* * * * *", image="test")
+        busy_jobs = [Job.objects.create(schedule=busy, status=JobStatusChoices.QUEUED) for _ in range(5)]
+        other = Job.objects.create(schedule=Schedule.objects.create(name="other", cron_rule="* * * * *", image="test"))
+        Job.objects.filter(pk=other.pk).update(status=JobStatusChoices.QUEUED)
+
+        self.queue.drain()
+
+        # Each schedule gets a turn before a schedule gets a second one, up to the global limit
+        placed = set(Job.objects.exclude(status=JobStatusChoices.QUEUED).values_list("id", flat=True))
+        self.assertEqual(placed, {self.job.id, busy_jobs[0].id, other.id})
+        self.assertEqual(self.queue.executor.submit.call_count, 3)
+
+
+class TestConcurrencyLimits(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test", created_by=self.user)
+        self.other = Schedule.objects.create(name="other", cron_rule="* * * * *", image="test", created_by=self.user)
+        Job.objects.create(schedule=self.schedule)
+        # Queued and finished jobs don't count
+        Job.objects.create(schedule=self.schedule, status=JobStatusChoices.QUEUED)
+        Job.objects.create(schedule=self.schedule, status_code=0)
+
+    def assert_limit(self, scope, schedule):
+        with self.assertRaises(LimitReached) as context:
+            check_limits(schedule)
+        self.assertEqual(context.exception.scope, scope)
+
+    def test_unlimited(self):
+        with self.assertNumQueries(0):
+            check_limits(self.schedule)
+
+    @override_settings(MAX_JOBS_PER_SCHEDULE=1)
+    def test_schedule_limit(self):
+        self.assert_limit("schedule", self.schedule)
+        check_limits(self.other)
+
+    @override_settings(MAX_JOBS_PER_USER=1)
+    def test_user_limit(self):
+        self.assert_limit("user", self.other)
+        check_limits(Schedule.objects.create(name="anonymous", cron_rule="* * * * *", image="test"))
+
+    @override_settings(MAX_CONCURRENT_JOBS=1, MAX_JOBS_PER_SCHEDULE=5)
+    def test_global_limit(self):
+        with self.assertNumQueries(1):
+            self.assert_limit("global", self.other)
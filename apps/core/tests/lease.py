@@ -0,0 +1,39 @@
+import uuid
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.core.models import Schedule, ScheduleLease
+
+
+class TestScheduleLease(TestCase):
+    def setUp(self):
+        self.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test", singleton=True)
+        self.holder = uuid.uuid4()
+
+    def test_acquire(self):
+        with self.assertNumQueries(4):
+            # Conditional update, then creation of the lease in a savepoint
+            self.assertTrue(ScheduleLease.acquire(self.schedule.id, self.holder))
+        self.assertFalse(ScheduleLease.acquire(self.schedule.id, uuid.uuid4()))
+
+    def test_release(self):
+        ScheduleLease.acquire(self.schedule.id, self.holder)
+        ScheduleLease.release([self.holder])
+
+        holder = uuid.uuid4()
+        with self.assertNumQueries(1):
+            self.assertTrue(ScheduleLease.acquire(self.schedule.id, holder))
+        self.assertEqual(ScheduleLease.objects.get(schedule=self.schedule).holder, holder)
+
+    def test_expired(self):
+        ScheduleLease.acquire(self.schedule.id, self.holder)
+        ScheduleLease.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(ScheduleLease.acquire(self.schedule.id, uuid.uuid4()))
+
+    def test_renew(self):
+        ScheduleLease.acquire(self.schedule.id, self.holder)
+        ScheduleLease.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        ScheduleLease.renew([self.holder])
+        self.assertFalse(ScheduleLease.acquire(self.schedule.id, uuid.uuid4()))
@@ -0,0 +1,48 @@
+import tempfile
+
+from django.test import SimpleTestCase
+
+from apps.core.logstore import FileLogStore, HeadTailBuffer
+
+
+class TestHeadTailBuffer(SimpleTestCase):
+    def capture(self, chunks, max_bytes):
+        output = []
+        buffer = HeadTailBuffer(output.append, max_bytes)
+        for chunk in chunks:
+            buffer.feed(chunk)
+        buffer.close()
+        return b"".join(output), buffer
+
+    def test_small_output_is_kept(self):
+        output, buffer = self.capture([b"abc", b"def"], max_bytes=10)
+        self.assertEqual(output, b"abcdef")
+        self.assertEqual(buffer.size, 6)
+        self.assertFalse(buffer.truncated)
+
+    def test_large_output_keeps_head_and_tail(self):
+        output, buffer = self.capture([b"0123456789"] * 10, max_bytes=8)
+        self.assertEqual(output, b"0123\n\n[... 92 bytes truncated ...]\n\n6789")
+        self.assertEqual(buffer.size, 100)
+        self.assertTrue(buffer.truncated)
+
+    def test_tail_memory_is_bounded(self):
+        buffer = HeadTailBuffer(lambda chunk: None, max_bytes=100)
+        for _ in range(1000):
+            buffer.feed(b"x" * 10)
+        self.assertLessEqual(buffer.tail_size, 50 + 10)
+
+
+class TestFileLogStore(SimpleTestCase):
+    def test_save_open_delete(self):
+        with tempfile.TemporaryDirectory() as root:
+            store = FileLogStore(root, max_bytes=1024)
+            stored = store.save("3f2c5a1e", iter([b"hello ", b"world\n"]))
+
+            self.assertEqual(stored.pointer, "3f/3f2c5a1e.log.gz")
+            self.assertEqual(stored.size, 12)
+            with store.open(stored.pointer) as fh:
+                self.assertEqual(fh.read(), b"hello world\n")
+
+            store.delete(stored.pointer)
+            store.delete(stored.pointer)
@@ -0,0 +1,131 @@
+import gzip
+import json
+import tempfile
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+
+from apps.core import retention
+from apps.core.logstore import get_log_store
+from apps.core.models import Job, JobRollup, Schedule
+
+NOW = datetime(2024, 7, 20, 12, 0, tzinfo=dt_timezone.utc)
+
+
+class TestRollup(TestCase):
+    def setUp(self):
+        self.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        for hour, status_code, duration_ms in [(1, 0, 1000), (2, 0, 3000), (3, 1, 2000), (4, None, None)]:
+            Job.objects.create(
+                schedule=self.schedule,
+                created_at=datetime(2024, 7, 18, hour, tzinfo=dt_timezone.utc),
+                status_code=status_code,
+                duration_ms=duration_ms,
+            )
+        Job.objects.create(schedule=self.schedule, created_at=datetime(2024, 7, 19, 1, tzinfo=dt_timezone.utc))
+
+    def test_rollup(self):
+        # Days are rolled up once all their jobs finished
+        self.assertEqual(retention.rollup(self.schedule.id, until=date(2024, 7, 19)), 0)
+        Job.objects.filter(status_code__isnull=True).update(status_code=-300)
+        self.assertEqual(retention.rollup(self.schedule.id, until=date(2024, 7, 19)), 1)
+
+        rollup = JobRollup.objects.get()
+        self.assertEqual(rollup.day, date(2024, 7, 18))
+        self.assertEqual(rollup.runs, 4)
+        self.assertEqual(rollup.failures, 2)
+        self.assertEqual(rollup.p50_duration_ms, 2000)
+        self.assertEqual(rollup.p95_duration_ms, 3000)
+
+        # Days already rolled up are skipped
+        self.assertEqual(retention.rollup(self.schedule.id, until=date(2024, 7, 20)), 1)
+        self.assertEqual(JobRollup.objects.count(), 2)
+
+    def test_rollup_stops_at_unfinished_day(self):
+        Job.objects.filter(created_at__day=18, status_code__isnull=True).update(status_code=0)
+        Job.objects.create(
+            schedule=self.schedule, created_at=datetime(2024, 7, 20, 1, tzinfo=dt_timezone.utc), status_code=0
+        )
+
+        # The 19th is still running, the 20th waits for it even if it is done
+        self.assertEqual(retention.rollup(self.schedule.id, until=date(2024, 7, 21)), 1)
+        self.assertEqual(JobRollup.objects.get().day, date(2024, 7, 18))
+
+
+@override_settings(JOB_RETENTION_DAYS=7, JOB_RETENTION_FAILURE_DAYS=30, JOB_RETENTION_KEEP_LAST=2)
+class TestPrune(TestCase):
+    def setUp(self):
+        log_root = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(log_root.cleanup)
+        self.enterContext(override_settings(JOB_LOG_ROOT=log_root.name))
+        self.archive_root = Path(log_root.name) / "archive"
+
+        self.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        self.old_success = self.create_job(days=10, status_code=0)
+        self.old_success.log_path = get_log_store().save(str(self.old_success.id), [b"output\n"]).pointer
+        self.old_success.save()
+        self.old_failure = self.create_job(days=11, status_code=1)
+        self.ancient_failure = self.create_job(days=40, status_code=1)
+        self.unfinished = self.create_job(days=40, status_code=None)
+        self.recent = [self.create_job(days=days, status_code=0) for days in (3, 2, 1)]
+        # As if rolled up before the unfinished job was stuck
+        JobRollup.objects.create(schedule=self.schedule, day=(NOW - timedelta(days=2)).date())
+
+    def create_job(self, days: int, status_code):
+        return Job.objects.create(
+            schedule=self.schedule, created_at=NOW - timedelta(days=days), status_code=status_code
+        )
+
+    def prune(self, batch_size=1000) -> int:
+        with retention.JobArchive(self.archive_root, NOW) as archive:
+            return retention.prune(self.schedule.id, NOW, archive, batch_size)
+
+    def test_expired_jobs(self):
+        expired = set(retention.expired_jobs(self.schedule.id, NOW))
+        # Failures are kept longer and unfinished jobs are never expired
+        self.assertEqual(expired, {self.old_success, self.ancient_failure})
+
+    def test_expired_jobs_stop_at_rollup_frontier(self):
+        # The unfinished job holds back the rollup, jobs after it are kept until it finishes
+        JobRollup.objects.all().delete()
+        until = (NOW - timedelta(days=1)).date()
+        self.assertEqual(retention.rollup(self.schedule.id, until), 0)
+        self.assertFalse(retention.expired_jobs(self.schedule.id, NOW).exists())
+        self.assertEqual(self.prune(), 0)
+        self.assertEqual(Job.objects.count(), 7)
+
+        self.unfinished.status_code = 1
+        self.unfinished.save()
+        self.assertEqual(retention.rollup(self.schedule.id, until), 5)
+        expired = set(retention.expired_jobs(self.schedule.id, NOW))
+        self.assertEqual(expired, {self.old_success, self.ancient_failure, self.unfinished})
+
+    @override_settings(JOB_RETENTION_KEEP_LAST=4)
+    def test_keep_last(self):
+        self.assertEqual(set(retention.expired_jobs(self.schedule.id, NOW)), {self.ancient_failure})
+
+    @override_settings(JOB_RETENTION_DAYS=0)
+    def test_keep_forever(self):
+        self.assertFalse(retention.expired_jobs(self.schedule.id, NOW).exists())
+
+    def test_prune(self):
+        self.assertEqual(self.prune(batch_size=1), 2)
+
+        self.assertFalse(Job.objects.filter(pk__in=[self.old_success.pk, self.ancient_failure.pk]).exists())
+        self.assertEqual(Job.objects.count(), 5)
+        self.assertFalse((Path(get_log_store().root) / self.old_success.log_path).exists())
+
+        archive_files = list(self.archive_root.iterdir())
+        self.assertEqual(len(archive_files), 1)
+        with gzip.open(archive_files[0], "rt") as fh:
+            records = {record["pk"]: record for record in map(json.loads, fh)}
+        self.assertEqual(set(records), {str(self.old_success.pk), str(self.ancient_failure.pk)})
+        self.assertEqual(records[str(self.old_success.pk)]["output"], "output\n")
+        self.assertEqual(records[str(self.ancient_failure.pk)]["fields"]["status_code"], 1)
+
+    def test_nothing_to_prune(self):
+        Job.objects.filter(pk__in=[self.old_success.pk, self.ancient_failure.pk]).delete()
+        self.assertEqual(self.prune(), 0)
+        self.assertFalse(self.archive_root.exists())
@@ -74,6 +74,27 @@ class TestScheduleCreateView(TestCase):
             },
         )
 
+    def test_post_refresh_policy_without_interval(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            "/create/",
+            {
+                "name": "test",
+                "cron_rule": "0 0 * * *",
+                "image": "test",
+                "pull_policy": "refresh",
+            },
+        )
+
+        view = EasyResponse(response)
+
+        self.assertEqual(
+            view.form.errors,
+            {
+                "pull_refresh_minutes": ["Required with the refresh pull policy"],
+            },
+        )
+
     def test_post_valid(self):
         self.client.force_login(self.user)
         response = self.client.post(
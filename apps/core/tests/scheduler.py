@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from apps.core.models import Schedule
+from apps.core.scheduler import Scheduler
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class TestScheduler(TestCase):
+    def setUp(self):
+        self.hourly = Schedule.objects.create(name="hourly", cron_rule="0 * * * *", image="test")
+        self.minutely = Schedule.objects.create(name="minutely", cron_rule="* * * * *", image="test")
+        Schedule.objects.create(name="inactive", cron_rule="* * * * *", image="test", active=False)
+        self.scheduler = Scheduler(dispatch=lambda schedule_id: None, workers=1, refresh=15)
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_only_active_schedules_are_loaded(self):
+        self.scheduler.load(utc(2024, 7, 20, 15, 53, 30))
+        self.assertEqual(set(self.scheduler.rules), {str(self.hourly.id), str(self.minutely.id)})
+
+    def test_pop_due(self):
+        self.scheduler.load(utc(2024, 7, 20, 15, 53, 30))
+
+        self.assertEqual(self.scheduler.pop_due(utc(2024, 7, 20, 15, 53, 59)), [])
+        self.assertEqual(self.scheduler.pop_due(utc(2024, 7, 20, 15, 54)), [str(self.minutely.id)])
+        self.assertEqual(
+            sorted(self.scheduler.pop_due(utc(2024, 7, 20, 16, 0))),
+            sorted([str(self.hourly.id), str(self.minutely.id)]),
+        )
+
+    def test_changed_and_removed_schedules(self):
+        self.scheduler.load(utc(2024, 7, 20, 15, 53, 30))
+
+        self.hourly.cron_rule = "30 * * * *"
+        self.hourly.save()
+        self.minutely.delete()
+        self.scheduler.load(utc(2024, 7, 20, 15, 54, 30))
+
+        self.assertEqual(self.scheduler.pop_due(utc(2024, 7, 20, 16, 0)), [])
+        self.assertEqual(self.scheduler.pop_due(utc(2024, 7, 20, 16, 30)), [str(self.hourly.id)])
+
+    def test_reactivated_schedule_fires_once(self):
+        self.scheduler.load(utc(2024, 7, 20, 15, 53, 30))
+        Schedule.objects.filter(pk=self.hourly.pk).update(active=False)
+        self.scheduler.load(utc(2024, 7, 20, 15, 53, 40))
+        Schedule.objects.filter(pk=self.hourly.pk).update(active=True)
+        self.scheduler.load(utc(2024, 7, 20, 15, 53, 50))
+
+        # The entry pushed before the deactivation is stale, only the new one fires
+        self.assertEqual(self.scheduler.pop_due(utc(2024, 7, 20, 16, 0)).count(str(self.hourly.id)), 1)
+        self.assertEqual(self.scheduler.pop_due(utc(2024, 7, 20, 17, 0)).count(str(self.hourly.id)), 1)
+
+    def test_next_wakeup(self):
+        self.scheduler.load(utc(2024, 7, 20, 15, 53, 30))
+        self.assertEqual(self.scheduler.next_wakeup(utc(2024, 7, 20, 15, 53, 50)), 10)
+        self.assertEqual(self.scheduler.next_wakeup(utc(2024, 7, 20, 15, 53)), 15)
+
+    def test_lead(self):
+        scheduler = Scheduler(dispatch=lambda schedule_id: None, workers=1, refresh=15, lead=120)
+        self.addCleanup(scheduler.stop)
+        scheduler.load(utc(2024, 7, 20, 15, 53, 30))
+
+        # The 15:54 fire is already within the lead time and is prewarmed right away, once
+        self.assertEqual(scheduler.pop_due(utc(2024, 7, 20, 15, 53, 30)), [str(self.minutely.id)])
+        self.assertEqual(scheduler.pop_due(utc(2024, 7, 20, 15, 53, 59)), [])
+        # Two minutes ahead of the 15:56 fire
+        self.assertEqual(scheduler.pop_due(utc(2024, 7, 20, 15, 54)), [str(self.minutely.id)])
+        self.assertEqual(
+            sorted(scheduler.pop_due(utc(2024, 7, 20, 15, 58))),
+            sorted([str(self.hourly.id), str(self.minutely.id)]),
+        )
+
+    def test_spread(self):
+        with mock.patch.object(Schedule, "fire_offset", return_value=20):
+            self.scheduler.load(utc(2024, 7, 20, 15, 53, 30))
+
+        # Every fire of the schedule is delayed by the same offset
+        self.assertEqual(self.scheduler.pop_due(utc(2024, 7, 20, 15, 54, 19)), [])
+        self.assertEqual(self.scheduler.pop_due(utc(2024, 7, 20, 15, 54, 20)), [str(self.minutely.id)])
+        self.assertEqual(self.scheduler.pop_due(utc(2024, 7, 20, 15, 55, 20)), [str(self.minutely.id)])
+
+    def test_fire_offset(self):
+        self.minutely.spread_seconds = 60
+        offset = self.minutely.offset
+        self.assertTrue(0 <= offset < 60)
+        self.assertEqual(Schedule.fire_offset(self.minutely.id, 60), offset)
+
+    @override_settings(SCHEDULE_SPREAD_SECONDS=30)
+    def test_default_spread(self):
+        self.assertEqual(self.hourly.offset, Schedule.fire_offset(self.hourly.id, 30))
+        self.hourly.spread_seconds = 0
+        self.assertEqual(self.hourly.offset, 0)
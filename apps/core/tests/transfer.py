@@ -0,0 +1,178 @@
+import io
+import json
+import uuid
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.core import transfer
+from apps.core.models import Credential, Schedule
+from apps.core.tests.helpers import add_default_data
+
+
+class TestScheduleTransfer(TestCase):
+    def setUp(self):
+        self.user = add_default_data()
+        self.credential = Credential.objects.create(name="registry", username="user", password="secret")
+        self.schedule = Schedule.objects.create(
+            name="nightly",
+            cron_rule="0 3 * * *",
+            image="registry.example.com/job:latest",
+            credential=self.credential,
+            env_vars={"KEY": "value"},
+            cpu=2,
+        )
+
+    def roundtrip(self, fmt: str) -> list[dict]:
+        content = "".join(transfer.dump(Schedule.objects.all(), fmt))
+        return list(transfer.load(io.StringIO(content), fmt))
+
+    def test_roundtrip(self):
+        for fmt in transfer.FORMATS:
+            with self.subTest(fmt=fmt):
+                [record] = self.roundtrip(fmt)
+                self.assertEqual(record["credential"], "registry")
+                self.assertEqual(record["env_vars"], {"KEY": "value"})
+
+                Schedule.objects.filter(pk=self.schedule.pk).update(cron_rule="* * * * *", credential=None)
+                result = transfer.import_schedules([record])
+                self.assertEqual((result.created, result.updated), (0, 1))
+                self.schedule.refresh_from_db()
+                self.assertEqual(self.schedule.cron_rule, "0 3 * * *")
+                self.assertEqual(self.schedule.credential, self.credential)
+                self.assertEqual(self.schedule.cpu, 2)
+
+    def test_upstream_roundtrip(self):
+        downstream = Schedule.objects.create(name="report", cron_rule="0 0 1 1 *", image="test")
+        downstream.upstream.add(self.schedule)
+        for fmt in transfer.FORMATS:
+            with self.subTest(fmt=fmt):
+                records = self.roundtrip(fmt)
+                self.assertEqual([record["upstream"] for record in records], [[], [str(self.schedule.id)]])
+
+                downstream.upstream.clear()
+                transfer.import_schedules(records)
+                self.assertEqual(list(downstream.upstream.all()), [self.schedule])
+
+        # Records without links keep those of the schedule
+        transfer.import_schedules(
+            [{"id": str(downstream.id), "name": "report", "cron_rule": "* * * * *", "image": "t"}]
+        )
+        self.assertEqual(list(downstream.upstream.all()), [self.schedule])
+
+    def test_invalid_upstream(self):
+        unknown = uuid.uuid4()
+        records = [
+            {"name": "unknown", "cron_rule": "* * * * *", "image": "test", "upstream": [str(unknown)]},
+            {"name": "invalid", "cron_rule": "* * * * *", "image": "test", "upstream": "nightly"},
+        ]
+        with self.assertRaises(transfer.InvalidSchedules) as context:
+            transfer.import_schedules(records)
+        self.assertEqual(len(context.exception.errors), 2)
+        self.assertIn(f"#1 unknown: upstream: Unknown schedule {unknown}", context.exception.errors)
+
+        # nightly -> new -> nightly
+        new_id = str(uuid.uuid4())
+        records = [
+            {
+                "id": new_id,
+                "name": "new",
+                "cron_rule": "* * * * *",
+                "image": "test",
+                "upstream": [str(self.schedule.id)],
+            },
+            {
+                "id": str(self.schedule.id),
+                "name": "nightly",
+                "cron_rule": "0 3 * * *",
+                "image": "test",
+                "upstream": [new_id],
+            },
+        ]
+        with self.assertRaises(transfer.InvalidSchedules):
+            transfer.import_schedules(records)
+        self.assertEqual(Schedule.objects.count(), 1)
+        self.assertFalse(self.schedule.upstream.exists())
+
+    def test_empty_export(self):
+        for fmt in transfer.FORMATS:
+            with self.subTest(fmt=fmt):
+                content = "".join(transfer.dump(Schedule.objects.none(), fmt))
+                self.assertEqual(list(transfer.load(io.StringIO(content), fmt)), [])
+
+    def test_batched_upsert(self):
+        records = [{"name": f"job-{index}", "cron_rule": "*/5 * * * *", "image": "test"} for index in range(2500)]
+        records.append({"id": str(self.schedule.id), "name": "renamed", "cron_rule": "0 3 * * *", "image": "test"})
+
+        with CaptureQueriesContext(connection) as queries:
+            result = transfer.import_schedules(records, user=self.user, batch_size=1000)
+        # A lookup and a few inserts per batch, not a query per schedule
+        self.assertLess(len(queries), 100)
+        self.assertEqual((result.created, result.updated), (2500, 1))
+        self.assertEqual(Schedule.objects.filter(created_by=self.user).count(), 2500)
+        # Existing schedules keep their owner
+        self.schedule.refresh_from_db()
+        self.assertEqual((self.schedule.name, self.schedule.created_by), ("renamed", None))
+
+    def test_invalid_records_import_nothing(self):
+        records = [
+            {"name": "valid", "cron_rule": "* * * * *", "image": "test"},
+            {"name": "bad-rule", "cron_rule": "60 * * * *", "image": "test"},
+            {"name": "bad-credential", "cron_rule": "* * * * *", "image": "test", "credential": "unknown"},
+            {"id": str(self.schedule.id), "name": "first", "cron_rule": "* * * * *", "image": "test"},
+            {"id": str(self.schedule.id), "name": "second", "cron_rule": "* * * * *", "image": "test"},
+        ]
+        with self.assertRaises(transfer.InvalidSchedules) as context:
+            transfer.import_schedules(records)
+        self.assertEqual(len(context.exception.errors), 3)
+        self.assertEqual(Schedule.objects.count(), 1)
+
+    def test_malformed_files(self):
+        for fmt, content in [
+            ("yaml", "- name: [unclosed\n"),
+            ("json", "[{"),
+            ("json", '{"name": "x"}'),
+            ("yaml", "name: x\n"),
+            ("json", '["x"]'),
+        ]:
+            with self.subTest(fmt=fmt, content=content), self.assertRaises(transfer.InvalidSchedules):
+                list(transfer.load(io.StringIO(content), fmt))
+
+    def test_fixture(self):
+        fixture = [
+            {"model": "core.credential", "pk": str(uuid.uuid4()), "fields": {"name": "other"}},
+            {
+                "model": "core.schedule",
+                "pk": str(self.schedule.id),
+                "fields": {"name": "fixture", "cron_rule": "* * * * *", "image": "test", "sequential_failures": 0},
+            },
+        ]
+        records = list(transfer.load(io.StringIO(json.dumps(fixture)), "json"))
+        self.assertEqual(
+            records, [{"id": str(self.schedule.id), "name": "fixture", "cron_rule": "* * * * *", "image": "test"}]
+        )
+
+    def test_views(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("schedule-export"), data={"format": "csv"})
+        self.assertEqual(response.status_code, 200)
+        content = b"".join(response.streaming_content)
+
+        schedule_id = uuid.uuid4()
+        content += f"{schedule_id},uploaded,,,* * * * *,True,False,,test,,,,,always,,\n".encode()
+        response = self.client.post(
+            reverse("schedule-import"), data={"file": SimpleUploadedFile("schedules.csv", content)}
+        )
+        self.assertEqual(json.loads(response.content), {"created": 1, "updated": 1})
+        self.assertEqual(Schedule.objects.get(pk=schedule_id).created_by, self.user)
+
+        response = self.client.post(reverse("schedule-import"), data={"file": SimpleUploadedFile("schedules.txt", b"")})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            reverse("schedule-import"), data={"file": SimpleUploadedFile("schedules.yaml", b"name: x\n")}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content), {"errors": ["Expected a list of schedules"]})
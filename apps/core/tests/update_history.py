@@ -0,0 +1,221 @@
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+import docker
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.core.docker_client import JOB_LABEL
+from apps.core.management.commands.update_history import Command
+from apps.core.models import Job, JobStatusChoices, Schedule, ScheduleLease
+from apps.node.models import Node
+
+
+def fake_container(status: str, exit_code: int = 0, job_id=None):
+    container = mock.Mock()
+    container.status = status
+    container.attrs = {"State": {"Status": status, "ExitCode": exit_code}, "Labels": {JOB_LABEL: str(job_id)}}
+    container.logs.return_value = iter([b"hello ", b"world\n"])
+    return container
+
+
+class TestUpdateHistoryEvents(TestCase):
+    def setUp(self):
+        log_root = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(log_root.cleanup)
+        self.enterContext(override_settings(JOB_LOG_ROOT=log_root.name))
+
+        self.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        self.job = Job.objects.create(schedule=self.schedule, provisioning=False)
+        self.command = Command()
+        self.client = mock.Mock()
+
+    def event(self, action: str, job_id=None):
+        return {"Type": "container", "Action": action, "Actor": {"Attributes": {JOB_LABEL: str(job_id or self.job.id)}}}
+
+    def test_start_event(self):
+        self.client.containers.get.return_value = fake_container("running")
+        self.command.handle_event(self.client, self.event("start"))
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "running")
+        self.assertIsNone(self.job.status_code)
+
+    def test_die_event(self):
+        container = fake_container("exited", exit_code=3)
+        self.client.containers.get.return_value = container
+        self.command.handle_event(self.client, self.event("die"))
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "exited")
+        self.assertEqual(self.job.status_code, 3)
+        self.assertEqual(self.job.log_size, 12)
+        self.assertEqual(self.job.read_log(), "hello world\n")
+        container.remove.assert_called_once()
+
+    def test_event_for_provisioning_job(self):
+        Job.objects.filter(pk=self.job.pk).update(provisioning=True)
+        self.client.containers.get.return_value = fake_container("exited")
+        self.command.handle_event(self.client, self.event("die"))
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status_code, 0)
+
+    def test_event_for_finished_or_unknown_job(self):
+        Job.objects.filter(pk=self.job.pk).update(status_code=0)
+        self.command.handle_event(self.client, self.event("die"))
+        self.command.handle_event(self.client, self.event("die", job_id="00000000-0000-0000-0000-000000000000"))
+
+        self.client.containers.get.assert_not_called()
+
+
+class TestUpdateHistoryReconcile(TestCase):  # pylint: disable=too-many-instance-attributes
+    def setUp(self):
+        log_root = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(log_root.cleanup)
+        self.enterContext(override_settings(JOB_LOG_ROOT=log_root.name))
+
+        self.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test")
+        self.running = Job.objects.create(schedule=self.schedule, provisioning=False, status="running")
+        self.finished = Job.objects.create(schedule=self.schedule, provisioning=False, status="running")
+        self.started = Job.objects.create(schedule=self.schedule, provisioning=False)
+        self.lost = Job.objects.create(schedule=self.schedule, provisioning=False)
+        self.command = Command()
+        self.client = mock.Mock()
+        self.enterContext(mock.patch("apps.core.management.commands.update_history.pool.get", return_value=self.client))
+        self.containers = [
+            fake_container("running", job_id=self.running.id),
+            fake_container("exited", exit_code=1, job_id=self.finished.id),
+            fake_container("running", job_id=self.started.id),
+        ]
+        self.client.containers.list.return_value = self.containers
+
+    def test_reconcile(self):
+        # Select jobs and queued jobs, then one bulk update and the lease updates inside a
+        # savepoint, independent of the number of jobs
+        with self.assertNumQueries(7):
+            self.command.reconcile()
+
+        self.client.containers.list.assert_called_once()
+        self.client.containers.get.assert_not_called()
+
+        # Only containers whose status changed are inspected
+        self.containers[0].reload.assert_not_called()
+        self.containers[1].reload.assert_called_once()
+        self.containers[1].remove.assert_called_once()
+        self.containers[2].reload.assert_called_once()
+
+        self.finished.refresh_from_db()
+        self.assertEqual(self.finished.status, "exited")
+        self.assertEqual(self.finished.status_code, 1)
+        self.assertEqual(self.finished.read_log(), "hello world\n")
+
+        self.started.refresh_from_db()
+        self.assertEqual(self.started.status, "running")
+        self.assertIsNone(self.started.status_code)
+
+    @mock.patch("apps.core.triggers.executor")
+    def test_reconcile_dispatches_downstream(self, executor):
+        downstream = Schedule.objects.create(name="downstream", cron_rule="0 0 1 1 *", image="test")
+        downstream.upstream.add(self.schedule)
+        self.containers[1].attrs["State"]["ExitCode"] = 0
+
+        self.command.reconcile()
+        self.command.reconcile()
+
+        self.assertEqual(Job.objects.filter(schedule=downstream).count(), 1)
+        executor.submit.assert_called_once()
+
+    @mock.patch("apps.core.dag.ready_downstream", side_effect=RuntimeError("database is locked"))
+    def test_reconcile_downstream_errors(self, _ready_downstream):
+        self.containers[1].attrs["State"]["ExitCode"] = 0
+        self.command.reconcile()
+
+        # The batch is still recorded and cleaned up
+        self.finished.refresh_from_db()
+        self.assertEqual(self.finished.status_code, 0)
+        self.containers[1].remove.assert_called_once()
+
+    def test_reconcile_leases(self):
+        provisioning = Job.objects.create(schedule=self.schedule, provisioning=True)
+        for job in (self.running, self.finished, self.lost, provisioning):
+            schedule = Schedule.objects.create(name="singleton", cron_rule="* * * * *", image="test", singleton=True)
+            ScheduleLease.acquire(schedule.id, job.id)
+        ScheduleLease.objects.update(expires_at=timezone.now())
+
+        self.command.reconcile()
+
+        leases = {lease.holder: lease for lease in ScheduleLease.objects.all()}
+        # Finished jobs release their lease, live ones renew it and lost ones let it expire
+        self.assertNotIn(self.finished.id, leases)
+        self.assertGreater(leases[self.running.id].expires_at, timezone.now())
+        self.assertLess(leases[self.lost.id].expires_at, timezone.now())
+        # Pulling or building, before the container exists
+        self.assertGreater(leases[provisioning.id].expires_at, timezone.now())
+
+        self.lost.refresh_from_db()
+        self.assertEqual(self.lost.status, "waiting")
+
+    @override_settings(JOB_LOST_SWEEPS=2)
+    def test_reconcile_lost_job(self):
+        schedule = Schedule.objects.create(name="singleton", cron_rule="* * * * *", image="test", singleton=True)
+        ScheduleLease.acquire(schedule.id, self.lost.id)
+
+        self.command.reconcile()
+        self.lost.refresh_from_db()
+        self.assertIsNone(self.lost.status_code)
+
+        # Missing again, the job is failed and frees its reservation and lease
+        self.command.reconcile()
+        self.lost.refresh_from_db()
+        self.assertEqual(self.lost.status, JobStatusChoices.FAILURE)
+        self.assertEqual(self.lost.status_code, -300)
+        self.assertTrue(self.lost.exception_on_run)
+        self.assertFalse(ScheduleLease.objects.filter(holder=self.lost.id).exists())
+        self.assertEqual(self.command.missed_sweeps, {})
+
+    @override_settings(JOB_LOST_SWEEPS=1, JOB_PROVISIONING_TIMEOUT=600)
+    def test_reconcile_stalled_provisioning(self):
+        Job.objects.filter(pk=self.lost.pk).delete()
+        long_ago = timezone.now() - timedelta(hours=1)
+        stalled = Job.objects.create(schedule=self.schedule, provisioning=True)
+        provisioning = Job.objects.create(schedule=self.schedule, provisioning=True)
+        queued = Job.objects.create(schedule=self.schedule, provisioning=True, status=JobStatusChoices.QUEUED)
+        Job.objects.filter(pk__in=[stalled.pk, queued.pk]).update(created_at=long_ago)
+
+        self.command.reconcile()
+
+        # Queued jobs wait for capacity, they are never lost
+        statuses = dict(Job.objects.values_list("id", "status_code"))
+        self.assertEqual(statuses[stalled.id], -300)
+        self.assertIsNone(statuses[provisioning.id])
+        self.assertIsNone(statuses[queued.id])
+
+    def test_reconcile_unreachable_node(self):
+        node = Node.objects.create(name="remote", host="10.0.0.2", port=2375)
+        Job.objects.filter(pk=self.lost.pk).update(node=node)
+
+        def get_client(job_node):
+            if job_node == node:
+                raise docker.errors.DockerException("unreachable")
+            return self.client
+
+        with mock.patch("apps.core.management.commands.update_history.pool.get", side_effect=get_client):
+            self.command.reconcile()
+
+        # Jobs of reachable nodes are still updated, the others are left for the next sweep
+        self.started.refresh_from_db()
+        self.assertEqual(self.started.status, "running")
+        self.lost.refresh_from_db()
+        self.assertIsNone(self.lost.status_code)
+
+        # Until the node has been unreachable for longer than the leases last
+        with (
+            mock.patch("apps.core.management.commands.update_history.pool.get", side_effect=get_client),
+            mock.patch("apps.core.management.commands.update_history.time.monotonic", return_value=10**9),
+        ):
+            self.command.reconcile()
+        self.lost.refresh_from_db()
+        self.assertEqual((self.lost.status, self.lost.status_code), (JobStatusChoices.FAILURE, -300))
+        self.assertTrue(self.lost.log.startswith("Node unreachable"))
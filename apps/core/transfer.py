@@ -0,0 +1,287 @@
+import csv
+import io
+import json
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import PurePath
+from typing import Iterable, Iterator, TextIO
+
+import yaml
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import QuerySet
+
+from apps.core import counters, cron, crontab, dag
+from apps.core.models import Credential, Schedule
+
+# Fields of an exported schedule, the credential is referenced by name and the upstream
+# schedules by id. Imported records without `upstream` keep the links of the schedule
+FIELDS = [
+    "id",
+    "name",
+    "cmd",
+    "parameters",
+    "cron_rule",
+    "active",
+    "singleton",
+    "spread_seconds",
+    "image",
+    "credential",
+    "env_vars",
+    "cpu",
+    "memory",
+    "pull_policy",
+    "pull_refresh_minutes",
+    "image_digest",
+    "upstream",
+]
+# The owner and the creation date of existing schedules are kept on import
+UPDATE_FIELDS = [name for name in FIELDS if name not in ("id", "upstream")]
+FORMATS = {"json": "application/json", "yaml": "application/yaml", "csv": "text/csv"}
+NULLABLE_FIELDS = {"spread_seconds", "env_vars", "credential", "cpu", "memory", "pull_refresh_minutes", "upstream"}
+# Written as JSON in CSV cells
+JSON_FIELDS = {"env_vars", "upstream"}
+
+try:
+    YamlLoader, YamlDumper = yaml.CSafeLoader, yaml.CSafeDumper
+except AttributeError:  # PyYAML built without libyaml
+    YamlLoader, YamlDumper = yaml.SafeLoader, yaml.SafeDumper
+
+
+class InvalidSchedules(ValueError):
+    """Raised when some records aren't valid schedules or their links form a cycle, nothing is imported."""
+
+    def __init__(self, errors: list[str]):
+        super().__init__(f"{len(errors)} invalid schedules")
+        self.errors = errors
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+
+
+def guess_format(filename: str) -> str:
+    suffix = PurePath(filename).suffix.lower().lstrip(".")
+    return "yaml" if suffix == "yml" else suffix
+
+
+def _from_csv(row: dict) -> dict:
+    record = {}
+    for name, value in row.items():
+        # Missing cells of short rows are None
+        if value is None or (value == "" and name in NULLABLE_FIELDS):
+            value = None
+        elif name in JSON_FIELDS:
+            value = json.loads(value)
+        record[name] = value
+    return record
+
+
+def load(stream: TextIO, fmt: str) -> Iterator[dict]:
+    """
+    Reads schedule records from a JSON or YAML list, or CSV rows. The `core.schedule` records
+    of a Django fixture are read as well. Raises InvalidSchedules if the file can't be parsed.
+    """
+    if fmt == "csv":
+        try:
+            for row in csv.DictReader(stream):
+                record = _from_csv(row)
+                yield {name: record[name] for name in FIELDS if name in record}
+        except csv.Error as err:
+            raise InvalidSchedules([f"Invalid CSV: {err}"]) from err
+        return
+    try:
+        if fmt == "yaml":
+            records = yaml.load(stream, Loader=YamlLoader) or []
+        elif fmt == "json":
+            records = json.load(stream)
+        else:
+            raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    except (yaml.YAMLError, json.JSONDecodeError) as err:
+        raise InvalidSchedules([f"Invalid {fmt.upper()}: {err}"]) from err
+    if not isinstance(records, list):
+        raise InvalidSchedules(["Expected a list of schedules"])
+
+    for index, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            raise InvalidSchedules([f"#{index}: expected a mapping of fields"])
+        if "model" in record and "fields" in record:
+            # Other models of a fixture are loaded with loaddata
+            if record["model"] != "core.schedule":
+                continue
+            record = {"id": record.get("pk"), **record["fields"]}
+        yield {name: record[name] for name in FIELDS if name in record}
+
+
+def _to_schedule(record: dict, credentials: dict[str, Credential]) -> Schedule:
+    record = dict(record)
+    if record.get("id") is None:
+        record["id"] = uuid.uuid4()
+    credential = record.pop("credential", None)
+    schedule = Schedule(**record)
+    if credential is not None:
+        if str(credential) not in credentials:
+            raise ValidationError({"credential": f"Unknown credential {credential!r}"})
+        schedule.credential = credentials[str(credential)]
+    # Same rules as the schedule forms
+    schedule.full_clean(exclude=["created_by", "credential"], validate_unique=False, validate_constraints=False)
+    if not cron.parse(schedule.cron_rule).valid:
+        raise ValidationError({"cron_rule": "Not a valid cronjob expression"})
+    return schedule
+
+
+def _upstream_ids(schedule: Schedule, value) -> set[uuid.UUID]:
+    if not isinstance(value, list):
+        raise ValidationError({"upstream": "Expected a list of schedule ids"})
+    try:
+        upstream_ids = {uuid.UUID(str(upstream_id)) for upstream_id in value}
+    except ValueError as err:
+        raise ValidationError({"upstream": f"Invalid schedule id: {err}"}) from err
+    if schedule.id in upstream_ids:
+        raise ValidationError({"upstream": "A schedule can't be its own upstream"})
+    return upstream_ids
+
+
+def _unknown_upstream(links: dict[uuid.UUID, set[uuid.UUID]], imported: set, positions: dict) -> list[str]:
+    """Errors of the links to schedules that are neither imported along nor existing already."""
+    referenced = set().union(*links.values()) - imported
+    known = set(Schedule.objects.filter(id__in=referenced).values_list("id", flat=True)) if referenced else set()
+    return [
+        f"{positions[schedule_id]}: upstream: Unknown schedule {unknown}"
+        for schedule_id, upstream_ids in links.items()
+        for unknown in sorted(str(upstream_id) for upstream_id in upstream_ids - imported - known)
+    ]
+
+
+def validate(records: Iterable[dict]) -> tuple[list[Schedule], dict[uuid.UUID, set[uuid.UUID]]]:
+    """
+    Builds and validates every record in one pass, raises InvalidSchedules with all the errors.
+    Returns the schedules and the upstream schedule ids of those whose record lists them.
+    """
+    credentials = {}
+    for credential in Credential.objects.all():
+        credentials[str(credential.pk)] = credentials[credential.name] = credential
+
+    schedules, errors, seen, links, positions = [], [], set(), {}, {}
+    for index, record in enumerate(records, start=1):
+        record = dict(record)
+        upstream = record.pop("upstream", None)
+        try:
+            schedule = _to_schedule(record, credentials)
+            if upstream is not None:
+                links[schedule.id] = _upstream_ids(schedule, upstream)
+        except (ValidationError, TypeError) as err:
+            messages = err.message_dict if isinstance(err, ValidationError) else {"__all__": [str(err)]}
+            details = "; ".join(f"{field}: {' '.join(message)}" for field, message in messages.items())
+            errors.append(f"#{index} {record.get('name', '')}: {details}")
+            continue
+        if schedule.id in seen:
+            errors.append(f"#{index} {schedule.name}: duplicated id {schedule.id}")
+            continue
+        seen.add(schedule.id)
+        positions[schedule.id] = f"#{index} {schedule.name}"
+        schedules.append(schedule)
+
+    errors += _unknown_upstream(links, seen, positions)
+    if errors:
+        raise InvalidSchedules(errors)
+    return schedules, links
+
+
+def _link(links: dict[uuid.UUID, set[uuid.UUID]], batch_size: int) -> None:
+    """Replaces the upstream links of the given schedules, raises InvalidSchedules on a cycle."""
+    schedule_ids = list(links)
+    for start in range(0, len(schedule_ids), batch_size):
+        dag.Edge.objects.filter(from_schedule_id__in=schedule_ids[start : start + batch_size]).delete()
+    dag.Edge.objects.bulk_create(
+        [
+            dag.Edge(from_schedule_id=schedule_id, to_schedule_id=upstream_id)
+            for schedule_id, upstream_ids in links.items()
+            for upstream_id in upstream_ids
+        ],
+        batch_size=batch_size,
+    )
+    if dag.has_cycle():
+        raise InvalidSchedules(["upstream: the upstream links form a cycle"])
+
+
+def import_schedules(records: Iterable[dict], user=None, batch_size: int = 1000) -> ImportResult:
+    """
+    Upserts schedules by id with batched inserts, all or nothing. New schedules belong to
+    `user`. Bulk inserts send no model signals, the counters and the crontab are refreshed once.
+    """
+    schedules, links = validate(records)
+    result = ImportResult()
+    with transaction.atomic():
+        for start in range(0, len(schedules), batch_size):
+            batch = schedules[start : start + batch_size]
+            existing = set(
+                Schedule.objects.filter(id__in=[schedule.id for schedule in batch]).values_list("id", flat=True)
+            )
+            for schedule in batch:
+                schedule.created_by = user
+            Schedule.objects.bulk_create(
+                batch, update_conflicts=True, unique_fields=["id"], update_fields=UPDATE_FIELDS
+            )
+            result.updated += len(existing)
+            result.created += len(batch) - len(existing)
+        if links:
+            _link(links, batch_size)
+
+    counters.invalidate("schedule")
+    if settings.SCHEDULER_BACKEND == "cron":
+        crontab.mark_dirty()
+    return result
+
+
+def _records(queryset: QuerySet) -> Iterator[dict]:
+    upstream = defaultdict(list)
+    for schedule_id, upstream_id in (
+        dag.Edge.objects.filter(from_schedule__in=queryset.values("id"))
+        .order_by("to_schedule_id")
+        .values_list("from_schedule_id", "to_schedule_id")
+    ):
+        upstream[schedule_id].append(str(upstream_id))
+
+    values = [name for name in FIELDS if name not in ("credential", "upstream")] + ["credential__name"]
+    for row in queryset.order_by("created_at", "id").values(*values).iterator(chunk_size=2000):
+        row["upstream"] = upstream.get(row["id"], [])
+        row["id"] = str(row["id"])
+        row["credential"] = row.pop("credential__name")
+        yield {name: row[name] for name in FIELDS}
+
+
+def dump(queryset: QuerySet, fmt: str) -> Iterator[str]:
+    """Serializes schedules chunk by chunk, for streaming responses and files."""
+    if fmt == "json":
+        separator = "[\n"
+        for record in _records(queryset):
+            yield separator + json.dumps(record)
+            separator = ",\n"
+        yield "[]\n" if separator == "[\n" else "\n]\n"
+    elif fmt == "yaml":
+        empty = True
+        for record in _records(queryset):
+            empty = False
+            yield yaml.dump([record], Dumper=YamlDumper, sort_keys=False, allow_unicode=True)
+        if empty:
+            yield "[]\n"
+    elif fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+        writer.writeheader()
+        for record in _records(queryset):
+            for name in JSON_FIELDS:
+                if record[name] is not None:
+                    record[name] = json.dumps(record[name])
+            writer.writerow(record)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
@@ -0,0 +1,46 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from apps.core.management.commands.run_schedule import Command as RunScheduleCommand
+from apps.core.management.commands.run_schedule import DuplicateJob, JobAborted
+from apps.core.models import Job
+
+logger = logging.getLogger(__name__)
+
+# Triggered jobs are provisioned by the web worker that received them, a process per run would
+# pay a full Django boot
+executor = ThreadPoolExecutor(max_workers=settings.TRIGGER_WORKERS, thread_name_prefix="trigger")
+
+
+def trigger(schedule_id, env_overrides: dict | None = None, idempotency_key: str | None = None) -> tuple[Job, bool]:
+    """
+    Queues an immediate run of a schedule and dispatches it in the background. Returns the job
+    and whether it was created, repeated idempotency keys return the job of the first trigger.
+    Raises JobAborted if the schedule is inactive or a singleton already running.
+    """
+    if idempotency_key:
+        existing = Job.objects.filter(schedule_id=schedule_id, idempotency_key=idempotency_key).first()
+        if existing:
+            return existing, False
+
+    command = RunScheduleCommand()
+    try:
+        job = command.enqueue(schedule_id, env_overrides=env_overrides, idempotency_key=idempotency_key)
+    except DuplicateJob as err:
+        return err.job, False
+    executor.submit(_dispatch, command)
+    return job, True
+
+
+def _dispatch(command: RunScheduleCommand) -> None:
+    try:
+        command.dispatch()
+    except JobAborted:
+        pass
+    except Exception:
+        logger.exception("Failed to dispatch triggered job %s", command.job.id)
+    finally:
+        close_old_connections()
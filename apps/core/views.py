@@ -1,11 +1,23 @@
-import os
-
-import cron_descriptor
+import codecs
+import io
+import re
+import threading
+import time
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+import docker
 from django import forms
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponse
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import (
     CreateView,
@@ -16,11 +28,37 @@ from django.views.generic import (
     View,
 )
 
-from apps.core.forms import ScheduleCreateForm, ScheduleUpdateForm
+from apps.core import cron, transfer
+from apps.core.forms import JobFilterForm, ScheduleCreateForm, ScheduleUpdateForm
+from apps.core.logstore import read_tail
 from apps.core.models import Credential, Job, Schedule
+from apps.core.pagination import KeysetPaginator
+from apps.node.pool import pool
 
 User = get_user_model()
 
+LOG_TAIL_LINES = 500
+LOG_MAX_TAIL_LINES = 10000
+LOG_MAX_RANGE_BYTES = 1024 * 1024
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Each follower holds a server thread: streams are closed after LOG_FOLLOW_SECONDS, the browser
+# reconnects from the last line it got, and a process serves at most LOG_MAX_FOLLOWERS at a time
+LOG_FOLLOW_SECONDS = 300
+LOG_MAX_FOLLOWERS = 2
+LOG_FOLLOW_RETRY_MS = 10000
+TIMESTAMP_PATTERN = re.compile(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d{1,9}))?Z$")
+
+log_followers = threading.BoundedSemaphore(LOG_MAX_FOLLOWERS)
+
+
+def log_timestamp(value: str) -> int | None:
+    """Nanoseconds since the epoch of a Docker log timestamp, None if it isn't one."""
+    match = TIMESTAMP_PATTERN.match(value)
+    if match is None:
+        return None
+    seconds = int(datetime.fromisoformat(match.group(1)).replace(tzinfo=dt_timezone.utc).timestamp())
+    return seconds * 10**9 + int((match.group(2) or "").ljust(9, "0"))
+
 
 class ScheduleListView(LoginRequiredMixin, ListView):
     template_name = "core/index.html"
@@ -36,12 +74,6 @@ class ScheduleCreateView(LoginRequiredMixin, CreateView):
         response = super().form_valid(form)
         self.object.created_by = self.request.user
         self.object.save()
-
-        schedule_id = str(self.object.id)
-        cmd = settings.CRONJOB_CMD.format(schedule_id=schedule_id, cron_rule=self.object.cron_rule)
-        crontab_path = settings.CRONTAB_PATH / f"ct_{schedule_id}"
-        with open(crontab_path, "w", encoding="utf-8") as fh:
-            fh.write(cmd + "\n")
         return response
 
 
@@ -50,36 +82,210 @@ class ScheduleUpdateView(LoginRequiredMixin, UpdateView):
     form_class = ScheduleUpdateForm
     success_url = "/"
 
-    def form_valid(self, form):
-        response = super().form_valid(form)
-        schedule_id = str(self.object.id)
-        cmd = settings.CRONJOB_CMD.format(schedule_id=schedule_id, cron_rule=self.object.cron_rule)
-        crontab_path = settings.CRONTAB_PATH / f"ct_{schedule_id}"
-        with open(crontab_path, "w", encoding="utf-8") as fh:
-            fh.write(cmd + "\n")
-        return response
-
 
 class ScheduleDeleteView(LoginRequiredMixin, DeleteView):
     model = Schedule
     success_url = "/"
 
-    def form_valid(self, form):
-        file_path = settings.CRONTAB_PATH / f"ct_{self.object.id}"
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        return super().form_valid(form)
+
+class ScheduleExportView(LoginRequiredMixin, View):
+    """Streams every schedule as JSON, YAML or CSV (`?format=`), as read by ScheduleImportView."""
+
+    def get(self, request):
+        fmt = request.GET.get("format", "json")
+        if fmt not in transfer.FORMATS:
+            return HttpResponseBadRequest("Unknown format")
+        response = StreamingHttpResponse(transfer.dump(Schedule.objects.all(), fmt), content_type=transfer.FORMATS[fmt])
+        response["Content-Disposition"] = f'attachment; filename="schedules.{fmt}"'
+        return response
+
+
+class ScheduleImportView(LoginRequiredMixin, View):
+    """Creates or updates schedules in bulk from an uploaded `file`, all or nothing."""
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return JsonResponse({"errors": ["No file uploaded"]}, status=400)
+        fmt = request.POST.get("format") or transfer.guess_format(upload.name)
+        try:
+            records = transfer.load(io.TextIOWrapper(upload.file, encoding="utf-8"), fmt)
+            result = transfer.import_schedules(records, user=request.user)
+        except transfer.InvalidSchedules as err:
+            return JsonResponse({"errors": err.errors}, status=400)
+        except ValueError as err:
+            return JsonResponse({"errors": [str(err)]}, status=400)
+        return JsonResponse({"created": result.created, "updated": result.updated})
 
 
 class JobListView(LoginRequiredMixin, ListView):
+    """Lists jobs one keyset page at a time, newest or longest first. Heavy columns are never loaded."""
+
     model = Job
     success_url = "/"
+    page_size = 50
+    filter_form = None
+
+    def get_queryset(self):
+        self.filter_form = JobFilterForm(self.request.GET)
+        queryset = Job.objects.select_related("schedule", "node").defer("log", "state")
+        return self.filter_form.filter(queryset)
+
+    def get_context_data(self, **kwargs):
+        paginator = KeysetPaginator(self.object_list, self.filter_form.ordering(), self.page_size)
+        try:
+            jobs, next_cursor = paginator.page(self.request.GET.get("cursor"))
+        except ValueError as err:
+            raise Http404("Invalid page") from err
+        return super().get_context_data(
+            object_list=jobs,
+            next_cursor=next_cursor,
+            filter_form=self.filter_form,
+            **kwargs,
+        )
 
 
 class JobLogDetailView(LoginRequiredMixin, DetailView):
+    """Renders the last lines of the log, earlier parts are fetched from JobLogRangeView on demand."""
+
     model = Job
     template_name = "core/job_log.html"
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        fh, size = self.object.open_log()
+        with fh:
+            offset, content = read_tail(fh, size, LOG_TAIL_LINES)
+        context["log_tail"] = content.decode("utf-8", errors="replace")
+        context["log_offset"] = offset
+        context["log_size"] = size
+        context["log_follow"] = self.object.status_code is None
+        return context
+
+
+class JobLogRangeView(LoginRequiredMixin, View):
+    """
+    Serves a slice of a job log, selected with an HTTP Range header (bytes), `offset`/`limit`
+    query parameters (bytes) or `tail` (lines). Slices are capped to LOG_MAX_RANGE_BYTES, tails
+    to LOG_MAX_TAIL_LINES.
+    """
+
+    def get(self, request, pk):
+        job = get_object_or_404(Job, pk=pk)
+        fh, size = job.open_log()
+        with fh:
+            try:
+                if "Range" in request.headers:
+                    return self.get_range(fh, size, request.headers["Range"])
+                if "tail" in request.GET:
+                    offset, content = read_tail(fh, size, min(max(int(request.GET["tail"]), 1), LOG_MAX_TAIL_LINES))
+                else:
+                    offset = max(int(request.GET.get("offset", 0)), 0)
+                    limit = min(max(int(request.GET.get("limit", LOG_MAX_RANGE_BYTES)), 0), LOG_MAX_RANGE_BYTES)
+                    fh.seek(offset)
+                    content = fh.read(limit)
+            except ValueError:
+                return HttpResponseBadRequest("Invalid log range")
+
+        response = HttpResponse(content, content_type="text/plain; charset=utf-8")
+        response["X-Log-Offset"] = offset
+        response["X-Log-Size"] = size
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+    @staticmethod
+    def get_range(fh, size: int, header: str) -> HttpResponse:
+        match = RANGE_PATTERN.match(header.strip())
+        if match and match.group(1):
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else size - 1
+        elif match and match.group(2):
+            # Suffix range, the last N bytes
+            start, end = max(size - int(match.group(2)), 0), size - 1
+        else:
+            return HttpResponseBadRequest("Invalid range")
+
+        if start >= size or end < start:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+        end = min(end, size - 1, start + LOG_MAX_RANGE_BYTES - 1)
+        fh.seek(start)
+        response = HttpResponse(fh.read(end - start + 1), status=206, content_type="text/plain; charset=utf-8")
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Accept-Ranges"] = "bytes"
+        return response
+
+
+class JobLogFollowView(LoginRequiredMixin, View):
+    """
+    Streams the output of a running job as server-sent events, straight from Docker. Each line
+    is sent with its Docker timestamp as event id, a reconnecting browser resumes after it.
+    """
+
+    def get(self, request, pk):
+        job = get_object_or_404(Job, pk=pk)
+        response = StreamingHttpResponse(
+            self.stream(job, request.headers.get("Last-Event-ID", "")), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @staticmethod
+    def stream(job: Job, last_event_id: str = ""):
+        if job.status_code is None:
+            if not log_followers.acquire(blocking=False):  # pylint: disable=consider-using-with
+                # Ends without the end event, the browser tries again later
+                yield f"retry: {LOG_FOLLOW_RETRY_MS}\n\n"
+                return
+            try:
+                if not (yield from JobLogFollowView.follow(job, log_timestamp(last_event_id))):
+                    return
+            except docker.errors.NotFound:
+                pass
+            finally:
+                log_followers.release()
+        yield "event: end\ndata: \n\n"
+
+    @staticmethod
+    def follow(job: Job, after: int | None):
+        """
+        Yields the lines of the container of `job` logged after the `after` timestamp, or its last
+        lines. Returns False if the stream was closed after LOG_FOLLOW_SECONDS, True once the
+        container exited.
+        """
+        container = pool.get(job.node).containers.get(str(job.id))
+        options = {"since": after // 10**9} if after else {"tail": LOG_TAIL_LINES}
+        logs = container.logs(stream=True, follow=True, timestamps=True, **options)
+        started = time.monotonic()
+        timer = threading.Timer(LOG_FOLLOW_SECONDS, logs.close)
+        timer.start()
+        try:
+            # Docker chunks don't follow lines nor characters, only complete lines are sent
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            pending = ""
+            for chunk in logs:
+                *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+                yield from JobLogFollowView.events(lines, after)
+        finally:
+            timer.cancel()
+        if time.monotonic() - started >= LOG_FOLLOW_SECONDS:
+            return False
+        pending += decoder.decode(b"", final=True)
+        yield from JobLogFollowView.events([pending] if pending else [], after)
+        return True
+
+    @staticmethod
+    def events(lines: list[str], after: int | None):
+        for line in lines:
+            timestamp, _, text = line.rstrip("\r").partition(" ")
+            # `since` has a precision of a second, lines already sent are skipped
+            if after is not None and (log_timestamp(timestamp) or 0) <= after:
+                continue
+            yield "id: " + timestamp + "\ndata: " + text + "\n\n"
+
 
 class CredentialListView(LoginRequiredMixin, ListView):
     model = Credential
@@ -145,17 +351,8 @@ class CredentialDeleteView(LoginRequiredMixin, DeleteView):
 
 class DescribeCronView(LoginRequiredMixin, View):
     def get(self, request):
-        cron_options = cron_descriptor.Options()
-        cron_options.verbose = True
-        cron_options.use_24hour_time_format = True
-
-        cron_rule = request.GET.get("cron_rule")
-
-        try:
-            description = cron_descriptor.ExpressionDescriptor(cron_rule, cron_options).get_description()
-        except (cron_descriptor.FormatException, cron_descriptor.Exception.MissingFieldException):
-            return HttpResponse("Invalid cron expression")
-        return HttpResponse(description)
+        description = cron.parse(request.GET.get("cron_rule", "")).description
+        return HttpResponse(description or "Invalid cron expression")
 
 
 class UserListView(LoginRequiredMixin, ListView):
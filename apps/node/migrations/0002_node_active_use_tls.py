@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("node", "0001_initial"),
+    ]
+
+    operations = [
+        # Existing nodes were only registered, jobs ran on the local Docker daemon. They are
+        # activated by hand, new nodes are active by default
+        migrations.AddField(
+            model_name="node",
+            name="active",
+            field=models.BooleanField(default=False, help_text="Jobs are only placed on active nodes"),
+        ),
+        migrations.AlterField(
+            model_name="node",
+            name="active",
+            field=models.BooleanField(default=True, help_text="Jobs are only placed on active nodes"),
+        ),
+        migrations.AddField(
+            model_name="node",
+            name="use_tls",
+            field=models.BooleanField(default=False, help_text="Connect to the Docker API over TLS"),
+        ),
+        migrations.AlterField(
+            model_name="node",
+            name="host",
+            field=models.CharField(help_text="Hostname, user@hostname with SSH, or a full Docker URL", max_length=250),
+        ),
+    ]
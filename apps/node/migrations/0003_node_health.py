@@ -0,0 +1,48 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("node", "0002_node_active_use_tls"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="node",
+            name="cpu_capacity",
+            field=models.IntegerField(blank=True, help_text="Number of CPUs", null=True),
+        ),
+        migrations.AddField(
+            model_name="node",
+            name="healthy",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="node",
+            name="latency_ms",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="node",
+            name="memory_capacity",
+            field=models.IntegerField(blank=True, help_text="Memory in MB", null=True),
+        ),
+        migrations.AddField(
+            model_name="node",
+            name="probe_error",
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name="node",
+            name="probed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="node",
+            name="running_containers",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:06
+
+from django.db import migrations, models
+
+
+def create_lock(apps, schema_editor):
+    apps.get_model("node", "PlacementLock").objects.create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("node", "0003_node_health"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlacementLock",
+            fields=[
+                ("id", models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+                ("locked_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(create_lock, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,58 @@
 import uuid
 
 from django.db import models
+from django.utils import timezone
 
 
 class Node(models.Model):
     id = models.UUIDField(default=uuid.uuid4, primary_key=True, unique=True)
     name = models.CharField(max_length=500)
-    host = models.CharField(max_length=250)
+    host = models.CharField(max_length=250, help_text="Hostname, user@hostname with SSH, or a full Docker URL")
     port = models.IntegerField(default=2375)
     use_ssh = models.BooleanField(default=False)
+    use_tls = models.BooleanField(default=False, help_text="Connect to the Docker API over TLS")
+    active = models.BooleanField(default=True, help_text="Jobs are only placed on active nodes")
     secret = models.CharField(max_length=500, blank=True)
+
+    # Cached by the prober of `run_scheduler`, placement reads nothing else
+    healthy = models.BooleanField(default=False)
+    probed_at = models.DateTimeField(null=True, blank=True)
+    probe_error = models.CharField(max_length=500, blank=True)
+    latency_ms = models.FloatField(null=True, blank=True)
+    running_containers = models.IntegerField(null=True, blank=True)
+    cpu_capacity = models.IntegerField(null=True, blank=True, help_text="Number of CPUs")
+    memory_capacity = models.IntegerField(null=True, blank=True, help_text="Memory in MB")
+
+    def __str__(self):
+        return str(self.name)
+
+    @property
+    def base_url(self) -> str:
+        host = str(self.host)
+        if "://" in host:
+            return host
+        if self.use_ssh:
+            return f"ssh://{self.host}:{self.port}"
+        return f"tcp://{self.host}:{self.port}"
+
+
+class PlacementLock(models.Model):
+    """
+    Single row locked by every placement until its transaction ends, so dispatchers of all
+    processes (cron fires, run_scheduler, web workers) place jobs one at a time against
+    up to date reservations and concurrency limits.
+    """
+
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    @classmethod
+    def acquire(cls) -> None:
+        """
+        Locks the row until the end of the current transaction. An UPDATE rather than SELECT ...
+        FOR UPDATE, which SQLite ignores: there it takes the write lock of the database instead.
+        """
+        if not cls.objects.filter(pk=1).update(locked_at=timezone.now()):
+            # Created by the migration, unless the table was flushed since
+            cls.objects.bulk_create([cls(pk=1)], ignore_conflicts=True)
+            cls.objects.filter(pk=1).update(locked_at=timezone.now())
@@ -0,0 +1,209 @@
+import threading
+import time
+from dataclasses import dataclass
+
+import docker
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from apps.core.models import Job, JobStatusChoices, Schedule
+from apps.node.models import Node, PlacementLock
+from apps.node.pool import pool
+
+# Jobs hold their reservation from placement until update_history records their exit
+RESERVING = Q(status_code__isnull=True) & ~Q(status=JobStatusChoices.QUEUED)
+
+
+class NoCapacity(Exception):
+    """Raised when no node has enough free CPU and memory for a job right now."""
+
+
+class LimitReached(NoCapacity):
+    """Raised when a concurrency limit holds the job back, `scope` is "global", "schedule" or "user"."""
+
+    def __init__(self, scope: str, limit: int):
+        super().__init__(f"{scope.capitalize()} limit of {limit} concurrent jobs reached")
+        self.scope = scope
+
+
+class AlreadyPlaced(Exception):
+    """Raised when another dispatcher placed the job first, it must not be provisioned twice."""
+
+
+class Unplaceable(Exception):
+    """Raised when a job requests more CPU or memory than any node has in total."""
+
+
+@dataclass
+class Host:
+    """A Docker host seen by the placement engine, `node` is None for the local daemon."""
+
+    node: Node | None
+    cpu: int
+    memory: int
+    reserved_cpu: int = 0
+    reserved_memory: int = 0
+    jobs: int = 0
+    healthy: bool = True
+
+    def fits(self, cpu: int, memory: int) -> bool:
+        if settings.MAX_JOBS_PER_NODE and self.jobs >= settings.MAX_JOBS_PER_NODE:
+            return False
+        return self.reserved_cpu + cpu <= self.cpu and self.reserved_memory + memory <= self.memory
+
+    def leftover(self, cpu: int, memory: int) -> float:
+        """Share of the host left free once the job is placed, averaged over CPU and memory."""
+        free_cpu = (self.cpu - self.reserved_cpu - cpu) / max(self.cpu, 1)
+        free_memory = (self.memory - self.reserved_memory - memory) / max(self.memory, 1)
+        return (free_cpu + free_memory) / 2
+
+
+class LocalCapacity:
+    """
+    Allocatable CPUs and memory (MB) of the local Docker daemon, which isn't probed like nodes,
+    read from `docker info` at most every NODE_CAPACITY_TTL seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entry: tuple[float, tuple[int, int]] | None = None
+
+    def get(self) -> tuple[int, int]:
+        with self.lock:
+            entry = self.entry
+        if entry and time.monotonic() - entry[0] < settings.NODE_CAPACITY_TTL:
+            return entry[1]
+
+        info = pool.get(None).info()
+        # Schedule.memory is in MB of 1e6 bytes, as passed to the Docker API
+        capacity = (info["NCPU"], info["MemTotal"] // int(1e6))
+        with self.lock:
+            self.entry = (time.monotonic(), capacity)
+        return capacity
+
+
+local_capacity = LocalCapacity()
+placement_lock = threading.Lock()
+
+
+def get_capacities() -> list[tuple[Node | None, int, int, bool]]:
+    """
+    Returns the CPUs, memory and health of the probed active nodes, or of the local daemon if no
+    node is active. Nodes are described by the cache of the prober, the local daemon may be
+    asked with `docker info`: call it before taking the PlacementLock.
+    """
+    nodes = list(Node.objects.filter(active=True))
+    if nodes:
+        return [
+            (node, node.cpu_capacity, node.memory_capacity, node.healthy)
+            for node in nodes
+            if node.cpu_capacity is not None and node.memory_capacity is not None
+        ]
+    try:
+        return [(None, *local_capacity.get(), True)]
+    except (docker.errors.DockerException, requests.exceptions.RequestException):
+        return []
+
+
+def get_hosts(capacities: list[tuple[Node | None, int, int, bool]]) -> list[Host]:
+    """Returns the hosts of `capacities` with their reservations, only reading the database."""
+    reservations = {
+        row["node_id"]: row
+        for row in Job.objects.filter(RESERVING)
+        .values("node_id")
+        .annotate(cpu=Sum("schedule__cpu"), memory=Sum("schedule__memory"), jobs=Count("id"))
+    }
+
+    hosts = []
+    for node, cpu, memory, healthy in capacities:
+        reserved = reservations.get(node.id if node else None, {})
+        hosts.append(
+            Host(
+                node=node,
+                cpu=cpu,
+                memory=memory,
+                reserved_cpu=reserved.get("cpu") or 0,
+                reserved_memory=reserved.get("memory") or 0,
+                jobs=reserved.get("jobs", 0),
+                healthy=healthy,
+            )
+        )
+    return hosts
+
+
+def check_limits(schedule: Schedule) -> None:
+    """
+    Raises LimitReached if one more job of `schedule` would exceed MAX_CONCURRENT_JOBS,
+    MAX_JOBS_PER_SCHEDULE or MAX_JOBS_PER_USER (for the creator of the schedule). 0 is unlimited.
+    """
+    limits = {
+        "global": (settings.MAX_CONCURRENT_JOBS, None),
+        "schedule": (settings.MAX_JOBS_PER_SCHEDULE, Q(schedule_id=schedule.id)),
+        "user": (settings.MAX_JOBS_PER_USER, Q(schedule__created_by_id=schedule.created_by_id)),
+    }
+    if schedule.created_by_id is None:
+        del limits["user"]
+    limits = {scope: limit for scope, limit in limits.items() if limit[0]}
+    if not limits:
+        return
+
+    running = Job.objects.filter(RESERVING).aggregate(
+        **{scope: Count("id", filter=condition) for scope, (_limit, condition) in limits.items()}
+    )
+    for scope, (limit, _condition) in limits.items():
+        if running[scope] >= limit:
+            raise LimitReached(scope, limit)
+
+
+def pick_node(schedule: Schedule, capacities: list[tuple[Node | None, int, int, bool]] | None = None) -> Node | None:
+    """
+    Picks the host for a job of `schedule` among those with enough free CPU and memory, with
+    the PLACEMENT_STRATEGY: "best-fit" packs jobs on the fullest host that fits, "spread" uses
+    the emptiest one. Ties go to the host running the fewest jobs. `capacities` defaults to
+    `get_capacities()`.
+
+    Returns None for the local daemon, raises NoCapacity when every host is full or unhealthy
+    and Unplaceable when no host could ever fit the job.
+    """
+    cpu, memory = schedule.cpu or 0, schedule.memory or 0
+    hosts = get_hosts(get_capacities() if capacities is None else capacities)
+    # Unhealthy nodes are drained, they take no new jobs until a probe succeeds again
+    candidates = [host for host in hosts if host.healthy and host.fits(cpu, memory)]
+    if not candidates:
+        if hosts and not any(host.cpu >= cpu and host.memory >= memory for host in hosts):
+            raise Unplaceable(f"No node has {cpu} CPUs and {memory} MB of memory")
+        raise NoCapacity(f"No node has {cpu} CPUs and {memory} MB of memory free")
+
+    sign = -1 if settings.PLACEMENT_STRATEGY == "spread" else 1
+    best = min(
+        candidates,
+        key=lambda host: (sign * host.leftover(cpu, memory), host.jobs, str(host.node.name) if host.node else ""),
+    )
+    return best.node
+
+
+def assign(job: Job) -> None:
+    """
+    Places a queued job and reserves its resources, within the concurrency limits. Limits,
+    reservations and the claim are read and written in one transaction holding the
+    PlacementLock, so concurrent dispatches of any process can't place jobs on the same free
+    capacity. The thread lock only saves threads of a process from waiting on the database.
+    Host capacities are read beforehand, nothing reaches Docker while the lock is held.
+
+    The job is claimed with a conditional update: it may be placed by `run_schedule` and by the
+    job queue at the same time, only the first one wins and the other gets AlreadyPlaced.
+    """
+    capacities = get_capacities()
+    with placement_lock, transaction.atomic():
+        PlacementLock.acquire()
+        check_limits(job.schedule)
+        node = pick_node(job.schedule, capacities)
+        claimed = Job.objects.filter(pk=job.pk, status=JobStatusChoices.QUEUED).update(
+            node=node, status=JobStatusChoices.WAITING
+        )
+        if not claimed:
+            raise AlreadyPlaced(f"Job {job.id} was already placed")
+        job.node = node
+        job.status = JobStatusChoices.WAITING
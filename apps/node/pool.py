@@ -0,0 +1,87 @@
+import threading
+from pathlib import Path
+
+import docker
+import requests
+from django.conf import settings
+
+from apps.core.docker_client import get_client
+from apps.node.models import Node
+
+LOCAL = "local"
+
+
+def node_key(node: Node | None) -> str:
+    """Identifies the Docker host of a node, jobs without a node run on the local daemon."""
+    return str(node.id) if node else LOCAL
+
+
+def unreachable(err: Exception) -> bool:
+    """Whether `err` means the Docker host of a node stopped answering, rather than refusing a request."""
+    return isinstance(err, requests.exceptions.ConnectionError)
+
+
+def tls_config() -> docker.tls.TLSConfig:
+    """
+    TLS settings of the nodes using TLS: the cert.pem and key.pem client certificate and the
+    ca.pem authority of NODE_TLS_CERT_PATH, laid out like DOCKER_CERT_PATH. Missing files fall
+    back to no client certificate and the system authorities.
+    """
+    cert_path = Path(settings.NODE_TLS_CERT_PATH)
+    cert, key, ca = cert_path / "cert.pem", cert_path / "key.pem", cert_path / "ca.pem"
+    return docker.tls.TLSConfig(
+        client_cert=(str(cert), str(key)) if cert.is_file() and key.is_file() else None,
+        ca_cert=str(ca) if settings.NODE_TLS_VERIFY and ca.is_file() else None,
+        verify=settings.NODE_TLS_VERIFY,
+    )
+
+
+class NodePool:
+    """
+    Keeps one persistent Docker client per node, so jobs and status checks reuse connections
+    instead of opening one per call. Clients are rebuilt when the connection settings of a
+    node change.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients: dict[str, tuple[tuple, docker.DockerClient]] = {}
+
+    @staticmethod
+    def _connect(node: Node) -> docker.DockerClient:
+        return docker.DockerClient(
+            base_url=node.base_url,
+            tls=tls_config() if node.use_tls else False,
+            use_ssh_client=node.use_ssh,
+        )
+
+    def get(self, node: Node | None) -> docker.DockerClient:
+        if node is None:
+            return get_client()
+
+        connection = (node.base_url, node.use_tls, node.use_ssh)
+        with self.lock:
+            cached = self.clients.get(node_key(node))
+            if cached and cached[0] == connection:
+                return cached[1]
+            if cached:
+                cached[1].close()
+            client = self._connect(node)
+            self.clients[node_key(node)] = (connection, client)
+            return client
+
+    def discard(self, node: Node) -> None:
+        """Closes the client of a node, the next `get` connects again."""
+        with self.lock:
+            cached = self.clients.pop(node_key(node), None)
+        if cached:
+            cached[1].close()
+
+    def close(self) -> None:
+        with self.lock:
+            for _connection, client in self.clients.values():
+                client.close()
+            self.clients.clear()
+
+
+pool = NodePool()
@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import docker
+import requests
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.node.models import Node
+from apps.node.pool import pool
+
+logger = logging.getLogger(__name__)
+
+
+def probe(node: Node) -> bool:
+    """
+    Pings a node and caches its health, latency, running containers and capacity on the Node
+    row. Returns whether the node is healthy.
+    """
+    started = time.monotonic()
+    try:
+        client = pool.get(node)
+        client.ping()
+        latency_ms = (time.monotonic() - started) * 1000
+        info = client.info()
+    except (docker.errors.DockerException, requests.exceptions.RequestException) as err:
+        if node.healthy:
+            logger.warning("Node %s is unhealthy: %s", node, err)
+        mark_unhealthy(node, err)
+        return False
+
+    if not node.healthy:
+        logger.info("Node %s is healthy", node)
+    Node.objects.filter(pk=node.pk).update(
+        healthy=True,
+        probed_at=timezone.now(),
+        probe_error="",
+        latency_ms=latency_ms,
+        running_containers=info["ContainersRunning"],
+        cpu_capacity=info["NCPU"],
+        # Schedule.memory is in MB of 1e6 bytes, as passed to the Docker API
+        memory_capacity=info["MemTotal"] // int(1e6),
+    )
+    return True
+
+
+def mark_unhealthy(node: Node, err: Exception) -> None:
+    """Drains a node: placement skips it until a probe succeeds again."""
+    Node.objects.filter(pk=node.pk).update(healthy=False, probed_at=timezone.now(), probe_error=str(err)[:500])
+
+
+class NodeProber:
+    """
+    Probes every active node every `interval` seconds on a pool of worker threads, so a slow or
+    dead node delays neither the others nor job placement. A node is not probed again while its
+    previous probe is still waiting for a timeout.
+    """
+
+    def __init__(self, interval: int, workers: int):
+        self.interval = interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prober")
+        self.in_flight: set = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def probe_all(self) -> None:
+        for node in Node.objects.filter(active=True):
+            with self.lock:
+                if node.pk in self.in_flight:
+                    continue
+                self.in_flight.add(node.pk)
+            self.executor.submit(self._probe, node)
+
+    def _probe(self, node: Node) -> None:
+        try:
+            probe(node)
+        except Exception:
+            logger.exception("Failed to probe node %s", node)
+        finally:
+            with self.lock:
+                self.in_flight.discard(node.pk)
+            close_old_connections()
+
+    def run_forever(self) -> None:
+        while not self.stopped.is_set():
+            self.probe_all()
+            close_old_connections()
+            self.stopped.wait(self.interval)
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.executor.shutdown(wait=True)
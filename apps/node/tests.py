@@ -1,9 +1,25 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import requests
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 from django.urls import reverse
 
+from apps.core.models import Job, JobStatusChoices, Schedule
 from apps.core.tests.helpers import EasyResponse, add_default_data
-from apps.node.models import Node
+from apps.node.models import Node, PlacementLock
+from apps.node.placement import (
+    LimitReached,
+    NoCapacity,
+    Unplaceable,
+    assign,
+    pick_node,
+    placement_lock,
+)
+from apps.node.pool import NodePool
+from apps.node.prober import NodeProber, probe
 
 User = get_user_model()
 
@@ -130,3 +146,165 @@ class TestNodeDeleteView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "node/node_list.html")
         self.assertFalse(Node.objects.filter(id=self.node.id).exists())
+
+
+class TestNodeBaseUrl(SimpleTestCase):
+    def test_base_url(self):
+        self.assertEqual(Node(host="10.0.0.2", port=2375).base_url, "tcp://10.0.0.2:2375")
+        self.assertEqual(Node(host="root@10.0.0.2", port=22, use_ssh=True).base_url, "ssh://root@10.0.0.2:22")
+        self.assertEqual(Node(host="unix:///var/run/docker.sock", port=2375).base_url, "unix:///var/run/docker.sock")
+
+
+class TestNodePool(SimpleTestCase):
+    @mock.patch("apps.node.pool.docker.DockerClient")
+    def test_get(self, docker_client):
+        pool = NodePool()
+        node = Node(name="test", host="10.0.0.2", port=2375)
+
+        client = pool.get(node)
+        self.assertIs(pool.get(node), client)
+        docker_client.assert_called_once_with(base_url="tcp://10.0.0.2:2375", tls=False, use_ssh_client=False)
+
+        # Changing the connection settings replaces the client
+        node.port = 2376
+        pool.get(node)
+        self.assertEqual(docker_client.call_count, 2)
+        client.close.assert_called_once()
+
+    @mock.patch("apps.node.pool.docker.DockerClient")
+    def test_get_tls(self, docker_client):
+        with tempfile.TemporaryDirectory() as cert_path, override_settings(NODE_TLS_CERT_PATH=cert_path):
+            for name in ("cert.pem", "key.pem", "ca.pem"):
+                (Path(cert_path) / name).touch()
+            NodePool().get(Node(name="test", host="10.0.0.2", port=2376, use_tls=True))
+
+        tls = docker_client.call_args.kwargs["tls"]
+        self.assertEqual(tls.cert, (f"{cert_path}/cert.pem", f"{cert_path}/key.pem"))
+        self.assertEqual((tls.ca_cert, tls.verify), (f"{cert_path}/ca.pem", True))
+
+    @mock.patch("apps.node.pool.get_client")
+    def test_get_local(self, get_client):
+        self.assertIs(NodePool().get(None), get_client.return_value)
+
+
+@override_settings(PLACEMENT_STRATEGY="best-fit")
+class TestPickNode(TestCase):
+    def setUp(self):
+        self.small = Node.objects.create(name="small", host="small", healthy=True, cpu_capacity=4, memory_capacity=4000)
+        self.large = Node.objects.create(
+            name="large", host="large", healthy=True, cpu_capacity=16, memory_capacity=32000
+        )
+        Node.objects.create(name="inactive", host="inactive", active=False, cpu_capacity=64, memory_capacity=64000)
+        Node.objects.create(name="unprobed", host="unprobed")
+        self.schedule = Schedule.objects.create(name="test", cron_rule="* * * * *", image="test", cpu=2, memory=1000)
+
+    def test_best_fit(self):
+        self.assertEqual(pick_node(self.schedule), self.small)
+
+    @override_settings(PLACEMENT_STRATEGY="spread")
+    def test_spread(self):
+        self.assertEqual(pick_node(self.schedule), self.large)
+
+    def test_reservations(self):
+        Job.objects.create(schedule=self.schedule, node=self.small)
+        # Finished and queued jobs don't hold resources
+        Job.objects.create(schedule=self.schedule, node=self.small, status_code=0)
+        Job.objects.create(schedule=self.schedule, status=JobStatusChoices.QUEUED)
+        self.assertEqual(pick_node(self.schedule), self.small)
+
+        Job.objects.create(schedule=self.schedule, node=self.small)
+        self.assertEqual(pick_node(self.schedule), self.large)
+
+    def test_no_capacity(self):
+        big = Schedule.objects.create(name="big", cron_rule="* * * * *", image="test", cpu=16, memory=32000)
+        Job.objects.create(schedule=self.schedule, node=self.large)
+        with self.assertRaises(NoCapacity):
+            pick_node(big)
+
+        huge = Schedule.objects.create(name="huge", cron_rule="* * * * *", image="test", cpu=64)
+        with self.assertRaises(Unplaceable):
+            pick_node(huge)
+
+    def test_unhealthy(self):
+        # Unhealthy nodes are drained, whatever their free capacity
+        Node.objects.filter(pk=self.small.pk).update(healthy=False)
+        self.assertEqual(pick_node(self.schedule), self.large)
+
+        Node.objects.filter(pk=self.large.pk).update(healthy=False)
+        with self.assertRaises(NoCapacity):
+            pick_node(self.schedule)
+
+    @mock.patch("apps.node.placement.local_capacity")
+    def test_local(self, local_capacity):
+        Node.objects.update(active=False)
+        local_capacity.get.return_value = (4, 4000)
+        self.assertIsNone(pick_node(self.schedule))
+
+    def test_assign(self):
+        job = Job.objects.create(schedule=self.schedule, status=JobStatusChoices.QUEUED)
+        assign(job)
+        job.refresh_from_db()
+        self.assertEqual(job.node, self.small)
+        self.assertEqual(job.status, JobStatusChoices.WAITING)
+
+    @mock.patch("apps.node.placement.local_capacity")
+    def test_assign_local(self, local_capacity):
+        # docker info is read before the placement lock is taken
+        Node.objects.update(active=False)
+
+        def get():
+            self.assertFalse(placement_lock.locked())
+            return 4, 4000
+
+        local_capacity.get.side_effect = get
+        job = Job.objects.create(schedule=self.schedule, status=JobStatusChoices.QUEUED)
+        assign(job)
+        self.assertEqual((job.node, job.status), (None, JobStatusChoices.WAITING))
+
+    def test_assign_locks_placement(self):
+        PlacementLock.objects.all().delete()
+        job = Job.objects.create(schedule=self.schedule, status=JobStatusChoices.QUEUED)
+        with mock.patch("apps.node.placement.check_limits", side_effect=LimitReached("global", 1)):
+            with self.assertRaises(LimitReached):
+                assign(job)
+        # Rolled back with the placement
+        self.assertFalse(PlacementLock.objects.exists())
+
+        assign(job)
+        self.assertIsNotNone(PlacementLock.objects.get().locked_at)
+
+
+class TestNodeProber(TestCase):
+    def setUp(self):
+        self.node = Node.objects.create(name="test", host="test")
+        self.client = mock.Mock()
+        self.client.info.return_value = {"NCPU": 8, "MemTotal": 16_000_000_000, "ContainersRunning": 3}
+        self.enterContext(mock.patch("apps.node.prober.pool.get", return_value=self.client))
+
+    def test_probe(self):
+        self.assertTrue(probe(self.node))
+
+        self.node.refresh_from_db()
+        self.assertTrue(self.node.healthy)
+        self.assertIsNotNone(self.node.latency_ms)
+        self.assertEqual(self.node.running_containers, 3)
+        self.assertEqual(self.node.cpu_capacity, 8)
+        self.assertEqual(self.node.memory_capacity, 16000)
+
+    def test_probe_unhealthy(self):
+        self.client.ping.side_effect = requests.exceptions.ConnectionError("refused")
+        self.assertFalse(probe(self.node))
+
+        self.node.refresh_from_db()
+        self.assertFalse(self.node.healthy)
+        self.assertEqual(self.node.probe_error, "refused")
+        self.assertIsNotNone(self.node.probed_at)
+
+    def test_probe_all(self):
+        Node.objects.create(name="inactive", host="inactive", active=False)
+        prober = NodeProber(interval=15, workers=1)
+        prober.executor = mock.Mock()
+        prober.probe_all()
+        # Nodes are skipped while their previous probe is running
+        prober.probe_all()
+        prober.executor.submit.assert_called_once()
@@ -12,13 +12,13 @@ class NodeListView(LoginRequiredMixin, ListView):
 class NodeCreateView(LoginRequiredMixin, CreateView):
     model = Node
     success_url = reverse_lazy("node-list")
-    fields = ["name", "host", "port", "use_ssh", "secret"]
+    fields = ["name", "host", "port", "use_ssh", "use_tls", "active", "secret"]
 
 
 class NodeUpdateView(LoginRequiredMixin, UpdateView):
     model = Node
     success_url = reverse_lazy("node-list")
-    fields = ["name", "host", "port", "use_ssh", "secret"]
+    fields = ["name", "host", "port", "use_ssh", "use_tls", "active", "secret"]
 
 
 class NodeDeleteView(LoginRequiredMixin, DeleteView):
@@ -4,6 +4,12 @@ python3 manage.py migrate
 python3 manage.py loaddata ./apps/core/fixtures/schedules.yaml
 python3 manage.py setup
 
-python3 manage.py update_history &
+python3 manage.py update_history --watch &
+python3 manage.py run_scheduler &
+python3 manage.py prune_jobs --interval 3600 &
 
-cron && gunicorn crontainer.wsgi -w 2 --bind 0.0.0.0:8000 --workers=4 --threads 3
+# Schedules are only fired by cron with the cron backend, run_scheduler fires them otherwise
+if [ "${SCHEDULER_BACKEND:-daemon}" = "cron" ]; then
+    cron
+fi
+gunicorn crontainer.wsgi -w 2 --bind 0.0.0.0:8000 --workers=4 --threads 3
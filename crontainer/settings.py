@@ -20,8 +20,44 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 env = environ.Env(
     DEBUG=(bool, False),
     ALLOWED_HOSTS=(list, ["*"]),
-    CRONJOB_CMD=(str, "{cron_rule}\troot\tcd /app && python3 /app/manage.py run_schedule {schedule_id}"),
+    CRONJOB_CMD=(str, "{cron_rule}\troot\tcd /app && python3 /app/manage.py run_schedule --delay {delay} {schedule_id}"),
     CRONTAB_PATH=(str, "/tmp/cron.d"),
+    CRONTAB_SHARDS=(int, 16),
+    CRONTAB_SYNC_INTERVAL=(int, 5),
+    CRONTAB_RESYNC_INTERVAL=(int, 300),
+    SCHEDULER_BACKEND=(str, "daemon"),
+    SCHEDULER_WORKERS=(int, 16),
+    SCHEDULER_REFRESH=(int, 15),
+    SCHEDULE_SPREAD_SECONDS=(int, 0),
+    HISTORY_RECONCILE_INTERVAL=(int, 300),
+    JOB_LOST_SWEEPS=(int, 3),
+    JOB_PROVISIONING_TIMEOUT=(int, 3600),
+    BUILD_CACHE_FROM=(bool, True),
+    GIT_LS_REMOTE_TIMEOUT=(int, 30),
+    PREWARM_LEAD=(int, 120),
+    PREWARM_CONCURRENCY=(int, 2),
+    TRIGGER_WORKERS=(int, 4),
+    PLACEMENT_STRATEGY=(str, "best-fit"),
+    NODE_CAPACITY_TTL=(int, 60),
+    QUEUE_INTERVAL=(int, 5),
+    MAX_CONCURRENT_JOBS=(int, 0),
+    MAX_JOBS_PER_NODE=(int, 0),
+    MAX_JOBS_PER_SCHEDULE=(int, 0),
+    MAX_JOBS_PER_USER=(int, 0),
+    SINGLETON_LEASE_TTL=(int, 900),
+    NODE_PROBE_INTERVAL=(int, 15),
+    NODE_PROBE_WORKERS=(int, 8),
+    NODE_TLS_CERT_PATH=(str, ""),
+    NODE_TLS_VERIFY=(bool, True),
+    JOB_LOG_STORE=(str, "apps.core.logstore.FileLogStore"),
+    JOB_LOG_ROOT=(str, str(BASE_DIR / "data/logs")),
+    JOB_LOG_MAX_BYTES=(int, 10 * 1024 * 1024),
+    JOB_RETENTION_DAYS=(int, 30),
+    JOB_RETENTION_FAILURE_DAYS=(int, 90),
+    JOB_RETENTION_KEEP_LAST=(int, 100),
+    JOB_ARCHIVE_ROOT=(str, str(BASE_DIR / "data/archive")),
+    JOB_PRUNE_BATCH_SIZE=(int, 1000),
+    RESOURCE_COUNT_TTL=(int, 300),
     CSRF_TRUSTED_ORIGINS=(list, []),
     SESSION_KEY=(str, "django-insecure-t(=_djgy021(tvq%doh+u(v*#lz0zx8lc6i93!u5hfo$ce!z2b"),
 )
@@ -43,6 +79,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "apps.core",
     "apps.node",
+    "apps.api",
     "widget_tweaks",
 ]
 
@@ -84,6 +121,18 @@ DATABASES = {
     "default": env.db(default="sqlite:///data/db.sqlite3"),
 }
 
+# Cache
+# Use a shared cache (e.g. CACHE_URL=redis://...) so counters updated by one process are seen by the others
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
+}
+
+# Sidebar resource counts are cached, and updated by model signals in between recounts every
+# RESOURCE_COUNT_TTL seconds
+
+RESOURCE_COUNT_TTL = env("RESOURCE_COUNT_TTL")
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -137,6 +186,110 @@ STATICFILES_DIRS = [BASE_DIR / "apps/static"]
 CRONTAB_PATH = Path(env("CRONTAB_PATH"))
 CRONJOB_CMD = env("CRONJOB_CMD")
 
+# The crontab files are rendered from the active schedules by `manage.py sync_crontab` or the
+# resident scheduler, never by the web workers. Entries are consolidated in CRONTAB_SHARDS files
+# (0 writes one file per schedule). Schedule changes are synced within CRONTAB_SYNC_INTERVAL
+# seconds, the whole set is resynced every CRONTAB_RESYNC_INTERVAL.
+CRONTAB_SHARDS = env("CRONTAB_SHARDS")
+CRONTAB_SYNC_INTERVAL = env("CRONTAB_SYNC_INTERVAL")
+CRONTAB_RESYNC_INTERVAL = env("CRONTAB_RESYNC_INTERVAL")
+
+# Scheduler settings
+# "daemon": schedules are fired in-process by `manage.py run_scheduler`
+# "cron": a crontab entry per schedule runs `manage.py run_schedule` on every fire
+
+SCHEDULER_BACKEND = env("SCHEDULER_BACKEND")
+SCHEDULER_WORKERS = env("SCHEDULER_WORKERS")
+SCHEDULER_REFRESH = env("SCHEDULER_REFRESH")
+
+# Fires of schedules sharing a cron rule are spread over SCHEDULE_SPREAD_SECONDS (0 disables it),
+# each schedule is delayed by a fixed offset derived from its id. Schedule.spread_seconds overrides it.
+
+SCHEDULE_SPREAD_SECONDS = env("SCHEDULE_SPREAD_SECONDS")
+
+# Image settings
+# Git sourced images are built once per commit, using the previous build as cache when BUILD_CACHE_FROM is set
+
+BUILD_CACHE_FROM = env("BUILD_CACHE_FROM")
+GIT_LS_REMOTE_TIMEOUT = env("GIT_LS_REMOTE_TIMEOUT")
+
+# `run_scheduler` pulls or builds images PREWARM_LEAD seconds before their fire (0 disables it),
+# at most PREWARM_CONCURRENCY at a time
+
+PREWARM_LEAD = env("PREWARM_LEAD")
+PREWARM_CONCURRENCY = env("PREWARM_CONCURRENCY")
+
+# Jobs triggered through the API are provisioned by a pool of TRIGGER_WORKERS threads per web worker
+TRIGGER_WORKERS = env("TRIGGER_WORKERS")
+
+# Placement settings
+# Jobs are placed on the node with enough free CPU and memory, given Schedule.cpu and
+# Schedule.memory and the reservations of unfinished jobs:
+# "best-fit": the fullest node that fits, keeping room on the others for large jobs
+# "spread": the emptiest node
+# Jobs that don't fit anywhere are queued and retried by `run_scheduler` every QUEUE_INTERVAL seconds
+
+PLACEMENT_STRATEGY = env("PLACEMENT_STRATEGY")
+QUEUE_INTERVAL = env("QUEUE_INTERVAL")
+
+# Maximum number of jobs running at the same time (0 is unlimited): in total, on each node, for
+# each schedule and for the schedules of each user. Fires above the limits wait in the queue.
+
+MAX_CONCURRENT_JOBS = env("MAX_CONCURRENT_JOBS")
+MAX_JOBS_PER_NODE = env("MAX_JOBS_PER_NODE")
+MAX_JOBS_PER_SCHEDULE = env("MAX_JOBS_PER_SCHEDULE")
+MAX_JOBS_PER_USER = env("MAX_JOBS_PER_USER")
+
+# A singleton schedule holds a lease while its job runs. `update_history` renews it on every sweep,
+# it expires after SINGLETON_LEASE_TTL seconds if the job was lost. Keep it above HISTORY_RECONCILE_INTERVAL.
+
+SINGLETON_LEASE_TTL = env("SINGLETON_LEASE_TTL")
+
+# `run_scheduler` probes every active node each NODE_PROBE_INTERVAL seconds, NODE_PROBE_WORKERS at a
+# time, and caches its health and capacity for placement. Unhealthy nodes take no new jobs.
+# Without nodes, the capacity of the local daemon is read from `docker info` every NODE_CAPACITY_TTL seconds
+
+NODE_PROBE_INTERVAL = env("NODE_PROBE_INTERVAL")
+NODE_PROBE_WORKERS = env("NODE_PROBE_WORKERS")
+NODE_CAPACITY_TTL = env("NODE_CAPACITY_TTL")
+
+# Nodes using TLS authenticate with the cert.pem and key.pem client certificate of NODE_TLS_CERT_PATH
+# and check the daemon against its ca.pem, or the system authorities. Defaults to DOCKER_CERT_PATH,
+# then ~/.docker like the docker CLI. NODE_TLS_VERIFY=false skips the check of the daemon certificate
+
+NODE_TLS_CERT_PATH = env("NODE_TLS_CERT_PATH") or env.str("DOCKER_CERT_PATH", default=str(Path.home() / ".docker"))
+NODE_TLS_VERIFY = env("NODE_TLS_VERIFY")
+
+# Job history settings
+# Seconds between full reconciliation sweeps when `update_history --watch` follows Docker events
+
+HISTORY_RECONCILE_INTERVAL = env("HISTORY_RECONCILE_INTERVAL")
+
+# Jobs whose container is missing from JOB_LOST_SWEEPS sweeps in a row are failed as lost, which
+# releases their resources and lease. Jobs still provisioning JOB_PROVISIONING_TIMEOUT seconds after
+# their fire (a crashed dispatcher, or a pull or build that long) are swept like started jobs.
+
+JOB_LOST_SWEEPS = env("JOB_LOST_SWEEPS")
+JOB_PROVISIONING_TIMEOUT = env("JOB_PROVISIONING_TIMEOUT")
+
+# Container output is streamed to the log store when a job finishes. Logs larger than
+# JOB_LOG_MAX_BYTES only keep their first and last halves.
+
+JOB_LOG_STORE = env("JOB_LOG_STORE")
+JOB_LOG_ROOT = Path(env("JOB_LOG_ROOT"))
+JOB_LOG_MAX_BYTES = env("JOB_LOG_MAX_BYTES")
+
+# `prune_jobs` deletes finished jobs older than JOB_RETENTION_DAYS (0 keeps them forever), or
+# JOB_RETENTION_FAILURE_DAYS for failures, except the last JOB_RETENTION_KEEP_LAST of each schedule.
+# Pruned jobs and their output are archived as JSON lines below JOB_ARCHIVE_ROOT, daily rollups
+# of every schedule are kept in the database.
+
+JOB_RETENTION_DAYS = env("JOB_RETENTION_DAYS")
+JOB_RETENTION_FAILURE_DAYS = env("JOB_RETENTION_FAILURE_DAYS")
+JOB_RETENTION_KEEP_LAST = env("JOB_RETENTION_KEEP_LAST")
+JOB_ARCHIVE_ROOT = Path(env("JOB_ARCHIVE_ROOT"))
+JOB_PRUNE_BATCH_SIZE = env("JOB_PRUNE_BATCH_SIZE")
+
 # Debug toolbar settings
 if DEBUG:
     INSTALLED_APPS += ["debug_toolbar"]
@@ -29,8 +29,12 @@ from apps.core.views import (
     DescribeCronView,
     JobListView,
     JobLogDetailView,
+    JobLogFollowView,
+    JobLogRangeView,
     ScheduleCreateView,
     ScheduleDeleteView,
+    ScheduleExportView,
+    ScheduleImportView,
     ScheduleListView,
     ScheduleUpdateView,
     UserCreateView,
@@ -45,14 +49,19 @@ urlpatterns = [
     path("create/", ScheduleCreateView.as_view()),
     path("update/<uuid:pk>/", ScheduleUpdateView.as_view(), name="schedule-update"),
     path("delete/<uuid:pk>/", ScheduleDeleteView.as_view(), name="schedule-delete"),
+    path("export/", ScheduleExportView.as_view(), name="schedule-export"),
+    path("import/", ScheduleImportView.as_view(), name="schedule-import"),
     path("job/", JobListView.as_view(), name="job-list"),
     path("job/log/<uuid:pk>/", JobLogDetailView.as_view(), name="job-log"),
+    path("job/log/<uuid:pk>/range/", JobLogRangeView.as_view(), name="job-log-range"),
+    path("job/log/<uuid:pk>/follow/", JobLogFollowView.as_view(), name="job-log-follow"),
     path("credentials/", CredentialListView.as_view(), name="credential-list"),
     path("credentials/create/", CredentialCreateView.as_view(), name="credential-create"),
     path("credentials/update/<uuid:pk>/", CredentialUpdateView.as_view(), name="credential-update"),
     path("credentials/delete/<uuid:pk>/", CredentialDeleteView.as_view(), name="credential-delete"),
     path("describe_cron/", DescribeCronView.as_view(), name="describe_cron"),
     path("node/", include("apps.node.urls")),
+    path("api/", include("apps.api.urls")),
     path("login/", LoginView.as_view(), name="login"),
     path("logout/", LogoutView.as_view(next_page="login"), name="logout"),
     path("account/user/", UserListView.as_view(), name="user-list"),